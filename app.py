@@ -53,7 +53,20 @@
 # import os
 from dotenv import load_dotenv
 from supabase import create_client, Client
-from config.database import supabase
+from config.database import supabase, get_supabase, discard_supabase_client, is_connection_error
+from config.pets_data import get_pets_snapshot, get_pets_snapshot_status, invalidate_pets_cache
+from config.resilience import execute_with_retry
+from config.pets_schema import normalize_pets_frame, drop_unused_categories
+from config.pets_aggregates import apply_pets_writes, begin_pets_write, get_pets_aggregates, get_pets_metrics, with_pets_metrics
+from config.pets_filters import load_filtered_pets, slider_bounds
+from config.pets_index import get_pets_index
+from config.write_behind import write_behind
+from config.bulk_updates import bulk_update, diff_frames, same_values_changes
+from config.pets_import import prepare_import_records, run_pets_import, arrow_schema_issues, ArrowRecordsPreparer, DEFAULT_NATURAL_KEY
+from config.import_readers import (
+    iter_csv_chunks, iter_excel_chunks, iter_frame_chunks, iter_json_chunks, iter_xml_chunks,
+    iter_arrow_batches, iter_arrow_chunks, read_arrow_schema, first_chunk
+)
 
 # Configurar diretórios necessários
 os.makedirs("assets", exist_ok=True)
@@ -65,23 +78,19 @@
 # DATABASE_PATH = "data/petcare.db"
 DEFAULT_ADMIN_EMAIL = "admin@petcare.com"
 DEFAULT_ADMIN_PASSWORD = "admin123"
+# Linhas lidas para prévia e mapeamento de colunas na importação (o arquivo completo é lido em blocos)
+PREVIEW_ROWS = 1000
 
 def ensure_supabase_connection():
     """Garante que há conexão com o Supabase."""
-    global supabase
-    
-    if supabase is None:
-        try:
-            from config.database import get_supabase
-            supabase = get_supabase()
-            
-            if supabase is None:
-                st.error("❌ Não foi possível conectar ao Supabase. Usando modo offline.")
-                return False
-                
-        except Exception as e:
-            st.error(f"❌ Erro na conexão: {str(e)}")
+    try:
+        if get_supabase() is None:
+            st.error("❌ Não foi possível conectar ao Supabase. Usando modo offline.")
             return False
+            
+    except Exception as e:
+        st.error(f"❌ Erro na conexão: {str(e)}")
+        return False
     
     return True
 
@@ -93,6 +102,9 @@ def safe_supabase_operation(operation_func, fallback_result=None, error_message=
     try:
         return operation_func()
     except Exception as e:
+        # Conexão morta: devolver o cliente ao pool para ser recriado
+        if is_connection_error(e):
+            discard_supabase_client(get_supabase())
         st.error(f"{error_message}: {str(e)}")
         return fallback_result
 
@@ -157,10 +169,16 @@ def add_pet(nome, tipo_pet, idade, genero, status="Disponível", cor="", contato
             if key not in pet_data:
                 pet_data[key] = value
         
-        # Inserir no Supabase
-        result = supabase.table('pets_analytics').insert(pet_data).execute()
+        # Inserir no Supabase (insert não é idempotente: sem retentativas)
+        token = begin_pets_write()
+        result = execute_with_retry(
+            'pets_analytics',
+            lambda: supabase.table('pets_analytics').insert(pet_data),
+            retries=0
+        )
         
         if result.data:
+            apply_pets_writes(inserted=result.data, token=token)
             return True, result.data[0]['id']
         else:
             return False, "Erro ao inserir dados"
@@ -231,13 +249,7 @@ def display_add_pet_simple():
 def get_pets_data():
     """Obtém todos os dados dos pets do Supabase."""
     try:
-        result = supabase.table('pets_analytics').select('*').execute()
-        
-        if result.data:
-            df = pd.DataFrame(result.data)
-            return df
-        else:
-            return pd.DataFrame()
+        return get_pets_snapshot()
     
     except Exception as e:
         st.error(f"Erro ao carregar dados: {e}")
@@ -252,92 +264,17 @@ def import_csv_data(df):
     
     if df.empty:
         return 0, 0, "DataFrame está vazio"
-
-    success_count = 0
-    error_count = 0
-    errors = []
-    
-    # Colunas esperadas
-    expected_columns = [
-        'nome', 'bairro', 'tipo_pet', 'raca', 'idade', 'peso', 'sexo', 
-        'telefone', 'status_vacinacao', 'estado_saude', 'comportamento', 
-        'nivel_atividade', 'regiao', 'created_by', 'microchip', 'castrado', 
-        'historico_medico', 'cor_pelagem', 'necessidades_especiais', 
-        'temperamento', 'sociabilidade', 'energia', 'custo_mensal', 
-        'compatibilidade_criancas', 'compatibilidade_pets', 'score_adocao', 
-        'cluster_comportamental', 'risco_abandono'
-    ]
-    
-    # Preparar dados para inserção em lote
-    batch_data = []
-    
-    for index, row in df.iterrows():
-        try:
-            # Preparar dados da linha
-            row_data = {}
-            
-            for col in expected_columns:
-                if col in df.columns:
-                    value = row.get(col)
-                    
-                    # Tratamentos específicos por tipo de dado
-                    if col in ['idade', 'created_by'] and value is not None:
-                        try:
-                            value = int(float(value)) if value != '' else None
-                        except (ValueError, TypeError):
-                            value = None
-                    
-                    elif col in ['peso', 'custo_mensal', 'score_adocao', 'risco_abandono'] and value is not None:
-                        try:
-                            value = float(value) if value != '' else None
-                        except (ValueError, TypeError):
-                            value = None
-                    
-                    elif col == 'adotado' and value is not None:
-                        if isinstance(value, str):
-                            value = value.lower() in ['true', '1', 'sim', 'yes']
-                        elif isinstance(value, bool):
-                            value = value
-                        else:
-                            value = bool(value) if value else False
-                    
-                    elif col in ['castrado', 'microchip', 'compatibilidade_criancas', 'compatibilidade_pets'] and value is not None:
-                        if isinstance(value, str):
-                            value = value.lower() in ['true', '1', 'sim', 'yes']
-                        else:
-                            value = bool(value) if value else False
-                    
-                    # Converter strings vazias para None
-                    if value == '' or value == 'nan':
-                        value = None
-                    
-                    row_data[col] = value
-            
-            batch_data.append(row_data)
-            
-        except Exception as e:
-            error_msg = f"Linha {index + 1}: {str(e)}"
-            errors.append(error_msg)
-            error_count += 1
-    
-    # Inserir em lotes de 100 registros
-    batch_size = 100
     
-    try:
-        for i in range(0, len(batch_data), batch_size):
-            batch = batch_data[i:i+batch_size]
-            
-            result = supabase.table('pets_analytics').insert(batch).execute()
-            
-            if result.data:
-                success_count += len(result.data)
-            else:
-                error_count += len(batch)
-                errors.append(f"Erro ao inserir lote {i//batch_size + 1}")
+    return import_pets_chunks(iter_frame_chunks(df))
+
+def import_pets_chunks(chunks, progress=None):
+    """Importa blocos lidos em streaming, gravando cada um assim que fica pronto."""
     
-    except Exception as e:
-        error_count += len(batch_data) - success_count
-        errors.append(f"Erro geral na inserção: {str(e)}")
+    # Conversão vetorizada por bloco (linhas inválidas viram erros "Linha N") e
+    # gravação em lotes concorrentes que isolam as linhas rejeitadas; registros
+    # iguais a pets já cadastrados são ignorados
+    report = run_pets_import(chunks, progress=progress)
+    errors = report.errors
     
     # Preparar mensagem de resultado
     if errors:
@@ -347,7 +284,10 @@ def import_csv_data(df):
     else:
         error_summary = "Importação concluída sem erros!"
     
-    return success_count, error_count, error_summary
+    if report.duplicates:
+        error_summary += f"\n🔁 {report.duplicates} registros duplicados ignorados."
+    
+    return report.success_count, report.error_count, error_summary
 
 def display_import_results(success_count, error_count, error_summary):
     """Exibe os resultados da importação de forma organizada."""
@@ -395,8 +335,8 @@ def import_data_interface():
     
     if uploaded_file is not None:
         try:
-            # Ler CSV
-            df = pd.read_csv(uploaded_file)
+            # Ler só o início do CSV para a prévia; a importação lê o arquivo em blocos
+            df = pd.read_csv(uploaded_file, nrows=PREVIEW_ROWS)
             
             # Mostrar preview
             st.write("**Preview dos dados:**")
@@ -405,14 +345,20 @@ def import_data_interface():
             # Informações sobre o arquivo
             col1, col2 = st.columns(2)
             with col1:
-                st.info(f"📊 Total de linhas: {len(df)}")
+                st.info(f"📦 Tamanho do arquivo: {uploaded_file.size / 1024 / 1024:.1f} MB")
             with col2:
                 st.info(f"📋 Total de colunas: {len(df.columns)}")
             
             # Botão de importação
             if st.button("🚀 Importar Dados", type="primary", use_container_width=True):
-                with st.spinner("Importando dados..."):
-                    success_count, error_count, error_summary = import_csv_data(df)
+                progress_bar = st.progress(0.0, text="Importando dados...")
+                
+                def update_progress(consumed, total):
+                    progress_bar.progress(min(consumed / total, 1.0) if total else 1.0, text="Importando dados...")
+                
+                success_count, error_count, error_summary = import_pets_chunks(
+                    iter_csv_chunks(uploaded_file), progress=update_progress
+                )
                 
                 # Exibir resultados
                 display_import_results(success_count, error_count, error_summary)
@@ -427,27 +373,50 @@ def import_data_interface():
             st.error(f"❌ Erro ao processar arquivo: {str(e)}")
             st.info("💡 Verifique se o arquivo CSV está no formato correto.")
 
-def update_pet_status(pet_id, new_status):
-    """Atualiza o status de um pet no Supabase."""
+def update_pets_status(pet_ids, new_status):
+    """Atualiza o status de vários pets no Supabase com um único update por lote de ids.
+    
+    Retorna o número de pets atualizados (0 em caso de erro).
+    """
     try:
-        update_data = {'status': new_status}
+        update_data = {
+            'status': new_status,
+            'updated_at': datetime.datetime.now(datetime.timezone.utc).isoformat()
+        }
         
         # Se foi adotado, marcar flag
         if new_status == "Adotado":
             update_data['adotado'] = True
         
-        result = supabase.table('pets_analytics').update(update_data).eq('id', pet_id).execute()
+        changes = same_values_changes(pet_ids, update_data)
+        token = begin_pets_write()
+        try:
+            updated = bulk_update('pets_analytics', changes)
+        except Exception:
+            # Parte dos lotes pode ter sido gravada: invalidar o snapshot (e o cubo) mesmo assim
+            invalidate_pets_cache()
+            raise
+        apply_pets_writes(changes=changes, token=token)
         
-        return result.data is not None
+        return updated
         
     except Exception as e:
         print(f"Erro ao atualizar status: {e}")
-        return False
+        return 0
+
+def update_pet_status(pet_id, new_status):
+    """Atualiza o status de um pet no Supabase."""
+    return update_pets_status([pet_id], new_status) > 0
 
 def delete_pet(pet_id):
     """Remove um pet do Supabase."""
     try:
-        result = supabase.table('pets_analytics').delete().eq('id', pet_id).execute()
+        token = begin_pets_write()
+        result = execute_with_retry(
+            'pets_analytics',
+            lambda: supabase.table('pets_analytics').delete().eq('id', pet_id)
+        )
+        apply_pets_writes(deleted_ids=[pet_id], token=token)
         return result.data is not None
         
     except Exception as e:
@@ -540,10 +509,25 @@ def verify_password(stored_hash, provided_password):
     """Verifica se a senha fornecida corresponde ao hash armazenado."""
     return stored_hash == hashlib.sha256(provided_password.encode()).hexdigest()
 
+def _user_info_from_row(user):
+    """Monta o dicionário de informações do usuário (session_state.user_info) a partir da linha do banco."""
+    return {
+        "email": user['email'],
+        "full_name": user['full_name'],
+        "role": user['role'],
+        "preferences": user.get('preferences', {}),
+        "profile_data": user.get('profile_data', {})
+    }
+
 def authenticate_user(email, password):
-    """Autentica um usuário com email e senha."""
+    """Autentica um usuário com email e senha.
+    
+    Retorna (autenticado, user_id, role, user_info). Só a busca do usuário é
+    feita na hora; último login e registro em login_logs_analytics seguem
+    pela fila de gravação em segundo plano.
+    """
     try:
-        # Buscar usuário por email
+        # Buscar usuário por email (única ida ao banco no login)
         result = supabase.table('users_analytics').select('*').eq('email', email).execute()
         
         if result.data and len(result.data) > 0:
@@ -552,12 +536,11 @@ def authenticate_user(email, password):
             if verify_password(user['password_hash'], password):
                 user_id = user['id']
                 role = user['role']
-                full_name = user['full_name']
                 
                 # Atualizar último login
-                supabase.table('users_analytics').update({
+                write_behind.update('users_analytics', {
                     'last_login': datetime.datetime.now().isoformat()
-                }).eq('id', user_id).execute()
+                }, {'id': user_id})
                 
                 # Registrar login bem-sucedido
                 log_data = {
@@ -565,9 +548,9 @@ def authenticate_user(email, password):
                     'success': True,
                     'ip_address': '127.0.0.1'  # Em produção, obter IP real
                 }
-                supabase.table('login_logs_analytics').insert(log_data).execute()
+                write_behind.insert('login_logs_analytics', log_data)
                 
-                return True, user_id, role
+                return True, user_id, role, _user_info_from_row(user)
             else:
                 # Registrar tentativa de login mal-sucedida
                 log_data = {
@@ -576,13 +559,13 @@ def authenticate_user(email, password):
                     'failure_reason': 'Wrong password',
                     'ip_address': '127.0.0.1'
                 }
-                supabase.table('login_logs_analytics').insert(log_data).execute()
+                write_behind.insert('login_logs_analytics', log_data)
         
-        return False, None, None
+        return False, None, None, None
         
     except Exception as e:
         print(f"Erro na autenticação: {e}")
-        return False, None, None
+        return False, None, None, None
 
 def log_activity(user_id, action, details="", execution_time=None):
     """Registra uma atividade de usuário no Supabase."""
@@ -598,7 +581,8 @@ def log_activity(user_id, action, details="", execution_time=None):
             'ip_address': '127.0.0.1'  # Em produção, obter IP real
         }
         
-        supabase.table('activity_logs_analytics').insert(log_data).execute()
+        # Gravado em lote por uma thread em segundo plano: a ação do usuário não espera o banco
+        write_behind.insert('activity_logs_analytics', log_data)
         
     except Exception as e:
         print(f"Erro ao registrar atividade: {e}")
@@ -609,14 +593,7 @@ def get_user_info(user_id):
         result = supabase.table('users_analytics').select('*').eq('id', user_id).execute()
         
         if result.data and len(result.data) > 0:
-            user = result.data[0]
-            return {
-                "email": user['email'],
-                "full_name": user['full_name'],
-                "role": user['role'],
-                "preferences": user.get('preferences', {}),
-                "profile_data": user.get('profile_data', {})
-            }
+            return _user_info_from_row(result.data[0])
         
         return None
         
@@ -713,13 +690,13 @@ def preprocess_data(self, target_column=None):
         
         # Tratar valores ausentes
         for col in df_processed.columns:
-            if df_processed[col].dtype in ['object']:
-                df_processed[col] = df_processed[col].fillna('Desconhecido')
+            if df_processed[col].dtype in ['object', 'category']:
+                df_processed[col] = df_processed[col].astype(object).fillna('Desconhecido')
             else:
                 df_processed[col] = df_processed[col].fillna(df_processed[col].median())
         
         # Encoding de variáveis categóricas
-        categorical_cols = df_processed.select_dtypes(include=['object']).columns
+        categorical_cols = df_processed.select_dtypes(include=['object', 'category']).columns
         
         for col in categorical_cols:
             if col != target_column:
@@ -965,7 +942,7 @@ def time_series_analysis(self, date_column, value_column, forecast_periods=30):
     def association_rules_analysis(self):
         """Análise de regras de associação."""
         # Simular análise de regras de associação
-        categorical_cols = self.df.select_dtypes(include=['object']).columns
+        categorical_cols = self.df.select_dtypes(include=['object', 'category']).columns
         
         if len(categorical_cols) < 2:
             return None, "Dados categóricos insuficientes"
@@ -1024,7 +1001,7 @@ def advanced_feature_engineering(self):
         
         # Features de interação
         if 'tipo_pet' in df_engineered.columns and 'comportamento' in df_engineered.columns:
-            df_engineered['tipo_comportamento'] = df_engineered['tipo_pet'] + '_' + df_engineered['comportamento'].fillna('Desconhecido')
+            df_engineered['tipo_comportamento'] = df_engineered['tipo_pet'].astype(str) + '_' + df_engineered['comportamento'].astype(object).fillna('Desconhecido').astype(str)
         
         # Scores compostos
         score_cols = ['sociabilidade', 'energia', 'nivel_atividade']
@@ -1047,20 +1024,19 @@ def advanced_feature_engineering(self):
 def load_data_from_db():
     """Carrega os dados do Supabase."""
     try:
-        result = supabase.table('pets_analytics').select('*').execute()
+        df = get_pets_snapshot()
         
-        if result.data and len(result.data) > 0:
-            df = pd.DataFrame(result.data)
+        if not df.empty:
             return df
         else:
             # Se não houver dados, gerar dados de exemplo
-            df = generate_sample_data()
+            df = normalize_pets_frame(generate_sample_data())
             return df
     
     except Exception as e:
+        # Sem snapshot em cache e banco indisponível: nunca exibir pets fictícios
         print(f"Erro ao carregar dados: {e}")
-        df = generate_sample_data()
-        return df
+        return pd.DataFrame()
 
 def generate_sample_data(n_samples=200):
     """Gera dados de exemplo para demonstração do sistema."""
@@ -1186,9 +1162,15 @@ def save_pet_to_db(pet_data):
                 return False, f"Campo obrigatório '{field}' está vazio"
         
         # Inserir no Supabase
-        result = supabase.table('pets_analytics').insert(filtered_data).execute()
+        token = begin_pets_write()
+        result = execute_with_retry(
+            'pets_analytics',
+            lambda: supabase.table('pets_analytics').insert(filtered_data),
+            retries=0
+        )
         
         if result.data:
+            apply_pets_writes(inserted=result.data, token=token)
             pet_id = result.data[0]['id']
             return True, pet_id
         else:
@@ -1362,13 +1344,12 @@ def display_login_page():
         email, login_data = last_login
         
         with st.spinner("Entrando automaticamente..."):
-            time.sleep(0.5)
-            is_authenticated, user_id, role = authenticate_user(email, login_data['password'])
+            is_authenticated, user_id, role, user_info = authenticate_user(email, login_data['password'])
             
             if is_authenticated:
                 st.session_state.user_id = user_id
                 st.session_state.user_role = role
-                st.session_state.user_info = get_user_info(user_id)
+                st.session_state.user_info = user_info
                 st.session_state.session_id = str(uuid.uuid4())
                 
                 # Atualizar último login
@@ -1420,13 +1401,12 @@ def display_login_page():
                 with col_login:
                     if st.button(f"🚀 Entrar como {login_data['name']}", key=f"login_{email}", use_container_width=True):
                         with st.spinner("Autenticando..."):
-                            time.sleep(0.5)
-                            is_authenticated, user_id, role = authenticate_user(email, login_data['password'])
+                            is_authenticated, user_id, role, user_info = authenticate_user(email, login_data['password'])
                             
                             if is_authenticated:
                                 st.session_state.user_id = user_id
                                 st.session_state.user_role = role
-                                st.session_state.user_info = get_user_info(user_id)
+                                st.session_state.user_info = user_info
                                 st.session_state.session_id = str(uuid.uuid4())
                                 
                                 # Atualizar último login
@@ -1511,18 +1491,16 @@ def display_login_page():
                     st.error("❌ Por favor, preencha todos os campos.")
                 else:
                     with st.spinner("🔍 Autenticando..."):
-                        time.sleep(0.5)
-                        is_authenticated, user_id, role = authenticate_user(email, password)
+                        is_authenticated, user_id, role, user_info = authenticate_user(email, password)
                         
                         if is_authenticated:
                             st.session_state.user_id = user_id
                             st.session_state.user_role = role
-                            st.session_state.user_info = get_user_info(user_id)
+                            st.session_state.user_info = user_info
                             st.session_state.session_id = str(uuid.uuid4())
                             
                             # Salvar login se solicitado
                             if remember:
-                                user_info = get_user_info(user_id)
                                 st.session_state.saved_logins[email] = {
                                     'password': password,
                                     'name': user_info['full_name'],
@@ -1685,41 +1663,46 @@ def apply_filters(df):
     
     st.sidebar.markdown("## 🔍 Filtros Avançados")
     
+    # Os widgets montam o estado dos filtros; a filtragem acontece uma única vez no final
+    filtros = {}
+    
+    # Opções e faixas dos filtros saem do índice do DataFrame (montado uma vez por snapshot)
+    indice = get_pets_index(df)
+    
     with st.sidebar.expander("Filtros Básicos", expanded=True):
         # Filtro por bairro
         if 'bairro' in df.columns and not df['bairro'].empty:
-            bairros_unique = df['bairro'].dropna().unique()
+            bairros_unique = indice.options('bairro')
             if len(bairros_unique) > 0:
-                bairros = ["Todos"] + sorted(bairros_unique.tolist())
+                bairros = ["Todos"] + bairros_unique
                 bairro_filtro = st.selectbox("🏘️ Bairro:", bairros)
                 if bairro_filtro != "Todos":
-                    df = df[df['bairro'] == bairro_filtro]
+                    filtros['bairro'] = bairro_filtro
         
         # Filtro por tipo de pet
         if 'tipo_pet' in df.columns and not df['tipo_pet'].empty:
-            tipos_unique = df['tipo_pet'].dropna().unique()
+            tipos_unique = indice.options('tipo_pet')
             if len(tipos_unique) > 0:
-                tipos_pet = ["Todos"] + sorted(tipos_unique.tolist())
+                tipos_pet = ["Todos"] + tipos_unique
                 tipo_pet_filtro = st.selectbox("🐕 Tipo de Pet:", tipos_pet)
                 if tipo_pet_filtro != "Todos":
-                    df = df[df['tipo_pet'] == tipo_pet_filtro]
+                    filtros['tipo_pet'] = tipo_pet_filtro
         
         # Filtro por status de adoção
         if 'adotado' in df.columns:
             status_adocao = ["Todos", "Adotado", "Não Adotado"]
             status_filtro = st.selectbox("❤️ Status de Adoção:", status_adocao)
             if status_filtro == "Adotado":
-                df = df[df['adotado'] == True]
+                filtros['adotado'] = True
             elif status_filtro == "Não Adotado":
-                df = df[df['adotado'] == False]
+                filtros['adotado'] = False
     
     with st.sidebar.expander("Filtros Avançados"):
         # Filtro por intervalo de idade
-        if 'idade' in df.columns and not df['idade'].isna().all() and len(df['idade'].dropna()) > 0:
-            idade_values = df['idade'].dropna()
-            if len(idade_values) > 0:
-                min_idade = float(idade_values.min())
-                max_idade = float(idade_values.max())
+        if 'idade' in df.columns:
+            idade_range = indice.value_range('idade')
+            if idade_range is not None:
+                min_idade, max_idade = slider_bounds('idade', *idade_range)
                 
                 # Verificar se min e max são diferentes e válidos
                 if min_idade < max_idade and not (pd.isna(min_idade) or pd.isna(max_idade)):
@@ -1730,18 +1713,18 @@ def apply_filters(df):
                         value=(min_idade, max_idade),
                         step=0.1
                     )
-                    df = df[(df['idade'] >= selected_range[0]) & (df['idade'] <= selected_range[1])]
+                    if selected_range != (min_idade, max_idade):
+                        filtros['idade'] = selected_range
                 elif min_idade == max_idade:
                     st.info(f"📅 Idade única: {min_idade} anos")
                 else:
                     st.info("📅 Dados de idade insuficientes")
         
         # Filtro por score de adoção
-        if 'score_adocao' in df.columns and not df['score_adocao'].isna().all() and len(df['score_adocao'].dropna()) > 0:
-            score_values = df['score_adocao'].dropna()
-            if len(score_values) > 0:
-                min_score = float(score_values.min())
-                max_score = float(score_values.max())
+        if 'score_adocao' in df.columns:
+            score_range = indice.value_range('score_adocao')
+            if score_range is not None:
+                min_score, max_score = slider_bounds('score_adocao', *score_range)
                 
                 # Verificar se min e max são diferentes e válidos
                 if min_score < max_score and not (pd.isna(min_score) or pd.isna(max_score)):
@@ -1752,55 +1735,55 @@ def apply_filters(df):
                         value=(min_score, max_score),
                         step=0.1
                     )
-                    df = df[(df['score_adocao'] >= selected_score_range[0]) & (df['score_adocao'] <= selected_score_range[1])]
+                    if selected_score_range != (min_score, max_score):
+                        filtros['score_adocao'] = selected_score_range
                 elif min_score == max_score:
                     st.info(f"⭐ Score único: {min_score:.1f}")
                 else:
                     st.info("⭐ Dados de score insuficientes")
         
         # Filtro por características comportamentais
-        if 'sociabilidade' in df.columns and not df['sociabilidade'].isna().all():
-            soc_values = df['sociabilidade'].dropna()
-            if len(soc_values) > 0:
-                min_soc = int(soc_values.min())
-                max_soc = int(soc_values.max())
+        if 'sociabilidade' in df.columns:
+            soc_range = indice.value_range('sociabilidade')
+            if soc_range is not None:
+                min_soc, max_soc = int(soc_range[0]), int(soc_range[1])
                 
                 if min_soc < max_soc:
                     min_soc_filter = st.slider("🤝 Sociabilidade mínima:", min_soc, max_soc, min_soc)
-                    df = df[df['sociabilidade'] >= min_soc_filter]
+                    if min_soc_filter > min_soc:
+                        filtros['sociabilidade_min'] = min_soc_filter
                 elif min_soc == max_soc:
                     st.info(f"🤝 Sociabilidade única: {min_soc}")
         
-        if 'energia' in df.columns and not df['energia'].isna().all():
-            ener_values = df['energia'].dropna()
-            if len(ener_values) > 0:
-                min_ener = int(ener_values.min())
-                max_ener = int(ener_values.max())
+        if 'energia' in df.columns:
+            ener_range = indice.value_range('energia')
+            if ener_range is not None:
+                min_ener, max_ener = int(ener_range[0]), int(ener_range[1])
                 
                 if min_ener < max_ener:
                     min_energia = st.slider("⚡ Energia mínima:", min_ener, max_ener, min_ener)
-                    df = df[df['energia'] >= min_energia]
+                    if min_energia > min_ener:
+                        filtros['energia_min'] = min_energia
                 elif min_ener == max_ener:
                     st.info(f"⚡ Energia única: {min_ener}")
     
     with st.sidebar.expander("Filtros ML"):
         # Filtro por cluster (se existir)
-        if 'cluster_comportamental' in df.columns and not df['cluster_comportamental'].isna().all():
-            cluster_values = df['cluster_comportamental'].dropna()
+        if 'cluster_comportamental' in df.columns:
+            cluster_values = indice.options('cluster_comportamental')
             if len(cluster_values) > 0:
-                clusters_unique = sorted([str(int(x)) for x in cluster_values.unique() if pd.notna(x)])
+                clusters_unique = sorted({str(int(x)) for x in cluster_values})
                 if len(clusters_unique) > 0:
                     clusters = ["Todos"] + clusters_unique
                     cluster_filtro = st.selectbox("🎯 Cluster Comportamental:", clusters)
                     if cluster_filtro != "Todos":
-                        df = df[df['cluster_comportamental'] == int(cluster_filtro)]
+                        filtros['cluster_comportamental'] = int(cluster_filtro)
         
         # Filtro por risco de abandono
-        if 'risco_abandono' in df.columns and not df['risco_abandono'].isna().all() and len(df['risco_abandono'].dropna()) > 0:
-            risco_values = df['risco_abandono'].dropna()
-            if len(risco_values) > 0:
-                min_risco = float(risco_values.min())
-                max_risco = float(risco_values.max())
+        if 'risco_abandono' in df.columns:
+            risco_range = indice.value_range('risco_abandono')
+            if risco_range is not None:
+                min_risco, max_risco = slider_bounds('risco_max', *risco_range)
                 
                 # Verificar se min e max são diferentes e válidos
                 if min_risco < max_risco and not (pd.isna(min_risco) or pd.isna(max_risco)):
@@ -1811,12 +1794,21 @@ def apply_filters(df):
                         value=max_risco, 
                         step=0.01
                     )
-                    df = df[df['risco_abandono'] <= risco_max]
+                    if risco_max < max_risco:
+                        filtros['risco_max'] = risco_max
                 elif min_risco == max_risco:
                     st.info(f"⚠️ Risco único: {min_risco:.2f}")
                 else:
                     st.info("⚠️ Dados de risco insuficientes")
     
+    # Snapshot completo em cache: filtrar em memória; senão, buscar só o recorte no banco.
+    # A sessão guarda só o estado dos filtros: o recorte sai do cache compartilhado de resultados
+    st.session_state.filtros_ativos = filtros
+    df = load_filtered_pets(filtros, df)
+    
+    # Categorias sem pets no recorte não devem aparecer em contagens e gráficos
+    df = drop_unused_categories(df)
+    
     # Exibir contagem de resultados
     st.sidebar.markdown(f"**📊 {len(df)} pets** correspondem aos filtros.")
     
@@ -1846,11 +1838,16 @@ def display_dashboard(df, df_filtrado):
     
     col1, col2, col3, col4, col5 = st.columns(5)
     
-    total_pets = len(df_filtrado)
-    media_idade = round(df_filtrado['idade'].mean(), 1) if 'idade' in df_filtrado.columns and len(df_filtrado) > 0 else 0
-    taxa_adocao = round(df_filtrado['adotado'].mean() * 100, 1) if 'adotado' in df_filtrado.columns and len(df_filtrado) > 0 else 0
-    score_medio = round(df_filtrado['score_adocao'].mean(), 2) if 'score_adocao' in df_filtrado.columns and len(df_filtrado) > 0 else 0
-    risco_medio = round(df_filtrado['risco_abandono'].mean(), 2) if 'risco_abandono' in df_filtrado.columns and len(df_filtrado) > 0 else 0
+    # Métricas e agrupamentos saem do cubo de agregados (filtros por bairro, tipo e adoção
+    # são somas de células); outros filtros, como faixas, são agregados sobre o recorte
+    filtros = st.session_state.get('filtros_ativos', {})
+    metricas = get_pets_metrics(df_filtrado, filters=filtros)
+    
+    total_pets = metricas['total']
+    media_idade = round(metricas['idade_media'], 1) if pd.notna(metricas['idade_media']) else 0
+    taxa_adocao = round(metricas['taxa_adocao'] * 100, 1) if pd.notna(metricas['taxa_adocao']) else 0
+    score_medio = round(metricas['score_medio'], 2) if pd.notna(metricas['score_medio']) else 0
+    risco_medio = round(metricas['risco_medio'], 2) if pd.notna(metricas['risco_medio']) else 0
     
     with col1:
         custom_metric("Total de Pets", total_pets, subtexto="no sistema", cor="#4527A0")
@@ -1911,20 +1908,18 @@ def display_dashboard(df, df_filtrado):
             
             # Análise por bairro
             if 'bairro' in df_filtrado.columns and 'adotado' in df_filtrado.columns:
-                bairro_stats = df_filtrado.groupby('bairro').agg({
-                    'adotado': ['count', 'sum', 'mean'],
-                    'score_adocao': 'mean' if 'score_adocao' in df_filtrado.columns else 'count'
+                agregados_bairro = with_pets_metrics(get_pets_aggregates(('bairro',), df_filtrado, filters=filtros))
+                bairro_stats = pd.DataFrame({
+                    'bairro': agregados_bairro['bairro'].astype(str),
+                    'Total': agregados_bairro['total'],
+                    'Adotados': agregados_bairro['adotados'],
+                    'Taxa_Adocao': agregados_bairro['taxa_adocao'],
+                    'Score_Medio': agregados_bairro['score_medio']
                 }).round(2)
                 
-                # Corrigir estrutura das colunas
-                if 'score_adocao' in df_filtrado.columns:
-                    bairro_stats.columns = ['Total', 'Adotados', 'Taxa_Adocao', 'Score_Medio']
-                else:
-                    bairro_stats.columns = ['Total', 'Adotados', 'Taxa_Adocao']
+                if 'score_adocao' not in df_filtrado.columns:
                     bairro_stats['Score_Medio'] = 3.0  # Valor padrão
                 
-                bairro_stats = bairro_stats.reset_index()
-                
                 # Verificar se há dados válidos antes de criar o gráfico
                 if len(bairro_stats) > 0 and not bairro_stats['Score_Medio'].isna().all():
                     # Limpar valores NaN
@@ -2103,8 +2098,8 @@ def display_dashboard(df, df_filtrado):
     try:
         # Insight 1: Taxa de adoção por tipo
         if 'tipo_pet' in df_filtrado.columns and 'adotado' in df_filtrado.columns and len(df_filtrado) > 0:
-            adocao_por_tipo = df_filtrado.groupby('tipo_pet')['adotado'].mean()
-            adocao_por_tipo = adocao_por_tipo.dropna()
+            agregados_tipo = with_pets_metrics(get_pets_aggregates(('tipo_pet',), df_filtrado, filters=filtros))
+            adocao_por_tipo = agregados_tipo.set_index('tipo_pet')['taxa_adocao'].dropna()
             
             if len(adocao_por_tipo) > 0:
                 adocao_por_tipo = adocao_por_tipo.sort_values(ascending=False)
@@ -2114,16 +2109,16 @@ def display_dashboard(df, df_filtrado):
         
         # Insight 2: Bairro com maior atividade
         if 'bairro' in df_filtrado.columns and len(df_filtrado) > 0:
-            atividade_bairro = df_filtrado['bairro'].value_counts()
+            atividade_bairro = get_pets_aggregates(('bairro',), df_filtrado, filters=filtros).set_index('bairro')['total']
+            atividade_bairro = atividade_bairro.sort_values(ascending=False)
             if len(atividade_bairro) > 0:
                 bairro_ativo = atividade_bairro.index[0]
-                insights.append(f"📍 **{bairro_ativo}** é o bairro com mais pets cadastrados ({atividade_bairro.iloc[0]} pets)")
+                insights.append(f"📍 **{bairro_ativo}** é o bairro com mais pets cadastrados ({int(atividade_bairro.iloc[0])} pets)")
         
         # Insight 3: Análise de idade
         if 'idade' in df_filtrado.columns and len(df_filtrado) > 0:
-            idade_values = df_filtrado['idade'].dropna()
-            if len(idade_values) > 0:
-                idade_media = idade_values.mean()
+            idade_media = metricas['idade_media']
+            if pd.notna(idade_media):
                 if idade_media < 3:
                     insights.append("👶 A maioria dos pets são jovens, ideal para famílias que querem pets mais ativos")
                 elif idade_media > 7:
@@ -2131,10 +2126,8 @@ def display_dashboard(df, df_filtrado):
         
         # Insight 4: Score de adoção
         if 'score_adocao' in df_filtrado.columns and len(df_filtrado) > 0:
-            score_values = df_filtrado['score_adocao'].dropna()
-            if len(score_values) > 0:
-                score_alto = (score_values > 4).sum()
-                perc_score_alto = (score_alto / len(score_values)) * 100
+            perc_score_alto = metricas['perc_score_alto']
+            if pd.notna(perc_score_alto):
                 insights.append(f"⭐ {perc_score_alto:.1f}% dos pets têm score de adoção alto (>4.0)")
         
         # Exibir insights
@@ -2185,7 +2178,7 @@ def safe_groupby(df, column, agg_dict, default_df=None):
     try:
         if df.empty or column not in df.columns:
             return default_df or pd.DataFrame()
-        return df.groupby(column).agg(agg_dict)
+        return df.groupby(column, observed=True).agg(agg_dict)
     except Exception:
         return default_df or pd.DataFrame()
 
@@ -2769,8 +2762,11 @@ def advanced_analytics(df):
             st.dataframe(stats_df, use_container_width=True)
 
 @require_login
-def visualizar_dados(df):
-    """Visualização avançada de dados."""
+def visualizar_dados(df, df_filtrado=None):
+    """Visualização avançada de dados.
+    
+    df_filtrado: pets selecionados pelos filtros da barra lateral (alvo do "todos" na alteração de status em massa).
+    """
     st.title("📊 Visualização Avançada de Dados")
     
     if df.empty:
@@ -2884,6 +2880,61 @@ def visualizar_dados(df):
             }
         )
         
+        # Alteração de status em massa (ex.: após uma feira de adoção)
+        if 'id' in df.columns and st.session_state.get('user_role') in ('admin', 'user'):
+            with st.expander("🏷️ Alterar status em massa"):
+                # "Todos" vale só para os pets selecionados pelos filtros da barra lateral, e só para admin
+                pets_filtrados = df_filtrado if df_filtrado is not None else df.iloc[0:0]
+                todos = False
+                
+                if st.session_state.get('user_role') == 'admin' and 'id' in pets_filtrados.columns:
+                    todos = st.checkbox(f"Aplicar aos {len(pets_filtrados)} pets dos filtros da barra lateral", value=False)
+                
+                if todos:
+                    selecionados = pets_filtrados['id'].dropna().tolist()
+                else:
+                    pets_pagina = df.loc[df_page.index]
+                    nomes = pets_pagina['nome'] if 'nome' in pets_pagina.columns else pets_pagina['id']
+                    rotulos = dict(zip(pets_pagina['id'], nomes.astype(str)))
+                    selecionados = st.multiselect(
+                        "Pets selecionados:",
+                        options=list(rotulos.keys()),
+                        format_func=lambda pet_id: f"#{pet_id} - {rotulos[pet_id]}"
+                    )
+                
+                novo_status = st.selectbox("Novo status:", ["Disponível", "Adotado", "Em Tratamento"], key="status_em_massa")
+                
+                if st.button("✅ Aplicar status à seleção", disabled=not selecionados):
+                    st.session_state.status_em_massa_pendente = (list(selecionados), novo_status)
+                
+                pendente = st.session_state.get('status_em_massa_pendente')
+                
+                if pendente:
+                    ids_pendentes, status_pendente = pendente
+                    st.warning(f"⚠️ Alterar o status de {len(ids_pendentes)} pets para '{status_pendente}'? Esta ação não pode ser desfeita.")
+                    col_confirmar, col_cancelar = st.columns(2)
+                    
+                    with col_confirmar:
+                        confirmar = st.button("✔️ Confirmar", key="confirmar_status_em_massa")
+                    with col_cancelar:
+                        if st.button("✖️ Cancelar", key="cancelar_status_em_massa"):
+                            del st.session_state.status_em_massa_pendente
+                            st.rerun()
+                    
+                    if confirmar:
+                        del st.session_state.status_em_massa_pendente
+                        atualizados = update_pets_status(ids_pendentes, status_pendente)
+                        
+                        if atualizados:
+                            st.success(f"✅ Status '{status_pendente}' aplicado a {atualizados} pets.")
+                            log_activity(st.session_state.user_id, "bulk_status", f"Status '{status_pendente}' aplicado a {atualizados} pets")
+                            if atualizados < len(ids_pendentes):
+                                st.warning(f"⚠️ {len(ids_pendentes) - atualizados} pets não foram encontrados (podem ter sido removidos).")
+                            else:
+                                st.rerun()
+                        else:
+                            st.error("❌ Nenhum pet foi atualizado: os selecionados não existem mais ou houve um erro.")
+        
         # Estatísticas detalhadas
         st.subheader("📈 Estatísticas Detalhadas")
         
@@ -2984,12 +3035,13 @@ def visualizar_dados(df):
             if 'bairro' in df.columns and 'adotado' in df.columns:
                 st.subheader("🏘️ Performance por Bairro")
                 
-                bairro_performance = df.groupby('bairro').agg({
-                    'adotado': ['count', 'sum', 'mean'],
-                    'score_adocao': 'mean' if 'score_adocao' in df.columns else 'count'
+                agregados_bairro = with_pets_metrics(get_pets_aggregates(('bairro',), df, filters={})).set_index('bairro')
+                bairro_performance = pd.DataFrame({
+                    'Total': agregados_bairro['total'],
+                    'Adotados': agregados_bairro['adotados'],
+                    'Taxa_Adocao': agregados_bairro['taxa_adocao'],
+                    'Score_Medio': agregados_bairro['score_medio'] if 'score_adocao' in df.columns else agregados_bairro['total']
                 }).round(2)
-                
-                bairro_performance.columns = ['Total', 'Adotados', 'Taxa_Adocao', 'Score_Medio']
                 bairro_performance['Eficiencia'] = (
                     bairro_performance['Taxa_Adocao'] * bairro_performance['Score_Medio']
                 ).round(2)
@@ -3020,7 +3072,7 @@ def visualizar_dados(df):
                     
                     # Encoding para variáveis categóricas
                     for col in df_behavioral.columns:
-                        if df_behavioral[col].dtype == 'object':
+                        if df_behavioral[col].dtype in ['object', 'category']:
                             le = LabelEncoder()
                             df_behavioral[col] = le.fit_transform(df_behavioral[col].astype(str))
                     
@@ -3064,28 +3116,22 @@ def visualizar_dados(df):
             
             if 'bairro' in df.columns:
                 # Mapa de calor regional
-                regional_stats = df.groupby('bairro').agg({
-                    'adotado': ['count', 'sum', 'mean'] if 'adotado' in df.columns else 'count',
-                    'score_adocao': 'mean' if 'score_adocao' in df.columns else 'count',
-                    'idade': 'mean' if 'idade' in df.columns else 'count'
-                }).round(2)
+                agregados_bairro = with_pets_metrics(get_pets_aggregates(('bairro',), df, filters={}))
+                regional_stats = pd.DataFrame({
+                    'bairro': agregados_bairro['bairro'],
+                    'Total_Pets': agregados_bairro['total']
+                })
                 
-                # Flatten column names
-                regional_stats.columns = ['_'.join(col).strip() for col in regional_stats.columns.values]
-                regional_stats = regional_stats.reset_index()
-                
-                # Renomear colunas para melhor legibilidade
-                column_mapping = {
-                    'adotado_count': 'Total_Pets',
-                    'adotado_sum': 'Total_Adotados',
-                    'adotado_mean': 'Taxa_Adocao',
-                    'score_adocao_mean': 'Score_Medio',
-                    'idade_mean': 'Idade_Media'
-                }
+                # Colunas derivadas só quando o dado existe
+                if 'adotado' in df.columns:
+                    regional_stats['Total_Adotados'] = agregados_bairro['adotados']
+                    regional_stats['Taxa_Adocao'] = agregados_bairro['taxa_adocao']
+                if 'score_adocao' in df.columns:
+                    regional_stats['Score_Medio'] = agregados_bairro['score_medio']
+                if 'idade' in df.columns:
+                    regional_stats['Idade_Media'] = agregados_bairro['idade_media']
                 
-                for old_col, new_col in column_mapping.items():
-                    if old_col in regional_stats.columns:
-                        regional_stats[new_col] = regional_stats[old_col]
+                regional_stats = regional_stats.round(2)
                 
                 # Gráficos regionais
                 col1, col2 = st.columns(2)
@@ -3168,14 +3214,14 @@ def visualizar_dados(df):
                 for chart_type in chart_types:
                     if chart_type == "Barras" and len(variables_to_analyze) >= 1:
                         var = variables_to_analyze[0]
-                        if df[var].dtype == 'object':
+                        if df[var].dtype in ['object', 'category']:
                             counts = df[var].value_counts()
                             fig = px.bar(x=counts.index, y=counts.values, title=f"Distribuição de {var}")
                             st.plotly_chart(fig, use_container_width=True)
                     
                     elif chart_type == "Pizza" and len(variables_to_analyze) >= 1:
                         var = variables_to_analyze[0]
-                        if df[var].dtype == 'object':
+                        if df[var].dtype in ['object', 'category']:
                             counts = df[var].value_counts()
                             fig = px.pie(values=counts.values, names=counts.index, title=f"Proporção de {var}")
                             st.plotly_chart(fig, use_container_width=True)
@@ -3293,7 +3339,7 @@ def visualizar_dados(df):
             
             if group_by_column and analyze_column:
                 # Análise de grupos personalizada
-                group_analysis = df.groupby(group_by_column)[analyze_column].agg([
+                group_analysis = df.groupby(group_by_column, observed=True)[analyze_column].agg([
                     'count', 'mean', 'median', 'std', 'min', 'max'
                 ]).round(2)
                 
@@ -3553,7 +3599,7 @@ def visualizar_dados(df):
                         
                         # Aba de resumo por categoria
                         if 'tipo_pet' in df.columns:
-                            summary_by_type = df.groupby('tipo_pet').agg({
+                            summary_by_type = df.groupby('tipo_pet', observed=True).agg({
                                 'adotado': ['count', 'sum', 'mean'] if 'adotado' in df.columns else 'count',
                                 'idade': 'mean' if 'idade' in df.columns else 'count'
                             }).round(2)
@@ -4031,7 +4077,7 @@ def exportar_importar_dados(df):
         
         # Seleção de dados
         if incluir_filtrados:
-            df_exportar = st.session_state.get("df_filtrado", df)
+            df_exportar = drop_unused_categories(load_filtered_pets(st.session_state.get("filtros_ativos", {}), df))
         else:
             df_exportar = df
         
@@ -4094,7 +4140,7 @@ def exportar_importar_dados(df):
                             
                             # Aba de resumos
                             if 'tipo_pet' in df_exportar.columns:
-                                resumo_tipos = df_exportar.groupby('tipo_pet').agg({
+                                resumo_tipos = df_exportar.groupby('tipo_pet', observed=True).agg({
                                     'adotado': ['count', 'sum', 'mean'] if 'adotado' in df_exportar.columns else 'count',
                                     'idade': 'mean' if 'idade' in df_exportar.columns else 'count'
                                 }).round(2)
@@ -4190,8 +4236,8 @@ def exportar_importar_dados(df):
         # Upload de arquivo
         uploaded_file = st.file_uploader(
             "Escolha um arquivo para importar:",
-            type=["csv", "xlsx", "json", "xml", "parquet"],
-            help="Formatos suportados: CSV, Excel, JSON, XML, Parquet"
+            type=["csv", "xlsx", "json", "xml", "parquet", "arrow", "feather"],
+            help="Formatos suportados: CSV, Excel, JSON, XML, Parquet, Arrow/Feather"
         )
         
         if uploaded_file is not None:
@@ -4199,6 +4245,11 @@ def exportar_importar_dados(df):
             file_type = uploaded_file.name.split(".")[-1].lower()
             
             try:
+                # Gerador de blocos para a importação; sem leitor em streaming, o arquivo inteiro vira blocos
+                read_chunks = None
+                # Schema do arquivo Parquet/Arrow (importação colunar, sem pandas)
+                arrow_schema = None
+                
                 # Carregar dados baseado no tipo
                 if file_type == "csv":
                     col1, col2 = st.columns(2)
@@ -4209,13 +4260,16 @@ def exportar_importar_dados(df):
                         has_header = st.checkbox("Primeira linha é cabeçalho", value=True)
                         skip_lines = st.number_input("Pular linhas:", min_value=0, value=0)
                     
-                    df_importado = pd.read_csv(
-                        uploaded_file, 
-                        sep=separador, 
-                        encoding=encoding,
-                        header=0 if has_header else None,
-                        skiprows=skip_lines
-                    )
+                    csv_options = {
+                        'sep': separador,
+                        'encoding': encoding,
+                        'header': 0 if has_header else None,
+                        'skiprows': skip_lines
+                    }
+                    
+                    # Prévia com as primeiras linhas; a importação lê o arquivo em blocos
+                    df_importado = pd.read_csv(uploaded_file, nrows=PREVIEW_ROWS, **csv_options)
+                    read_chunks = lambda: iter_csv_chunks(uploaded_file, **csv_options)
                 
                 elif file_type == "xlsx":
                     # Opções Excel
@@ -4232,31 +4286,36 @@ def exportar_importar_dados(df):
                     except:
                         pass
                     
-                    df_importado = pd.read_excel(
-                        uploaded_file,
-                        sheet_name=sheet_name,
-                        header=0 if has_header else None,
-                        skiprows=skip_rows
-                    )
+                    # Planilha lida em modo somente leitura: a prévia só percorre as primeiras linhas
+                    excel_options = {
+                        'sheet_name': sheet_name,
+                        'header': has_header,
+                        'skip_rows': int(skip_rows)
+                    }
+                    df_importado = first_chunk(iter_excel_chunks(uploaded_file, chunk_rows=PREVIEW_ROWS, **excel_options))
+                    read_chunks = lambda: iter_excel_chunks(uploaded_file, **excel_options)
                 
                 elif file_type == "json":
-                    import json
-                    json_data = json.load(uploaded_file)
-                    
-                    # Detectar estrutura do JSON
-                    if isinstance(json_data, dict) and 'data' in json_data:
-                        df_importado = pd.DataFrame(json_data['data'])
-                    elif isinstance(json_data, list):
-                        df_importado = pd.DataFrame(json_data)
-                    else:
-                        df_importado = pd.json_normalize(json_data)
+                    # Array de registros, envelope {"data": [...]} ou objeto único, lidos incrementalmente
+                    df_importado = first_chunk(iter_json_chunks(uploaded_file, chunk_rows=PREVIEW_ROWS))
+                    read_chunks = lambda: iter_json_chunks(uploaded_file)
                 
-                elif file_type == "parquet":
-                    df_importado = pd.read_parquet(uploaded_file)
+                elif file_type == "xml":
+                    # Cada filho do elemento raiz é um registro (campos em atributos ou subelementos)
+                    df_importado = first_chunk(iter_xml_chunks(uploaded_file, chunk_rows=PREVIEW_ROWS))
+                    read_chunks = lambda: iter_xml_chunks(uploaded_file)
                 
+                elif file_type in ("parquet", "arrow", "feather"):
+                    arrow_schema = read_arrow_schema(uploaded_file)
+                    df_importado = first_chunk(iter_arrow_chunks(uploaded_file, chunk_rows=PREVIEW_ROWS))
+                
+                if read_chunks is None:
+                    read_chunks = lambda: iter_frame_chunks(df_importado)
+                    
                 # Mostrar prévia dos dados importados
                 st.subheader("👀 Prévia dos Dados Importados")
-                st.info(f"📊 **{len(df_importado)} registros** e **{len(df_importado.columns)} colunas** detectados.")
+                st.info(f"📊 Prévia dos primeiros **{len(df_importado)} registros** e **{len(df_importado.columns)} colunas** "
+                        f"(arquivo de {uploaded_file.size / 1024 / 1024:.1f} MB, importado em blocos).")
                 
                 # Mostrar amostra dos dados
                 col1, col2 = st.columns([2, 1])
@@ -4268,7 +4327,7 @@ def exportar_importar_dados(df):
                     # Informações sobre as colunas
                     st.write("**Informações das Colunas:**")
                     for col in df_importado.columns:
-                        dtype = str(df_importado[col].dtype)
+                        dtype = str(arrow_schema.field(col).type) if arrow_schema is not None else str(df_importado[col].dtype)
                         null_count = df_importado[col].isnull().sum()
                         st.write(f"• **{col}**: {dtype} ({null_count} nulos)")
                 
@@ -4313,9 +4372,13 @@ def exportar_importar_dados(df):
                     
                     validation_issues = []
                     
+                    # Parquet/Arrow: tipos validados pelo schema do arquivo
+                    if arrow_schema is not None:
+                        validation_issues.extend(arrow_schema_issues(arrow_schema, mapping))
+                    
                     # Validar tipos de dados
                     for sys_col, imp_col in mapping.items():
-                        if sys_col in ['idade', 'peso', 'score_adocao', 'sociabilidade', 'energia']:
+                        if arrow_schema is None and sys_col in ['idade', 'peso', 'score_adocao', 'sociabilidade', 'energia']:
                             if not pd.api.types.is_numeric_dtype(df_importado[imp_col]):
                                 try:
                                     pd.to_numeric(df_importado[imp_col], errors='coerce')
@@ -4350,38 +4413,54 @@ def exportar_importar_dados(df):
                     create_backup = st.checkbox("Criar backup antes da importação", value=True)
                 
                 with col3:
-                    batch_size = st.number_input("Tamanho do lote:", min_value=10, max_value=1000, value=100)
+                    batch_size = st.number_input("Tamanho do lote:", min_value=10, max_value=5000, value=500)
+                    duplicate_mode = st.selectbox(
+                        "Registros duplicados:",
+                        ["Ignorar", "Atualizar o existente", "Importar mesmo assim"],
+                        help="Compara o conteúdo de cada registro com os pets cadastrados e com as linhas anteriores do arquivo."
+                    )
+                
+                if import_mode == "Atualizar existentes":
+                    natural_key = st.multiselect(
+                        "Chave natural (identifica o pet existente):",
+                        list(mapping.keys()),
+                        default=[col for col in DEFAULT_NATURAL_KEY if col in mapping],
+                        help="Registros com a mesma chave atualizam o pet existente; os demais são inseridos."
+                    )
                 
                 # Botão de importação
                 if st.button("🚀 Iniciar Importação", use_container_width=True):
                     with st.spinner("Processando importação..."):
                         try:
-                            # Aplicar mapeamento
-                            df_mapped = pd.DataFrame()
-                            
-                            for sys_col, imp_col in mapping.items():
-                                df_mapped[sys_col] = df_importado[imp_col]
-                            
-                            # Adicionar campos obrigatórios se não existirem
-                            if 'created_by' not in df_mapped.columns:
-                                df_mapped['created_by'] = st.session_state.user_id
-                            
-                            if 'data_registro' not in df_mapped.columns:
-                                df_mapped['data_registro'] = datetime.datetime.now()
+                            user_id = st.session_state.user_id
                             
-                            # Validação adicional
-                            if validate_data:
-                                # Converter tipos de dados
-                                numeric_cols = ['idade', 'peso', 'score_adocao', 'sociabilidade', 'energia']
-                                for col in numeric_cols:
-                                    if col in df_mapped.columns:
-                                        df_mapped[col] = pd.to_numeric(df_mapped[col], errors='coerce')
+                            def prepare_chunk(chunk):
+                                """Aplica mapeamento e validação a um bloco e gera o payload."""
+                                # Aplicar mapeamento
+                                df_mapped = pd.DataFrame(
+                                    {sys_col: chunk.get(imp_col) for sys_col, imp_col in mapping.items()},
+                                    index=chunk.index
+                                )
                                 
-                                # Remover registros com dados críticos ausentes
-                                required_cols = ['nome', 'tipo_pet']
-                                for col in required_cols:
-                                    if col in df_mapped.columns:
-                                        df_mapped = df_mapped.dropna(subset=[col])
+                                # Adicionar campos obrigatórios se não existirem
+                                if 'created_by' not in df_mapped.columns:
+                                    df_mapped['created_by'] = user_id
+                                
+                                # Validação adicional
+                                if validate_data:
+                                    # Converter tipos de dados
+                                    numeric_cols = ['idade', 'peso', 'score_adocao', 'sociabilidade', 'energia']
+                                    for col in numeric_cols:
+                                        if col in df_mapped.columns:
+                                            df_mapped[col] = pd.to_numeric(df_mapped[col], errors='coerce')
+                                    
+                                    # Remover registros com dados críticos ausentes
+                                    required_cols = ['nome', 'tipo_pet']
+                                    for col in required_cols:
+                                        if col in df_mapped.columns:
+                                            df_mapped = df_mapped.dropna(subset=[col])
+                                
+                                return prepare_import_records(df_mapped, columns=list(df_mapped.columns))
                             
                             # Criar backup se solicitado
                             if create_backup:
@@ -4389,44 +4468,70 @@ def exportar_importar_dados(df):
                                 df.to_csv(f"data/{backup_filename}", index=False)
                                 st.info(f"💾 Backup criado: {backup_filename}")
                             
-                            # Executar importação
-                            conn = sqlite3.connect(DATABASE_PATH)
+                            if import_mode == "Atualizar existentes" and not natural_key:
+                                st.error("❌ Selecione ao menos uma coluna para a chave natural.")
+                                st.stop()
                             
-                            if import_mode == "Substituir todos os dados":
-                                # Limpar tabela existente
-                                conn.execute("DELETE FROM pets")
-                                conn.commit()
+                            if arrow_schema is not None:
+                                schema_issues = arrow_schema_issues(arrow_schema, mapping)
+                                if schema_issues:
+                                    st.error("❌ Tipos incompatíveis no arquivo: ajuste o mapeamento ou ignore as colunas.")
+                                    st.stop()
+                                
+                                # Parquet/Arrow: lê só as colunas mapeadas e converte no próprio Arrow
+                                chunks = iter_arrow_batches(uploaded_file, columns=sorted(set(mapping.values())))
+                                prepare = ArrowRecordsPreparer(
+                                    mapping,
+                                    constants={'created_by': user_id},
+                                    required=['nome', 'tipo_pet'] if validate_data else ()
+                                )
+                            else:
+                                chunks = read_chunks()
+                                prepare = prepare_chunk
                             
-                            # Inserir dados em lotes
-                            success_count = 0
-                            error_count = 0
+                            # Executar importação: cada bloco é gravado em lotes de batch_size assim que é lido
+                            modos = {
+                                "Adicionar novos registros": 'insert',
+                                "Substituir todos os dados": 'replace',
+                                "Atualizar existentes": 'upsert'
+                            }
+                            progress_bar = st.progress(0.0)
                             
-                            for i in range(0, len(df_mapped), batch_size):
-                                batch = df_mapped.iloc[i:i+batch_size]
-                                
-                                for _, row in batch.iterrows():
-                                    try:
-                                        # Preparar dados para inserção
-                                        columns = ', '.join(row.index)
-                                        placeholders = ', '.join(['?' for _ in row])
-                                        values = tuple(row.values)
-                                        
-                                        query = f"INSERT INTO pets ({columns}) VALUES ({placeholders})"
-                                        conn.execute(query, values)
-                                        success_count += 1
-                                        
-                                    except Exception as e:
-                                        error_count += 1
-                                        st.error(f"Erro na linha {i}: {str(e)}")
-                                
-                                # Commit em lotes
-                                conn.commit()
-                                
-                                # Mostrar progresso
-                                progress = min((i + batch_size) / len(df_mapped), 1.0)
-                                st.progress(progress)
+                            def update_progress(consumed, total):
+                                progress_bar.progress(min(consumed / total, 1.0) if total else 1.0)
+                            
+                            report = run_pets_import(
+                                chunks,
+                                prepare=prepare,
+                                mode=modos[import_mode],
+                                batch_size=int(batch_size),
+                                natural_key=natural_key if import_mode == "Atualizar existentes" else DEFAULT_NATURAL_KEY,
+                                duplicates={
+                                    "Ignorar": 'skip',
+                                    "Atualizar o existente": 'upsert',
+                                    "Importar mesmo assim": 'keep'
+                                }[duplicate_mode],
+                                progress=update_progress
+                            )
+                            
+                            success_count = report.success_count
+                            error_count = report.error_count
                             
-                            conn.close()
+                            if import_mode == "Atualizar existentes" or report.updated:
+                                st.info(f"🔄 {report.updated} registros atualizados e {report.inserted} inseridos.")
+                            elif report.replaced is False:
+                                st.error("❌ Alguns lotes falharam; a substituição foi desfeita e os dados anteriores foram mantidos.")
+                            
+                            if report.duplicates:
+                                linhas = ", ".join(str(line) for line in report.duplicate_lines[:10])
+                                if report.duplicates > 10:
+                                    linhas += ", ..."
+                                st.info(f"🔁 {report.duplicates} registros duplicados não foram gravados (linhas {linhas}).")
+                            
+                            for error in report.errors[:5]:
+                                st.error(error)
+                            if error_count > 5:
+                                st.error(f"... e mais {error_count - 5} erros.")
                             
                             # Registrar atividade
                             log_activity(
@@ -4545,13 +4650,12 @@ def main():
                 
                 # Mostrar spinner de login automático
                 with st.spinner(f"🔄 Entrando automaticamente como {login_data['name']}..."):
-                    time.sleep(1)
-                    is_authenticated, user_id, role = authenticate_user(email, login_data['password'])
+                    is_authenticated, user_id, role, user_info = authenticate_user(email, login_data['password'])
                     
                     if is_authenticated:
                         st.session_state.user_id = user_id
                         st.session_state.user_role = role
-                        st.session_state.user_info = get_user_info(user_id)
+                        st.session_state.user_info = user_info
                         st.session_state.session_id = str(uuid.uuid4())
                         
                         # Atualizar último login
@@ -4921,9 +5025,17 @@ def main():
     # Carregar dados do banco de dados
     df = load_data_from_db()
     
+    # Avisar quando o Supabase está indisponível e os dados vêm do cache
+    snapshot_status = get_pets_snapshot_status()
+    if snapshot_status['stale'] and not df.empty:
+        loaded_at = snapshot_status['loaded_at']
+        loaded_text = loaded_at.strftime('%d/%m/%Y %H:%M:%S') if loaded_at else "cópia local"
+        st.warning(f"⚠️ Supabase indisponível. Exibindo dados em cache ({loaded_text}); alterações recentes podem não aparecer.")
+    elif snapshot_status['error'] and df.empty:
+        st.error(f"❌ Não foi possível carregar os pets: {snapshot_status['error']}")
+    
     # Adicionar barra lateral para filtros e navegação
     df_filtrado = apply_filters(df)
-    st.session_state.df_filtrado = df_filtrado
     
     # Menu de navegação principal expandido
     st.sidebar.markdown("## 🚀 Navegação Principal")
@@ -4986,20 +5098,23 @@ def main():
     if not df.empty:
         st.sidebar.markdown("## 📈 Estatísticas Rápidas")
         
+        # Totais agregados no banco (cacheados até a próxima escrita)
+        metricas = get_pets_metrics(df, filters={})
+        
         with st.sidebar.container():
             # Criar métricas com containers visuais
             col1, col2 = st.sidebar.columns(2)
             
             with col1:
-                st.metric("🐾 Total de Pets", len(df))
+                st.metric("🐾 Total de Pets", metricas['total'])
             
             with col2:
                 pets_filtrados = len(df_filtrado)
                 st.metric("🔍 Filtrados", pets_filtrados)
             
             if 'adotado' in df.columns:
-                adotados = df['adotado'].sum()
-                taxa_adocao = (adotados / len(df)) * 100 if len(df) > 0 else 0
+                adotados = metricas['adotados']
+                taxa_adocao = metricas['taxa_adocao'] * 100 if metricas['total'] > 0 else 0
                 
                 col1, col2 = st.sidebar.columns(2)
                 with col1:
@@ -5007,9 +5122,8 @@ def main():
                 with col2:
                     st.metric("📊 Taxa (%)", f"{taxa_adocao:.1f}")
             
-            if 'score_adocao' in df.columns and not df['score_adocao'].isna().all():
-                score_medio = df['score_adocao'].mean()
-                st.metric("⭐ Score Médio", f"{score_medio:.2f}")
+            if 'score_adocao' in df.columns and pd.notna(metricas['score_medio']):
+                st.metric("⭐ Score Médio", f"{metricas['score_medio']:.2f}")
     
     # Informações de login salvo
     if st.session_state.saved_logins:
@@ -5051,7 +5165,7 @@ def main():
     
     with col1:
         if st.button("🔄 Atualizar", use_container_width=True, key="system_refresh"):
-            st.cache_data.clear()
+            invalidate_pets_cache()
             st.success("✅ Sistema atualizado!")
             time.sleep(0.5)
             st.rerun()
@@ -5084,7 +5198,9 @@ def main():
     
     # Status do sistema
     system_status = "🟢 Online"
-    if df.empty:
+    if snapshot_status['stale']:
+        system_status = "🟠 Offline (cache)"
+    elif df.empty:
         system_status = "🟡 Sem dados"
     
     user_name = st.session_state.user_info.get('full_name', 'Usuário')
@@ -5111,7 +5227,7 @@ def main():
         if menu_opcao == "Dashboard":
             display_dashboard(df, df_filtrado)
         elif menu_opcao == "Visualizar Dados":
-            visualizar_dados(df)
+            visualizar_dados(df, df_filtrado)
         elif menu_opcao == "Adicionar Pet":
             adicionar_pet()
         elif menu_opcao == "Análises Avançadas":
@@ -5357,7 +5473,7 @@ def generate_smart_notifications(df):
         
         # 3. Distribuição por região
         if 'regiao' in df_temp.columns:
-            regiao_counts = df_temp['regiao'].value_counts()
+            regiao_counts = get_pets_aggregates(('regiao',), df_temp, filters={}).set_index('regiao')['total'].sort_values(ascending=False)
             if len(regiao_counts) > 0:
                 regiao_dominante = regiao_counts.index[0]
                 porcentagem = (regiao_counts.iloc[0] / len(df_temp)) * 100
@@ -5449,29 +5565,10 @@ def generate_smart_notifications(df):
 def load_pets_data():
     """Carrega dados dos pets do Supabase."""
     try:
-        result = supabase.table('pets_analytics').select('*').execute()
+        # Datas, números e flags já chegam tipados pelo schema de pets_analytics
+        df = get_pets_snapshot()
         
-        if result.data:
-            df = pd.DataFrame(result.data)
-            
-            # Garantir que as colunas de data sejam datetime
-            date_columns = ['created_at', 'updated_at']
-            for col in date_columns:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-            
-            # Garantir que colunas numéricas sejam tratadas corretamente
-            numeric_columns = ['idade', 'peso', 'score_adocao', 'custo_mensal', 'risco_abandono']
-            for col in numeric_columns:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # Garantir que colunas booleanas sejam tratadas corretamente
-            boolean_columns = ['adotado', 'castrado', 'microchip', 'compatibilidade_criancas', 'compatibilidade_pets']
-            for col in boolean_columns:
-                if col in df.columns:
-                    df[col] = df[col].astype(bool, errors='ignore')
-            
+        if not df.empty:
             return df
         else:
             # Retornar DataFrame vazio com colunas padrão
@@ -5886,12 +5983,17 @@ def mapa_interativo(df):
         )
     
     with col3:
+        tipos_disponiveis = df['tipo_pet'].dropna().unique().tolist() if 'tipo_pet' in df.columns else []
         filter_type = st.multiselect(
             "Filtrar por Tipo:",
-            df['tipo_pet'].unique().tolist() if 'tipo_pet' in df.columns else [],
-            default=df['tipo_pet'].unique().tolist() if 'tipo_pet' in df.columns else []
+            tipos_disponiveis,
+            default=tipos_disponiveis
         )
     
+    # Todos os tipos marcados equivale a não filtrar (pets sem tipo continuam no mapa)
+    if set(filter_type) == set(tipos_disponiveis):
+        filter_type = []
+    
     # Filtrar dados se necessário
     df_map = df.copy()
     if filter_type:
@@ -5910,32 +6012,41 @@ def mapa_interativo(df):
         'Santo Antônio de Lisboa': (-27.5000, -48.5333)
     }
     
-    # Preparar dados do mapa
+    # Preparar dados do mapa: somas de células do cubo de agregados, recortadas pelos tipos escolhidos
+    filtro_tipos = {'tipo_pet': filter_type} if filter_type and 'tipo_pet' in df.columns else {}
+    
     if map_type == "Densidade de Pets":
-        map_data = df_map.groupby('bairro').size().reset_index(name='count')
+        agregados = get_pets_aggregates(('bairro',), df_map, filters=filtro_tipos)
+        map_data = pd.DataFrame({'bairro': agregados['bairro'], 'count': agregados['total']})
         color_column = 'count'
         title = "Densidade de Pets por Bairro"
         
     elif map_type == "Taxa de Adoção" and 'adotado' in df_map.columns:
-        map_data = df_map.groupby('bairro')['adotado'].mean().reset_index()
-        map_data['adotado'] = map_data['adotado'] * 100  # Converter para percentual
+        agregados = with_pets_metrics(get_pets_aggregates(('bairro',), df_map, filters=filtro_tipos))
+        map_data = pd.DataFrame({'bairro': agregados['bairro'], 'adotado': agregados['taxa_adocao'] * 100})  # Percentual
         color_column = 'adotado'
         title = "Taxa de Adoção por Bairro (%)"
         
     elif map_type == "Score Médio" and 'score_adocao' in df_map.columns:
-        map_data = df_map.groupby('bairro')['score_adocao'].mean().reset_index()
+        agregados = with_pets_metrics(get_pets_aggregates(('bairro',), df_map, filters=filtro_tipos))
+        map_data = pd.DataFrame({'bairro': agregados['bairro'], 'score_adocao': agregados['score_medio']})
         color_column = 'score_adocao'
         title = "Score Médio de Adoção por Bairro"
         
     else:
         # Distribuição por tipo
-        map_data = df_map.groupby(['bairro', 'tipo_pet']).size().reset_index(name='count')
+        agregados = get_pets_aggregates(('bairro', 'tipo_pet'), df_map, filters=filtro_tipos)
+        map_data = pd.DataFrame({
+            'bairro': agregados['bairro'],
+            'tipo_pet': agregados['tipo_pet'],
+            'count': agregados['total']
+        })
         color_column = 'count'
         title = "Distribuição de Tipos por Bairro"
     
     # Adicionar coordenadas
-    map_data['lat'] = map_data['bairro'].map(lambda x: bairros_coords.get(x, (-27.5969, -48.5495))[0])
-    map_data['lon'] = map_data['bairro'].map(lambda x: bairros_coords.get(x, (-27.5969, -48.5495))[1])
+    map_data['lat'] = map_data['bairro'].map(lambda x: bairros_coords.get(x, (-27.5969, -48.5495))[0]).astype(float)
+    map_data['lon'] = map_data['bairro'].map(lambda x: bairros_coords.get(x, (-27.5969, -48.5495))[1]).astype(float)
     
     # Criar mapa
     if map_type != "Distribuição por Tipo":
@@ -6030,7 +6141,7 @@ def mapa_interativo(df):
         df_temporal['mes'] = df_temporal['data_registro'].dt.to_period('M')
         
         # Evolução mensal por bairro
-        evolucao_bairros = df_temporal.groupby(['mes', 'bairro']).size().reset_index(name='registros')
+        evolucao_bairros = df_temporal.groupby(['mes', 'bairro'], observed=True).size().reset_index(name='registros')
         evolucao_bairros['mes_str'] = evolucao_bairros['mes'].astype(str)
         
         # Selecionar top 5 bairros para visualização
@@ -6663,29 +6774,13 @@ def admin_panel():
             with col1:
                 if st.button("💾 Salvar Alterações", use_container_width=True):
                     try:
-                        # Comparar dataframes para encontrar alterações
-                        changes_made = False
-                        
-                        for index, row in edited_df.iterrows():
-                            original_row = df_filtered.iloc[index]
-                            
-                            # Verificar se houve mudanças
-                            if row['role'] != original_row['role'] or row['full_name'] != original_row['full_name']:
-                                # Atualizar no Supabase
-                                update_data = {
-                                    'role': row['role'],
-                                    'full_name': row['full_name']
-                                }
-                                
-                                result = supabase.table('users_analytics').update(update_data).eq('id', row['id']).execute()
-                                
-                                if result.data:
-                                    changes_made = True
-                                else:
-                                    st.error(f"Erro ao atualizar usuário {row['email']}")
+                        # Comparar dataframes para encontrar alterações (só as linhas alteradas vão ao banco,
+                        # agrupadas por valores iguais: mudar o papel de vários usuários é um único update)
+                        changes = diff_frames(df_filtered, edited_df, key='id', columns=['role', 'full_name'])
+                        changes_made = bulk_update('users_analytics', changes) > 0
                         
                         if changes_made:
-                            st.success("✅ Alterações salvas com sucesso!")
+                            st.success(f"✅ Alterações salvas com sucesso! ({len(changes)} usuários atualizados)")
                             log_activity(st.session_state.user_id, "update_users", "Atualizou dados de usuários")
                             time.sleep(1)
                             st.rerun()
@@ -0,0 +1,94 @@
+# config/bulk_updates.py
+import json
+
+import numpy as np
+import pandas as pd
+
+from config.database import get_supabase
+from config.resilience import execute_with_retry
+
+# Ids por requisição no filtro .in_ (limita o tamanho da URL)
+BULK_UPDATE_IDS_PER_REQUEST = 500
+
+def _plain(value):
+    """Converte escalares numpy/pandas em tipos Python serializáveis (NaN/NaT viram None)."""
+    if value is None or (not isinstance(value, (list, dict, str)) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value.item() if hasattr(value, 'item') else value
+
+def diff_frames(original, edited, key='id', columns=None):
+    """Compara o DataFrame editado com o original, casando as linhas pela coluna `key`.
+
+    Retorna {valor da chave: {coluna: novo valor}} só com as linhas e colunas
+    que mudaram (NaN igual a NaN). Linhas adicionadas ou removidas no editor
+    não entram.
+    """
+    if columns is None:
+        columns = [col for col in edited.columns if col != key and col in original.columns]
+    else:
+        columns = [col for col in columns if col in original.columns and col in edited.columns]
+
+    if not columns or original.empty or edited.empty:
+        return {}
+
+    before = original.drop_duplicates(subset=[key]).set_index(key)[columns]
+    after = edited.dropna(subset=[key]).drop_duplicates(subset=[key]).set_index(key)[columns]
+    common = after.index.intersection(before.index)
+    before, after = before.loc[common], after.loc[common]
+
+    changed = pd.DataFrame(False, index=common, columns=columns)
+    for col in columns:
+        old = before[col].astype(object)
+        new = after[col].astype(object)
+        changed[col] = ~((old == new) | (old.isna() & new.isna())).to_numpy(dtype=bool)
+
+    rows = changed.any(axis=1).to_numpy()
+    changes = {}
+
+    for pk, flags in zip(common[rows], changed.to_numpy()[rows]):
+        values = after.loc[pk]
+        changes[_plain(pk)] = {col: _plain(values[col]) for col, flag in zip(columns, flags) if flag}
+
+    return changes
+
+def bulk_update(table, changes, key='id', client=None):
+    """Grava {chave: {coluna: valor}} agrupando as linhas que recebem os mesmos valores.
+
+    Cada grupo vira um único update(...).in_(key, ids), em fatias de até
+    BULK_UPDATE_IDS_PER_REQUEST ids; aplicar o mesmo status a mil pets custa
+    duas requisições. Retorna o número de linhas que o banco atualizou (ids
+    inexistentes não contam).
+    """
+    groups = {}
+
+    for pk, values in changes.items():
+        if not values:
+            continue
+        signature = json.dumps(values, sort_keys=True, default=str)
+        groups.setdefault(signature, (values, []))[1].append(pk)
+
+    updated = 0
+
+    for values, ids in groups.values():
+        for start in range(0, len(ids), BULK_UPDATE_IDS_PER_REQUEST):
+            chunk = ids[start:start + BULK_UPDATE_IDS_PER_REQUEST]
+
+            def build_query(chunk=chunk, values=values):
+                active = client or get_supabase()
+
+                if active is None:
+                    raise ConnectionError("Cliente Supabase indisponível")
+
+                return active.table(table).update(values).in_(key, chunk)
+
+            # Update com valores fixos é idempotente: pode repetir
+            result = execute_with_retry(table, build_query)
+            updated += len(result.data or [])
+
+    return updated
+
+def same_values_changes(ids, values):
+    """Monta o dicionário de alterações para aplicar os mesmos valores a vários ids."""
+    return {_plain(pk): dict(values) for pk in np.unique(np.asarray(list(ids)))}
@@ -0,0 +1,203 @@
+# config/bulk_writer.py
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config.database import get_supabase
+from config.resilience import SUPABASE_MAX_RETRIES, CircuitOpenError, execute_with_retry, is_transient_error
+
+# Requisições simultâneas por importação (limitado também pelo pool de clientes)
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "4"))
+
+# Tamanho inicial e limites do lote, latência alvo por lote (s) e teto do corpo JSON (bytes)
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "500"))
+BULK_BATCH_MIN = int(os.getenv("BULK_BATCH_MIN", "50"))
+BULK_BATCH_MAX = int(os.getenv("BULK_BATCH_MAX", "5000"))
+BULK_TARGET_LATENCY = float(os.getenv("BULK_TARGET_LATENCY", "1.0"))
+BULK_MAX_PAYLOAD_BYTES = int(os.getenv("BULK_MAX_PAYLOAD_BYTES", str(2 * 1024 * 1024)))
+
+# Recusas que valem para o lote inteiro, não para uma linha: corpo inválido,
+# coluna ou tabela inexistente, permissão/RLS. Bissetar só repetiria o erro
+BATCH_FATAL_CODES = {'PGRST102', 'PGRST204', 'PGRST205', '42501', '42703', '42P01'}
+
+class AdaptiveBatchSizer:
+    """Ajusta o tamanho do lote pela latência observada e pelo tamanho do corpo da requisição.
+
+    Cresce 50% enquanto os lotes ficam abaixo de metade da latência alvo e
+    encolhe proporcionalmente quando a ultrapassam; nunca passa do número de
+    linhas que cabe em max_payload_bytes pela média de bytes por linha.
+    """
+
+    def __init__(self, initial=BULK_BATCH_SIZE, minimum=BULK_BATCH_MIN, maximum=BULK_BATCH_MAX,
+                 target_latency=BULK_TARGET_LATENCY, max_payload_bytes=BULK_MAX_PAYLOAD_BYTES):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.size = min(max(initial, self.minimum), self.maximum)
+        self.target_latency = target_latency
+        self.max_payload_bytes = max_payload_bytes
+        self.bytes_per_row = None
+        self._lock = threading.Lock()
+
+    def next_size(self):
+        with self._lock:
+            return self.size
+
+    def observe(self, rows, seconds, payload_bytes):
+        if rows <= 0:
+            return
+
+        with self._lock:
+            per_row = payload_bytes / rows
+            self.bytes_per_row = per_row if self.bytes_per_row is None else 0.8 * self.bytes_per_row + 0.2 * per_row
+
+            size = self.size
+            if seconds > self.target_latency:
+                size = int(size * self.target_latency / seconds)
+            elif seconds < self.target_latency / 2:
+                size = int(size * 1.5)
+
+            payload_cap = int(self.max_payload_bytes / max(self.bytes_per_row, 1))
+            self.size = max(self.minimum, min(size, self.maximum, payload_cap))
+
+class BulkWriteResult:
+    """Resultado de uma escrita em massa: linhas gravadas e falhas por índice do registro."""
+
+    def __init__(self):
+        self.written = 0
+        self.rows = []
+        self.failed = []
+        self.requests = 0
+
+    @property
+    def failed_count(self):
+        return len(self.failed)
+
+def _error_message(error):
+    return getattr(error, 'message', None) or str(error)
+
+def _is_batch_error(error):
+    """Indica se a recusa não depende das linhas enviadas (não adianta bissetar)."""
+    return (
+        isinstance(error, CircuitOpenError)
+        or is_transient_error(error)
+        or str(getattr(error, 'code', None)) in BATCH_FATAL_CODES
+    )
+
+class BulkWriter:
+    """Grava registros em lotes concorrentes, com tamanho adaptativo e bisseção de lotes rejeitados.
+
+    Um lote recusado pelo banco (erro de validação) é dividido ao meio
+    recursivamente até isolar as linhas ruins; as demais são gravadas. Falhas
+    de rede, circuito aberto e recusas do lote inteiro (BATCH_FATAL_CODES)
+    marcam o lote inteiro como falho; só upserts (idempotentes) são repetidos
+    antes disso.
+    """
+
+    def __init__(self, table, workers=BULK_WORKERS, sizer=None, client=None):
+        self.table = table
+        self.workers = max(1, workers)
+        self.sizer = sizer or AdaptiveBatchSizer()
+        self._client = client
+
+    def _build(self, operation, batch, options):
+        def build_query():
+            active = self._client or get_supabase()
+
+            if active is None:
+                raise ConnectionError("Cliente Supabase indisponível")
+
+            query = active.table(self.table)
+            if operation == 'upsert':
+                return query.upsert(batch, on_conflict=options['on_conflict'])
+            return query.insert(batch)
+
+        return build_query
+
+    def _send(self, operation, batch, options):
+        """Envia um lote e mede latência e tamanho; retorna as linhas devolvidas."""
+        payload_bytes = len(json.dumps(batch, default=str))
+        started = time.monotonic()
+        result = execute_with_retry(self.table, self._build(operation, batch, options), retries=options['retries'])
+        self.sizer.observe(len(batch), time.monotonic() - started, payload_bytes)
+        return result.data or []
+
+    def _attempt(self, operation, indices, records, options):
+        """Envia um lote; retorna (linhas gravadas, None) ou (None, erro)."""
+        try:
+            return self._send(operation, [records[i] for i in indices], options), None
+        except Exception as e:
+            return None, e
+
+    def _write_batch(self, operation, indices, records, options):
+        """Grava um lote; se rejeitado, bisseta. Retorna (linhas gravadas, [(índice, erro)], requisições)."""
+        rows, error = self._attempt(operation, indices, records, options)
+
+        if error is None:
+            return rows, [], 1
+
+        rows, failed, requests = self._bisect(operation, indices, records, options, error)
+        return rows, failed, requests + 1
+
+    def _bisect(self, operation, indices, records, options, error):
+        """Divide um lote recusado com `error`; retorna o mesmo que _write_batch, sem contar o envio recusado."""
+        if len(indices) == 1 or _is_batch_error(error):
+            return [], [(i, _error_message(error)) for i in indices], 0
+
+        middle = len(indices) // 2
+        rows, failed, requests = [], [], 0
+
+        for half in (indices[:middle], indices[middle:]):
+            half_rows, half_failed, half_requests = self._write_batch(operation, half, records, options)
+            rows.extend(half_rows)
+            failed.extend(half_failed)
+            requests += half_requests
+
+        return rows, failed, requests
+
+    def _run(self, operation, records, options, progress=None):
+        result = BulkWriteResult()
+        total = len(records)
+
+        if total == 0:
+            return result
+
+        done = 0
+        position = 0
+        pending = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"bulk-{self.table}") as executor:
+            while position < total or pending:
+                # Manter no máximo `workers` lotes em voo, cada um com o tamanho atual
+                while position < total and len(pending) < self.workers:
+                    size = self.sizer.next_size()
+                    indices = list(range(position, min(position + size, total)))
+                    future = executor.submit(self._write_batch, operation, indices, records, options)
+                    pending[future] = len(indices)
+                    position += len(indices)
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    size = pending.pop(future)
+                    done += size
+                    rows, failed, requests = future.result()
+                    result.rows.extend(rows)
+                    result.written += size - len(failed)
+                    result.failed.extend(failed)
+                    result.requests += requests
+
+                if progress is not None:
+                    progress(done, total)
+
+        result.failed.sort()
+        return result
+
+    def insert(self, records, progress=None):
+        """Insere os registros; progress(feitos, total) é chamado a cada lote concluído."""
+        return self._run('insert', records, {'retries': 0}, progress)
+
+    def upsert(self, records, on_conflict='id', progress=None):
+        """Grava os registros com upsert pela(s) coluna(s) de on_conflict, com retentativas."""
+        return self._run('upsert', records, {'on_conflict': on_conflict, 'retries': SUPABASE_MAX_RETRIES}, progress)
@@ -1,9 +1,25 @@
 # config/database.py
 import os
+import threading
+import time
 import streamlit as st
 from supabase import create_client, Client
 from typing import Optional
 
+# "supabase" (padrão) ou "local" para o backend em processo de config/local_backend.py
+PETCARE_BACKEND = os.getenv("PETCARE_BACKEND", "supabase").lower()
+
+# Quantidade de clientes (cada um com sua própria sessão HTTP keep-alive)
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "4"))
+
+# Intervalo (segundos) entre verificações de saúde de cada cliente do pool
+SUPABASE_HEALTH_CHECK_INTERVAL = float(os.getenv("SUPABASE_HEALTH_CHECK_INTERVAL", "60"))
+
+# Conexões ociosas mantidas abertas por sessão HTTP e por quanto tempo
+SUPABASE_KEEPALIVE_CONNECTIONS = int(os.getenv("SUPABASE_KEEPALIVE_CONNECTIONS", "10"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "30"))
+
 def get_supabase_credentials():
     """Obtém credenciais do Supabase de diferentes fontes."""
     supabase_url = None
@@ -43,8 +59,24 @@ def get_supabase_credentials():
     
     return supabase_url, supabase_key
 
+def _create_http_client():
+    """Cria a sessão HTTP de um cliente do pool, com keep-alive configurado."""
+    import httpx
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_keepalive_connections=SUPABASE_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY
+        ),
+        timeout=SUPABASE_TIMEOUT
+    )
+
 def get_supabase_client() -> Optional[Client]:
     """Retorna cliente do Supabase configurado."""
+    if PETCARE_BACKEND == "local":
+        from config.local_backend import get_local_client
+        return get_local_client()
+    
     try:
         supabase_url, supabase_key = get_supabase_credentials()
         
@@ -52,7 +84,14 @@ def get_supabase_client() -> Optional[Client]:
             print("⚠️ Credenciais do Supabase não encontradas")
             return None
         
-        client = create_client(supabase_url, supabase_key)
+        try:
+            from supabase import ClientOptions
+            options = ClientOptions(httpx_client=_create_http_client())
+            client = create_client(supabase_url, supabase_key, options=options)
+        except (ImportError, TypeError):
+            # Versões do supabase-py sem httpx_client em ClientOptions
+            client = create_client(supabase_url, supabase_key)
+        
         print("✅ Cliente Supabase criado com sucesso")
         return client
         
@@ -60,17 +99,117 @@ def get_supabase_client() -> Optional[Client]:
         print(f"❌ Erro ao criar cliente Supabase: {str(e)}")
         return None
 
-# Variável global que será inicializada sob demanda
-_supabase_client: Optional[Client] = None
+def is_connection_error(error) -> bool:
+    """Indica se o erro é de transporte (conexão caída, timeout) e não da consulta."""
+    try:
+        import httpx
+        if isinstance(error, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+class SupabaseClientPool:
+    """Pool de clientes Supabase criados sob demanda e protegidos por lock.
+    
+    Cada thread de script do Streamlit fica presa a um slot do pool (round-robin),
+    reaproveitando a mesma sessão HTTP keep-alive entre reruns. Os clientes são
+    verificados periodicamente e recriados quando morrem.
+    """
+    
+    def __init__(self, factory, size=SUPABASE_POOL_SIZE, health_check_interval=SUPABASE_HEALTH_CHECK_INTERVAL):
+        self._factory = factory
+        self.size = max(1, size)
+        self.health_check_interval = health_check_interval
+        self._clients = [None] * self.size
+        self._checked_at = [0.0] * self.size
+        self._slot_locks = [threading.Lock() for _ in range(self.size)]
+        self._lock = threading.Lock()
+        self._next_slot = 0
+        self._local = threading.local()
+    
+    def _slot_for_thread(self):
+        slot = getattr(self._local, "slot", None)
+        
+        if slot is None:
+            with self._lock:
+                slot = self._next_slot
+                self._next_slot = (self._next_slot + 1) % self.size
+            self._local.slot = slot
+        
+        return slot
+    
+    def _is_healthy(self, client) -> bool:
+        try:
+            client.table('users_analytics').select('id').limit(1).execute()
+            return True
+        except Exception as e:
+            return not is_connection_error(e)
+    
+    def acquire(self) -> Optional[Client]:
+        """Retorna o cliente do slot da thread atual, criando ou recriando se preciso."""
+        slot = self._slot_for_thread()
+        
+        with self._slot_locks[slot]:
+            client = self._clients[slot]
+            now = time.monotonic()
+            
+            if client is not None and now - self._checked_at[slot] >= self.health_check_interval:
+                if not self._is_healthy(client):
+                    print("⚠️ Conexão com o Supabase perdida; recriando cliente")
+                    self._close(client)
+                    client = None
+                self._checked_at[slot] = now
+            
+            if client is None:
+                client = self._factory()
+                self._clients[slot] = client
+                self._checked_at[slot] = now
+            
+            return client
+    
+    def discard(self, client):
+        """Descarta um cliente com conexão morta; o slot cria outro na próxima aquisição."""
+        for slot in range(self.size):
+            with self._slot_locks[slot]:
+                if self._clients[slot] is client:
+                    self._clients[slot] = None
+                    self._close(client)
+    
+    @staticmethod
+    def _close(client):
+        try:
+            client.postgrest.session.close()
+        except Exception:
+            pass
+
+# Pool global criado sem conexões; os clientes nascem no primeiro uso
+_client_pool = SupabaseClientPool(lambda: get_supabase_client())
 
 def get_supabase():
-    """Obtém o cliente Supabase (singleton pattern)."""
-    global _supabase_client
+    """Obtém um cliente Supabase do pool (criado sob demanda, seguro entre threads)."""
+    return _client_pool.acquire()
+
+def discard_supabase_client(client):
+    """Remove do pool um cliente cuja conexão falhou."""
+    if client is not None:
+        _client_pool.discard(client)
+
+class SupabaseProxy:
+    """Encaminha cada acesso (supabase.table(...), supabase.rpc(...)) ao cliente do pool.
     
-    if _supabase_client is None:
-        _supabase_client = get_supabase_client()
+    Mantém compatível o código que importa `supabase` como variável global, sem
+    criar conexão nenhuma no import do módulo.
+    """
     
-    return _supabase_client
+    def __getattr__(self, name):
+        client = get_supabase()
+        
+        if client is None:
+            raise ConnectionError("Cliente Supabase indisponível")
+        
+        return getattr(client, name)
 
 # Para compatibilidade com código existente
-supabase = get_supabase()
\ No newline at end of file
+supabase = SupabaseProxy()
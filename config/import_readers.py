@@ -0,0 +1,351 @@
+# config/import_readers.py
+"""Leitores em blocos para a importação de pets.
+
+Cada leitor gera (DataFrame, consumido, total): o bloco com índice contínuo
+desde o início do arquivo (para os erros "Linha N") e o progresso em bytes
+(ou linhas, para DataFrames já carregados). Nenhum leitor mantém mais de um
+bloco em memória. Parquet e Arrow IPC também podem ser lidos como
+RecordBatches (iter_arrow_batches), sem passar pelo pandas.
+"""
+import io
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import load_workbook
+
+# Linhas por bloco na importação em streaming
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "20000"))
+
+# Caracteres lidos por vez pelo leitor de JSON
+JSON_READ_SIZE = 1024 * 1024
+
+def _stream_size(file):
+    size = getattr(file, 'size', None)
+
+    if size is None:
+        position = file.tell()
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(position)
+
+    return size
+
+def _frame(records, start):
+    """Monta o bloco com índice contínuo a partir da posição `start` no arquivo."""
+    return pd.DataFrame.from_records(records, index=pd.RangeIndex(start, start + len(records)))
+
+def first_chunk(chunks):
+    """Retorna só o primeiro bloco de um leitor (prévia), sem ler o restante do arquivo."""
+    try:
+        chunk, _, _ = next(chunks)
+        return chunk
+    except StopIteration:
+        return pd.DataFrame()
+    finally:
+        chunks.close()
+
+def iter_csv_chunks(file, chunk_rows=IMPORT_CHUNK_ROWS, **read_options):
+    """Lê um CSV em blocos de chunk_rows linhas; gera (DataFrame, bytes consumidos, bytes totais)."""
+    file.seek(0)
+    total = _stream_size(file)
+
+    with pd.read_csv(file, chunksize=chunk_rows, **read_options) as reader:
+        for chunk in reader:
+            yield chunk, file.tell(), total
+
+def _header_names(values):
+    """Nomes de colunas no padrão do pandas: células vazias viram 'Unnamed: N'."""
+    return [str(value) if value is not None else f"Unnamed: {i}" for i, value in enumerate(values)]
+
+def iter_excel_chunks(file, sheet_name=0, header=True, skip_rows=0, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Lê uma aba de .xlsx em blocos com o openpyxl em modo somente leitura.
+
+    As linhas são lidas do XML sob demanda, sem montar a planilha inteira
+    (só a tabela de strings compartilhadas é carregada ao abrir).
+    sheet_name aceita o nome ou a posição da aba; linhas totalmente
+    vazias são ignoradas. O progresso é medido em bytes do arquivo lidos.
+    """
+    file.seek(0)
+    total = _stream_size(file)
+    workbook = load_workbook(file, read_only=True, data_only=True)
+
+    try:
+        sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        rows = sheet.iter_rows(values_only=True)
+
+        for _ in range(skip_rows):
+            if next(rows, None) is None:
+                return
+
+        columns = None
+        if header:
+            first = next(rows, None)
+            if first is None:
+                return
+            columns = _header_names(first)
+
+        batch = []
+        start = 0
+
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+
+            if columns is None:
+                columns = list(range(len(row)))
+
+            # Linhas do modo somente leitura podem vir mais curtas ou mais longas que o cabeçalho
+            row = tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row))
+            batch.append(row)
+
+            if len(batch) >= chunk_rows:
+                yield pd.DataFrame.from_records(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch))), file.tell(), total
+                start += len(batch)
+                batch = []
+
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=columns, index=pd.RangeIndex(start, start + len(batch))), total, total
+
+    finally:
+        workbook.close()
+
+def iter_frame_chunks(df, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Divide um DataFrame já carregado em blocos; o progresso é medido em linhas."""
+    total = len(df)
+
+    for start in range(0, total, chunk_rows):
+        end = min(start + chunk_rows, total)
+        yield df.iloc[start:end], end, total
+
+class _JsonStream:
+    """Texto JSON lido sob demanda, com decodificação de um valor por vez (raw_decode)."""
+
+    def __init__(self, file, encoding):
+        self.binary = file
+        self.text = io.TextIOWrapper(file, encoding=encoding)
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        data = self.text.read(JSON_READ_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        # Descartar o que já foi consumido para a memória não crescer com o arquivo
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Próximo caractere não branco (sem consumir) ou '' no fim do arquivo."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"JSON inválido: esperado {' ou '.join(chars)}, encontrado {char or 'fim do arquivo'!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decodifica o próximo valor completo, lendo mais texto se ele estiver cortado."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # Um número no fim do buffer pode continuar no próximo trecho
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def close(self):
+        # Devolver o arquivo ao chamador sem fechá-lo
+        self.text.detach()
+
+def _iter_json_array(stream):
+    """Gera os elementos de um array JSON cujo '[' acabou de ser consumido."""
+    if stream.peek() == ']':
+        stream.pos += 1
+        return
+
+    while True:
+        record = stream.value()
+        if not isinstance(record, dict):
+            raise ValueError(f"JSON inválido: cada registro deve ser um objeto, encontrado {type(record).__name__}")
+        yield record
+        if stream.expect(',]') == ']':
+            return
+
+def iter_json_records(file, encoding='utf-8'):
+    """Percorre os registros de um JSON sem montar a árvore inteira.
+
+    Aceita um array de objetos, o envelope {"data": [...]} (as demais chaves do
+    envelope são ignoradas) ou um único objeto, tratado como um registro.
+    Gera (registro, bytes consumidos, bytes totais).
+    """
+    file.seek(0)
+    total = _stream_size(file)
+    stream = _JsonStream(file, encoding)
+
+    try:
+        start = stream.expect('[{')
+
+        if start == '[':
+            for record in _iter_json_array(stream):
+                yield record, file.tell(), total
+            return
+
+        # Objeto: procurar a chave "data" com um array; sem ela, o objeto é o registro
+        fields = {}
+
+        if stream.peek() == '}':
+            stream.pos += 1
+        else:
+            while True:
+                key = stream.value()
+                stream.expect(':')
+
+                if key == 'data' and stream.peek() == '[':
+                    stream.pos += 1
+                    for record in _iter_json_array(stream):
+                        yield record, file.tell(), total
+                    return
+
+                fields[key] = stream.value()
+
+                if stream.expect(',}') == '}':
+                    break
+
+        yield pd.json_normalize(fields).iloc[0].to_dict(), total, total
+
+    finally:
+        stream.close()
+
+def iter_xml_records(file):
+    """Percorre os registros de um XML com iterparse: cada filho do elemento raiz é um registro.
+
+    Os campos vêm dos atributos e dos elementos filhos do registro
+    (<pet id="1"><nome>Rex</nome></pet>). Elementos já lidos são descartados.
+    Gera (registro, bytes consumidos, bytes totais).
+    """
+    file.seek(0)
+    total = _stream_size(file)
+    depth = 0
+    root = None
+
+    for event, elem in ET.iterparse(file, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = elem
+            continue
+
+        depth -= 1
+
+        if depth == 1:
+            record = dict(elem.attrib)
+            for child in elem:
+                record[child.tag] = child.text.strip() if child.text and child.text.strip() else None
+
+            # Liberar o registro e a referência da raiz a ele
+            elem.clear()
+            root.clear()
+
+            if record:
+                yield record, file.tell(), total
+
+def iter_record_chunks(records, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Agrupa registros (registro, consumido, total) em blocos de chunk_rows linhas."""
+    batch = []
+    start = 0
+    consumed, total = 0, 0
+
+    for record, consumed, total in records:
+        batch.append(record)
+
+        if len(batch) >= chunk_rows:
+            yield _frame(batch, start), consumed, total
+            start += len(batch)
+            batch = []
+
+    if batch:
+        yield _frame(batch, start), consumed, total
+
+def iter_json_chunks(file, chunk_rows=IMPORT_CHUNK_ROWS, encoding='utf-8'):
+    """Lê um JSON grande em blocos de chunk_rows registros."""
+    return iter_record_chunks(iter_json_records(file, encoding), chunk_rows)
+
+def iter_xml_chunks(file, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Lê um XML grande em blocos de chunk_rows registros."""
+    return iter_record_chunks(iter_xml_records(file), chunk_rows)
+
+# Assinaturas no início do arquivo
+PARQUET_MAGIC = b'PAR1'
+ARROW_MAGIC = b'ARROW1'
+
+def _is_parquet(file):
+    file.seek(0)
+    magic = file.read(len(PARQUET_MAGIC))
+    file.seek(0)
+    return magic == PARQUET_MAGIC
+
+def read_arrow_schema(file):
+    """Schema de um Parquet ou Arrow IPC (Feather v2), lido só dos metadados do arquivo."""
+    if _is_parquet(file):
+        return pq.ParquetFile(file).schema_arrow
+    return pa.ipc.open_file(file).schema
+
+def iter_arrow_batches(file, columns=None, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Lê Parquet ou Arrow IPC em RecordBatches de até chunk_rows linhas.
+
+    Só as colunas em `columns` são lidas do arquivo (None lê todas). Gera
+    (batch, linhas lidas, total de linhas).
+    """
+    if _is_parquet(file):
+        parquet = pq.ParquetFile(file)
+        total = parquet.metadata.num_rows
+        batches = parquet.iter_batches(batch_size=chunk_rows, columns=columns)
+    else:
+        reader = pa.ipc.open_file(file)
+        total = reader.count_rows()
+        batches = (
+            reader.get_batch(i).select(columns) if columns is not None else reader.get_batch(i)
+            for i in range(reader.num_record_batches)
+        )
+
+    consumed = 0
+
+    for batch in batches:
+        # Lotes do IPC têm o tamanho com que foram escritos; fatiar não copia
+        for start in range(0, max(batch.num_rows, 1), chunk_rows):
+            piece = batch.slice(start, chunk_rows)
+            if piece.num_rows == 0:
+                continue
+            consumed += piece.num_rows
+            yield piece, consumed, total
+
+def iter_arrow_chunks(file, columns=None, chunk_rows=IMPORT_CHUNK_ROWS):
+    """Lê Parquet ou Arrow IPC em blocos de DataFrame (prévia e caminho comum de importação)."""
+    start = 0
+
+    for batch, consumed, total in iter_arrow_batches(file, columns, chunk_rows):
+        chunk = batch.to_pandas()
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk, consumed, total
@@ -0,0 +1,623 @@
+# config/local_backend.py
+"""Backend local em processo que imita o subconjunto da API do Supabase usado pelo app.
+
+Selecionado com PETCARE_BACKEND=local (ver config.database.get_supabase_client).
+Os dados ficam em SQLite (em memória por padrão, ou no arquivo de
+PETCARE_LOCAL_DB), sem rede, para benchmarks reprodutíveis e trabalho offline.
+"""
+import datetime
+import json
+import os
+import re
+import sqlite3
+import threading
+
+PETCARE_LOCAL_DB = os.getenv("PETCARE_LOCAL_DB", ":memory:")
+
+# Quantidade de pets sintéticos criados quando pets_analytics está vazia (0 = nenhum)
+PETCARE_LOCAL_SEED_PETS = int(os.getenv("PETCARE_LOCAL_SEED_PETS", "0"))
+
+# Chave estrangeira usada nos selects embutidos: (tabela, tabela_relacionada) -> coluna
+FOREIGN_KEYS = {
+    ('login_logs_analytics', 'users_analytics'): 'user_id',
+    ('activity_logs_analytics', 'users_analytics'): 'user_id',
+    ('pets_analytics', 'users_analytics'): 'created_by',
+}
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def _quote(name):
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Identificador inválido: {name}")
+    return f'"{name}"'
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+def _split_top_level(text, sep=','):
+    """Divide por `sep` ignorando separadores entre parênteses ou aspas."""
+    parts, depth, quoted, current = [], 0, False, []
+
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+
+        if char == sep and depth == 0 and not quoted:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+
+    if current:
+        parts.append(''.join(current).strip())
+
+    return [part for part in parts if part]
+
+class LocalResponse:
+    """Resposta no formato do postgrest-py (data e count)."""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class LocalQuery:
+    """Construtor de consultas encadeável, equivalente ao request builder do postgrest-py."""
+
+    _OPERATORS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+    def __init__(self, store, table):
+        self._store = store
+        self._table = table
+        self._action = 'select'
+        self._columns = '*'
+        self._count = None
+        self._payload = None
+        self._on_conflict = ''
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+
+    # Ações
+    def select(self, *columns, count=None, head=None):
+        self._action = 'select'
+        self._columns = ','.join(columns) if columns else '*'
+        self._count = count
+        return self
+
+    def insert(self, json, **kwargs):
+        self._action = 'insert'
+        self._payload = json
+        return self
+
+    def upsert(self, json, on_conflict='', **kwargs):
+        self._action = 'upsert'
+        self._payload = json
+        self._on_conflict = on_conflict
+        return self
+
+    def update(self, json, **kwargs):
+        self._action = 'update'
+        self._payload = json
+        return self
+
+    def delete(self, **kwargs):
+        self._action = 'delete'
+        return self
+
+    # Filtros
+    def _add(self, column, op, value):
+        self._filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._add(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self._add(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self._add(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._add(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._add(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._add(column, 'lte', value)
+
+    def in_(self, column, values):
+        return self._add(column, 'in', list(values))
+
+    def is_(self, column, value):
+        return self._add(column, 'is', value)
+
+    def or_(self, filters, reference_table=None):
+        """Suporta a forma 'col.op.valor,col.op.valor' (op: eq, neq, gt, gte, lt, lte, is)."""
+        alternatives = []
+
+        for part in _split_top_level(filters):
+            column, op, value = part.split('.', 2)
+            value = value.strip('"')
+            if op == 'is':
+                value = None if value == 'null' else value
+            alternatives.append((column, op, value))
+
+        self._filters.append(('', 'or', alternatives))
+        return self
+
+    # Ordenação e paginação
+    def order(self, column, desc=False, nullsfirst=None, foreign_table=None):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size, foreign_table=None):
+        self._limit = size
+        return self
+
+    def offset(self, size):
+        self._offset = size
+        return self
+
+    def range(self, start, end, foreign_table=None):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def execute(self):
+        return self._store.execute(self)
+
+class LocalRpc:
+    """Chamada de função do banco, equivalente ao client.rpc(nome, params) do supabase-py."""
+
+    def __init__(self, store, name, params):
+        self._store = store
+        self._name = name
+        self._params = params or {}
+
+    def execute(self):
+        return self._store.call(self._name, self._params)
+
+class LocalStore:
+    """Armazena as tabelas em SQLite, criando tabelas e colunas conforme os dados chegam."""
+
+    def __init__(self, path=PETCARE_LOCAL_DB):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.RLock()
+        self._columns = {}
+        # Tipos que o SQLite não preserva (bool e JSON), para reconverter na leitura
+        self._kinds = {}
+        self._load_catalog()
+
+    def _load_catalog(self):
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS _column_kinds (tbl TEXT, col TEXT, kind TEXT, PRIMARY KEY (tbl, col))"
+        )
+        tables = [row[0] for row in self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE '\\_%' ESCAPE '\\' AND name != 'sqlite_sequence'"
+        )]
+        for table in tables:
+            self._columns[table] = [row[1] for row in self._conn.execute(f"PRAGMA table_info({_quote(table)})")]
+        for table, col, kind in self._conn.execute("SELECT tbl, col, kind FROM _column_kinds"):
+            self._kinds.setdefault(table, {})[col] = kind
+
+    # Esquema dinâmico
+    def _ensure_table(self, table):
+        if table not in self._columns:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {_quote(table)} (id INTEGER PRIMARY KEY AUTOINCREMENT)"
+            )
+            self._columns[table] = ['id']
+
+    def _ensure_columns(self, table, row):
+        self._ensure_table(table)
+        kinds = self._kinds.setdefault(table, {})
+
+        for col, value in row.items():
+            if col not in self._columns[table]:
+                self._conn.execute(f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(col)}")
+                self._columns[table].append(col)
+
+            if col not in kinds and value is not None:
+                if isinstance(value, bool):
+                    kind = 'bool'
+                elif isinstance(value, (dict, list)):
+                    kind = 'json'
+                else:
+                    continue
+                kinds[col] = kind
+                self._conn.execute("INSERT OR REPLACE INTO _column_kinds VALUES (?, ?, ?)", (table, col, kind))
+
+    @staticmethod
+    def _to_sql(value):
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, default=str)
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if hasattr(value, 'item'):
+            # Escalares numpy
+            return value.item()
+        return value
+
+    def _from_sql(self, table, row):
+        kinds = self._kinds.get(table, {})
+
+        for col, kind in kinds.items():
+            value = row.get(col)
+            if value is None:
+                continue
+            if kind == 'bool':
+                row[col] = bool(value)
+            elif kind == 'json' and isinstance(value, str):
+                row[col] = json.loads(value)
+
+        return row
+
+    def _with_defaults(self, table, row, now):
+        # Escalares numpy/pandas viram tipos Python antes de detectar bool/JSON
+        row = {col: value.item() if hasattr(value, 'item') else value for col, value in row.items()}
+        row.setdefault('created_at', now)
+        row.setdefault('updated_at', now)
+        if table.endswith('_logs_analytics'):
+            row.setdefault('timestamp', now)
+        return row
+
+    # Tradução dos filtros
+    def _condition(self, table, column, op, value):
+        if column not in self._columns[table]:
+            self._ensure_columns(table, {column: None})
+
+        col = _quote(column)
+
+        if op == 'in':
+            if not value:
+                return "0", []
+            return f"{col} IN ({', '.join('?' for _ in value)})", [self._to_sql(v) for v in value]
+
+        if op == 'is':
+            if value is None or value == 'null':
+                return f"{col} IS NULL", []
+            return f"{col} IS ?", [self._to_sql(value)]
+
+        return f"{col} {LocalQuery._OPERATORS[op]} ?", [self._to_sql(value)]
+
+    def _where(self, query):
+        clauses, params = [], []
+
+        for column, op, value in query._filters:
+            if op == 'or':
+                parts = [self._condition(query._table, *alternative) for alternative in value]
+                clauses.append('(' + ' OR '.join(part[0] for part in parts) + ')')
+                for part in parts:
+                    params.extend(part[1])
+            else:
+                clause, clause_params = self._condition(query._table, column, op, value)
+                clauses.append(clause)
+                params.extend(clause_params)
+
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    # Execução
+    def execute(self, query):
+        with self._lock:
+            self._ensure_table(query._table)
+            handler = getattr(self, f"_execute_{query._action}")
+            result = handler(query)
+            self._conn.commit()
+            return result
+
+    def _select_rows(self, query, columns='*'):
+        where, params = self._where(query)
+        sql = f"SELECT {columns} FROM {_quote(query._table)}{where}"
+
+        order = [(col, desc) for col, desc in query._order if col in self._columns[query._table]]
+        if order:
+            sql += ' ORDER BY ' + ', '.join(f"{_quote(col)} {'DESC' if desc else 'ASC'}" for col, desc in order)
+
+        if query._limit is not None or query._offset is not None:
+            sql += f" LIMIT {int(query._limit if query._limit is not None else -1)}"
+            if query._offset:
+                sql += f" OFFSET {int(query._offset)}"
+
+        cursor = self._conn.execute(sql, params)
+        names = [description[0] for description in cursor.description]
+        return [self._from_sql(query._table, dict(zip(names, values))) for values in cursor.fetchall()]
+
+    def _execute_select(self, query):
+        fields = _split_top_level(query._columns or '*')
+        embedded = [field for field in fields if '(' in field]
+        plain = [field for field in fields if '(' not in field]
+
+        if not plain or '*' in plain:
+            columns = '*'
+        else:
+            for col in plain:
+                if col not in self._columns[query._table]:
+                    self._ensure_columns(query._table, {col: None})
+            columns = ', '.join(_quote(col) for col in plain)
+
+        rows = self._select_rows(query, columns)
+
+        for field in embedded:
+            self._embed(query._table, rows, field)
+
+        count = None
+        if query._count:
+            where, params = self._where(query)
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {_quote(query._table)}{where}", params).fetchone()[0]
+
+        return LocalResponse(rows, count)
+
+    def _embed(self, table, rows, field):
+        """Resolve selects embutidos como 'users_analytics(email)' pela chave estrangeira."""
+        relation, inner = field[:-1].split('(', 1)
+        relation = relation.strip()
+        fk = FOREIGN_KEYS.get((table, relation), 'user_id')
+        self._ensure_table(relation)
+
+        ids = sorted({row.get(fk) for row in rows if row.get(fk) is not None})
+        related = {}
+
+        if ids:
+            inner_columns = [col.strip() for col in inner.split(',') if col.strip()]
+            cursor = self._conn.execute(
+                f"SELECT * FROM {_quote(relation)} WHERE id IN ({', '.join('?' for _ in ids)})", ids
+            )
+            names = [description[0] for description in cursor.description]
+            for values in cursor.fetchall():
+                record = self._from_sql(relation, dict(zip(names, values)))
+                if inner_columns and '*' not in inner_columns:
+                    record = {col: record.get(col) for col in inner_columns}
+                related[record.get('id', values[0])] = record
+
+        for row in rows:
+            row[relation] = related.get(row.get(fk))
+
+    def _insert_many(self, table, records):
+        now = _now()
+        records = [self._with_defaults(table, record, now) for record in records]
+
+        for record in records:
+            self._ensure_columns(table, record)
+
+        inserted_ids = []
+        # Agrupar por conjunto de colunas para usar executemany
+        groups = {}
+        for record in records:
+            groups.setdefault(tuple(record.keys()), []).append(record)
+
+        for keys, group in groups.items():
+            sql = (
+                f"INSERT INTO {_quote(table)} ({', '.join(_quote(k) for k in keys)}) "
+                f"VALUES ({', '.join('?' for _ in keys)})"
+            )
+            if len(group) == 1:
+                cursor = self._conn.execute(sql, [self._to_sql(group[0][k]) for k in keys])
+                inserted_ids.append(cursor.lastrowid)
+            elif 'id' in keys:
+                self._conn.executemany(sql, ([self._to_sql(record[k]) for k in keys] for record in group))
+                inserted_ids.extend(record['id'] for record in group)
+            else:
+                # AUTOINCREMENT numera em sequência a partir de sqlite_sequence (sob o lock)
+                seq = self._conn.execute(
+                    "SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)
+                ).fetchone()
+                first = seq[0] if seq else 0
+                self._conn.executemany(sql, ([self._to_sql(record[k]) for k in keys] for record in group))
+                inserted_ids.extend(range(first + 1, first + 1 + len(group)))
+
+        return inserted_ids
+
+    def _fetch_by_ids(self, table, ids):
+        rows = []
+        ids = list(ids)
+
+        # Limite de parâmetros do SQLite
+        for start in range(0, len(ids), 900):
+            part = ids[start:start + 900]
+            cursor = self._conn.execute(
+                f"SELECT * FROM {_quote(table)} WHERE id IN ({', '.join('?' for _ in part)}) ORDER BY id", part
+            )
+            names = [description[0] for description in cursor.description]
+            rows.extend(self._from_sql(table, dict(zip(names, values))) for values in cursor.fetchall())
+
+        return rows
+
+    def _execute_insert(self, query):
+        records = query._payload if isinstance(query._payload, list) else [query._payload]
+        ids = self._insert_many(query._table, records)
+        return LocalResponse(self._fetch_by_ids(query._table, ids))
+
+    def _execute_upsert(self, query):
+        table = query._table
+        records = query._payload if isinstance(query._payload, list) else [query._payload]
+        keys = [col.strip() for col in (query._on_conflict or 'id').split(',') if col.strip()]
+        touched = []
+        to_insert = []
+
+        for record in records:
+            if not all(record.get(key) is not None for key in keys):
+                to_insert.append(record)
+                continue
+
+            self._ensure_columns(table, record)
+            where = ' AND '.join(f"{_quote(key)} = ?" for key in keys)
+            existing = self._conn.execute(
+                f"SELECT id FROM {_quote(table)} WHERE {where} LIMIT 1",
+                [self._to_sql(record[key]) for key in keys]
+            ).fetchone()
+
+            if existing is None:
+                to_insert.append(record)
+                continue
+
+            values = dict(record)
+            values.pop('id', None)
+            self._ensure_columns(table, values)
+            assignments = ', '.join(f"{_quote(col)} = ?" for col in values)
+            self._conn.execute(
+                f"UPDATE {_quote(table)} SET {assignments} WHERE id = ?",
+                [self._to_sql(v) for v in values.values()] + [existing[0]]
+            )
+            touched.append(existing[0])
+
+        touched.extend(self._insert_many(table, to_insert))
+        return LocalResponse(self._fetch_by_ids(table, touched))
+
+    def _execute_update(self, query):
+        table = query._table
+        values = dict(query._payload)
+        self._ensure_columns(table, values)
+
+        where, params = self._where(query)
+        ids = [row[0] for row in self._conn.execute(f"SELECT id FROM {_quote(table)}{where}", params)]
+
+        if ids:
+            assignments = ', '.join(f"{_quote(col)} = ?" for col in values)
+            for start in range(0, len(ids), 900):
+                part = ids[start:start + 900]
+                self._conn.execute(
+                    f"UPDATE {_quote(table)} SET {assignments} WHERE id IN ({', '.join('?' for _ in part)})",
+                    [self._to_sql(v) for v in values.values()] + part
+                )
+
+        return LocalResponse(self._fetch_by_ids(table, ids))
+
+    def _execute_delete(self, query):
+        table = query._table
+        where, params = self._where(query)
+        ids = [row[0] for row in self._conn.execute(f"SELECT id FROM {_quote(table)}{where}", params)]
+        rows = self._fetch_by_ids(table, ids)
+        self._conn.execute(f"DELETE FROM {_quote(table)}{where}", params)
+        return LocalResponse(rows)
+
+    # Funções (equivalentes às de config/sql)
+    AGGREGATE_DIMENSIONS = ('bairro', 'regiao', 'tipo_pet', 'adotado')
+
+    def call(self, name, params):
+        handler = getattr(self, f"_rpc_{name}", None)
+        if handler is None:
+            raise ValueError(f"Função não encontrada: {name}")
+
+        with self._lock:
+            return LocalResponse(handler(**params))
+
+    def _rpc_pets_aggregates(self, group_by=()):
+        """Mesmo resultado de public.pets_aggregates (config/sql/pets_aggregates.sql)."""
+        table = 'pets_analytics'
+        group_by = list(group_by or [])
+
+        invalid = [dim for dim in group_by if dim not in self.AGGREGATE_DIMENSIONS]
+        if invalid:
+            raise ValueError(f"Dimensão de agregação inválida: {invalid}")
+
+        self._ensure_table(table)
+        self._ensure_columns(table, {col: None for col in [*self.AGGREGATE_DIMENSIONS, 'idade', 'score_adocao', 'risco_abandono']})
+
+        dims = ', '.join(_quote(dim) for dim in group_by)
+        sql = (
+            f"SELECT {dims + ',' if dims else ''}"
+            " COUNT(*) AS total,"
+            " COALESCE(SUM(CASE WHEN adotado THEN 1 ELSE 0 END), 0) AS adotados,"
+            " SUM(idade) AS idade_sum, COUNT(idade) AS idade_count,"
+            " SUM(score_adocao) AS score_sum, COUNT(score_adocao) AS score_count,"
+            " COALESCE(SUM(CASE WHEN score_adocao > 4 THEN 1 ELSE 0 END), 0) AS score_alto,"
+            " SUM(risco_abandono) AS risco_sum, COUNT(risco_abandono) AS risco_count"
+            f" FROM {_quote(table)}"
+            f"{' GROUP BY ' + dims if dims else ''}"
+        )
+
+        cursor = self._conn.execute(sql)
+        names = [description[0] for description in cursor.description]
+        return [self._from_sql(table, dict(zip(names, values))) for values in cursor.fetchall()]
+
+class LocalClient:
+    """Cliente com a mesma interface usada do supabase-py: table() e rpc()."""
+
+    def __init__(self, path=PETCARE_LOCAL_DB):
+        self.store = LocalStore(path)
+
+    def table(self, name):
+        return LocalQuery(self.store, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None, **kwargs):
+        return LocalRpc(self.store, name, params)
+
+def seed_pets(client, n_pets, batch_size=10000, seed=42):
+    """Insere n_pets pets sintéticos (vetorizado com numpy) para testes de carga."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    bairros = ['Centro', 'Trindade', 'Canasvieiras', 'Ingleses', 'Lagoa da Conceição',
+               'Campeche', 'Pantano do Sul', 'Cachoeira do Bom Jesus', 'Santo Antônio de Lisboa']
+    tipos = ['Cachorro', 'Gato', 'Ave', 'Roedor', 'Réptil']
+    racas = ['SRD', 'Labrador', 'Poodle', 'Persa', 'Siamês', 'Canário', 'Hamster']
+    comportamentos = ['Calmo', 'Agitado', 'Brincalhão', 'Tímido', 'Sociável', 'Independente']
+    estados = ['Excelente', 'Bom', 'Regular', 'Necessita cuidados']
+    vacinacao = ['Em dia', 'Parcial', 'Pendente']
+    regioes = ['Centro', 'Norte', 'Sul', 'Leste', 'Oeste']
+
+    for start in range(0, n_pets, batch_size):
+        size = min(batch_size, n_pets - start)
+        score = np.round(rng.uniform(0.1, 5.0, size), 2)
+        adotado = rng.random(size) < score / 5.0
+        columns = {
+            'nome': [f"Pet_{start + i + 1}" for i in range(size)],
+            'tipo_pet': rng.choice(tipos, size, p=[0.5, 0.3, 0.1, 0.05, 0.05]),
+            'raca': rng.choice(racas, size),
+            'bairro': rng.choice(bairros, size),
+            'regiao': rng.choice(regioes, size),
+            'comportamento': rng.choice(comportamentos, size),
+            'estado_saude': rng.choice(estados, size),
+            'status_vacinacao': rng.choice(vacinacao, size),
+            'sexo': rng.choice(['Macho', 'Fêmea'], size),
+            'idade': np.round(rng.exponential(3, size).clip(0.1, 18), 1),
+            'peso': np.round(rng.uniform(0.2, 40, size), 1),
+            'sociabilidade': rng.integers(1, 6, size),
+            'energia': rng.integers(1, 6, size),
+            'nivel_atividade': rng.integers(1, 6, size),
+            'score_adocao': score,
+            'risco_abandono': np.round((1 - score / 5.0).clip(0, 1), 2),
+            'custo_mensal': np.round(rng.uniform(50, 400, size), 2),
+            'adotado': adotado,
+            'castrado': rng.random(size) < 0.7,
+            'status': np.where(adotado, 'Adotado', 'Disponível'),
+            'created_by': np.ones(size, dtype=int),
+        }
+        records = [
+            {key: values[i] for key, values in columns.items()}
+            for i in range(size)
+        ]
+        client.table('pets_analytics').insert(records).execute()
+
+_local_client = None
+_local_client_lock = threading.Lock()
+
+def get_local_client():
+    """Retorna o cliente local único do processo, semeando pets se PETCARE_LOCAL_SEED_PETS > 0."""
+    global _local_client
+
+    with _local_client_lock:
+        if _local_client is None:
+            client = LocalClient()
+
+            if PETCARE_LOCAL_SEED_PETS > 0:
+                existing = client.table('pets_analytics').select('id').limit(1).execute().data
+                if not existing:
+                    seed_pets(client, PETCARE_LOCAL_SEED_PETS)
+                    print(f"🌱 Backend local semeado com {PETCARE_LOCAL_SEED_PETS} pets")
+
+            _local_client = client
+
+        return _local_client
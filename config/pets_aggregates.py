@@ -0,0 +1,477 @@
+# config/pets_aggregates.py
+import itertools
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from config.database import get_supabase
+from config.pets_data import PETS_CACHE_TTL, PETS_TABLE, invalidate_pets_cache, pets_cache
+from config.pets_filters import PETS_FILTERS, normalize_filters
+from config.resilience import execute_with_retry, is_transient_error
+
+# Dimensões aceitas por public.pets_aggregates (config/sql/pets_aggregates.sql)
+AGGREGATE_DIMENSIONS = ('bairro', 'regiao', 'tipo_pet', 'adotado')
+
+# Somas e contagens devolvidas por célula; médias são derivadas delas, para
+# que células possam ser somadas (rollup) sem perder exatidão
+AGGREGATE_MEASURES = (
+    'total', 'adotados',
+    'idade_sum', 'idade_count',
+    'score_sum', 'score_count', 'score_alto',
+    'risco_sum', 'risco_count',
+)
+
+# Medidas que são somas de valores (as demais são contagens inteiras)
+_SUM_MEASURES = ('idade_sum', 'score_sum', 'risco_sum')
+
+# Colunas de uma linha que contam para as células: dimensões e valores medidos
+_ROW_COLUMNS = (*AGGREGATE_DIMENSIONS, 'idade', 'score_adocao', 'risco_abandono')
+
+# Filtros da sidebar que o cubo responde sozinho (igualdade sobre uma dimensão)
+CUBE_FILTERS = tuple(
+    key for key, (column, op) in PETS_FILTERS.items()
+    if op == 'eq' and column in AGGREGATE_DIMENSIONS
+)
+
+# Depois de uma falha da função do banco, segundos até tentá-la de novo (o cubo
+# sai do snapshot em memória nesse meio tempo): dobra a cada falha passageira
+# até o máximo, e vai direto ao máximo se a função não existir ou for negada
+AGGREGATES_RPC_RETRY_BASE = float(os.getenv("AGGREGATES_RPC_RETRY_BASE", "30"))
+AGGREGATES_RPC_RETRY_MAX = float(os.getenv("AGGREGATES_RPC_RETRY_MAX", "600"))
+
+def _check_dimensions(group_by):
+    group_by = tuple(group_by)
+    invalid = [dim for dim in group_by if dim not in AGGREGATE_DIMENSIONS]
+    if invalid:
+        raise ValueError(f"Dimensão de agregação inválida: {invalid}")
+    return group_by
+
+def _empty_aggregates(group_by):
+    return pd.DataFrame(columns=[*group_by, *AGGREGATE_MEASURES])
+
+def fetch_pets_aggregates(group_by=(), client=None):
+    """Pede ao banco os agregados de pets_analytics por group_by (só o resultado agregado trafega)."""
+    group_by = _check_dimensions(group_by)
+
+    def build_call():
+        active = client or get_supabase()
+
+        if active is None:
+            raise ConnectionError("Cliente Supabase indisponível")
+
+        return active.rpc('pets_aggregates', {'group_by': list(group_by)})
+
+    rows = execute_with_retry(PETS_TABLE, build_call).data or []
+
+    if not rows:
+        return _empty_aggregates(group_by)
+
+    agg = pd.DataFrame.from_records(rows)
+
+    for col in AGGREGATE_MEASURES:
+        agg[col] = pd.to_numeric(agg[col], errors='coerce').fillna(0)
+
+    return agg[[*group_by, *AGGREGATE_MEASURES]]
+
+def pets_aggregates_from_frame(df, group_by=(), dropna=True):
+    """Calcula os mesmos agregados de fetch_pets_aggregates sobre um DataFrame em memória.
+
+    dropna=False mantém as células com dimensão nula, como o GROUP BY do banco.
+    """
+    group_by = _check_dimensions(group_by)
+
+    if df.empty:
+        return _empty_aggregates(group_by)
+
+    def numeric(col):
+        if col not in df.columns:
+            return pd.Series(np.nan, index=df.index)
+        return pd.to_numeric(df[col], errors='coerce').astype(np.float64)
+
+    adotado = df['adotado'].fillna(False).astype(bool) if 'adotado' in df.columns else False
+    idade, score, risco = numeric('idade'), numeric('score_adocao'), numeric('risco_abandono')
+
+    work = pd.DataFrame({
+        'total': 1,
+        'adotados': np.asarray(adotado, dtype=np.int64) if 'adotado' in df.columns else 0,
+        'idade_sum': idade,
+        'idade_count': idade.notna().astype(np.int64),
+        'score_sum': score,
+        'score_count': score.notna().astype(np.int64),
+        'score_alto': (score > 4).astype(np.int64),
+        'risco_sum': risco,
+        'risco_count': risco.notna().astype(np.int64),
+    }, index=df.index)
+
+    if not group_by:
+        return work.sum().to_frame().T
+
+    for dim in group_by:
+        work[dim] = df[dim]
+
+    grouped = work.groupby(list(group_by), observed=True, dropna=dropna).sum().reset_index()
+    return grouped[[*group_by, *AGGREGATE_MEASURES]]
+
+def rollup_aggregates(cells, group_by=(), filters=None):
+    """Soma células de agregados para um group_by menor, só com as células que passam nos filtros.
+
+    filters: estado normalizado com chaves de CUBE_FILTERS. Células com alguma
+    dimensão do group_by nula ficam de fora dos grupos (como no groupby do
+    pandas), mas contam no total sem group_by.
+    """
+    group_by = _check_dimensions(group_by)
+
+    if filters:
+        mask = np.ones(len(cells), dtype=bool)
+        for key, value in filters.items():
+            column, _ = PETS_FILTERS[key]
+            values = list(value) if isinstance(value, tuple) else [value]
+            mask &= cells[column].isin(values).to_numpy(dtype=bool)
+        cells = cells[mask]
+
+    if not group_by:
+        totals = cells[list(AGGREGATE_MEASURES)].sum() if len(cells) else pd.Series(0, index=AGGREGATE_MEASURES)
+        return totals.to_frame().T
+
+    if cells.empty:
+        return _empty_aggregates(group_by)
+
+    grouped = cells.groupby(list(group_by), observed=True)[list(AGGREGATE_MEASURES)].sum()
+    return grouped.reset_index()[[*group_by, *AGGREGATE_MEASURES]]
+
+def _ratio(num, den):
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(den > 0, num / np.where(den > 0, den, 1), np.nan)
+
+def with_pets_metrics(agg):
+    """Acrescenta às células as médias derivadas (taxa de adoção, idade, score e risco médios)."""
+    return agg.assign(
+        taxa_adocao=_ratio(agg['adotados'], agg['total']),
+        idade_media=_ratio(agg['idade_sum'], agg['idade_count']),
+        score_medio=_ratio(agg['score_sum'], agg['score_count']),
+        risco_medio=_ratio(agg['risco_sum'], agg['risco_count']),
+        perc_score_alto=_ratio(agg['score_alto'], agg['score_count']) * 100,
+    )
+
+def summarize_pets_metrics(agg):
+    """Soma as células de um resultado agregado e devolve as métricas gerais em um dict."""
+    totals = agg[list(AGGREGATE_MEASURES)].sum() if len(agg) else pd.Series(0, index=AGGREGATE_MEASURES)
+    metrics = with_pets_metrics(totals.to_frame().T.astype(np.float64)).iloc[0]
+
+    return {
+        'total': int(metrics['total']),
+        'adotados': int(metrics['adotados']),
+        'taxa_adocao': float(metrics['taxa_adocao']),
+        'idade_media': float(metrics['idade_media']),
+        'score_medio': float(metrics['score_medio']),
+        'risco_medio': float(metrics['risco_medio']),
+        'perc_score_alto': float(metrics['perc_score_alto']),
+    }
+
+def _cell_key(values):
+    """Chave de uma célula em tipos Python (None para nulo), igual para células do banco e da memória."""
+    key = []
+    for dim, value in zip(AGGREGATE_DIMENSIONS, values):
+        if value is None or pd.isna(value):
+            key.append(None)
+        elif dim == 'adotado':
+            key.append(bool(value))
+        else:
+            key.append(str(value))
+    return tuple(key)
+
+def _row_values(row):
+    return {col: row.get(col) for col in _ROW_COLUMNS}
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(number) else number
+
+def _row_cell(row):
+    """Chave da célula de uma linha e a sua contribuição para as medidas (como em pets_aggregates_from_frame)."""
+    adotado = row.get('adotado')
+    idade, score, risco = (_number(row.get(col)) for col in ('idade', 'score_adocao', 'risco_abandono'))
+
+    measures = np.array([
+        1,
+        adotado is not None and not pd.isna(adotado) and bool(adotado),
+        idade or 0.0, idade is not None,
+        score or 0.0, score is not None, score is not None and score > 4,
+        risco or 0.0, risco is not None,
+    ], dtype=np.float64)
+
+    return _cell_key(row.get(dim) for dim in AGGREGATE_DIMENSIONS), measures
+
+class PetsAggregateCube:
+    """Cubo de agregados sobre todas as AGGREGATE_DIMENSIONS, montado uma vez por versão do snapshot.
+
+    Qualquer group_by e qualquer recorte por igualdade nas dimensões
+    (CUBE_FILTERS) são respondidos somando células do cubo, sem voltar às
+    linhas. Escritas feitas por este processo pegam um token com
+    begin_write() antes de ir ao banco e depois passam por record(): a linha
+    anterior é retirada da sua célula e a nova somada, e o cubo acompanha a
+    nova versão do snapshot sem ser remontado. Um cubo montado depois do
+    token pode já conter a escrita e é descartado em vez de corrigido. Escritas sem as linhas
+    (invalidate_pets_cache(), substituição de todos os pets) e o fim do TTL
+    fazem a próxima leitura remontar o cubo no banco. Se a função do banco
+    falhar (não instalada ou banco fora do ar), o cubo sai do snapshot em
+    memória, fica guardado como o do banco e a função só é tentada de novo
+    depois de um intervalo (AGGREGATES_RPC_RETRY_*).
+    """
+
+    def __init__(self, ttl=PETS_CACHE_TTL):
+        self.ttl = ttl
+        # (versão, montado em, células, montagem, snapshot de origem); células None:
+        # materializar de _cells; origem None: montado no banco
+        self._entry = None
+        self._builds = itertools.count(1)
+        # {chave da célula: medidas} enquanto houver escritas aplicadas ao cubo
+        self._cells = None
+        # Versão do snapshot na montagem e última versão das linhas escritas desde então (None: removida)
+        self._base_version = -1
+        self._touched = {}
+        self._ids = None
+        # Falhas seguidas da função do banco e quando tentá-la de novo
+        self._rpc_failures = 0
+        self._rpc_retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_current(self, entry, version):
+        if not entry or entry[0] != version or time.monotonic() - entry[1] >= self.ttl:
+            return False
+        # Montado em memória: vale enquanto o snapshot de origem for o atual
+        return entry[4] is None or entry[4] is pets_cache.peek()
+
+    def cells(self):
+        version = pets_cache.version
+
+        with self._lock:
+            entry = self._entry
+            if self._is_current(entry, version):
+                if entry[2] is None:
+                    self._entry = entry = (*entry[:2], self._frame_from_cells(), *entry[3:])
+                return entry[2]
+            rpc_available = time.monotonic() >= self._rpc_retry_at
+
+        source = None
+
+        if rpc_available:
+            try:
+                cells = fetch_pets_aggregates(AGGREGATE_DIMENSIONS)
+            except Exception as e:
+                print(f"⚠️ Agregação no banco indisponível, calculando em memória: {e}")
+                self._rpc_failed(e)
+                rpc_available = False
+            else:
+                with self._lock:
+                    self._rpc_failures = 0
+
+        if not rpc_available:
+            source = pets_cache.peek_since(version)
+            if source is None:
+                source = pets_cache.get()
+            cells = pets_aggregates_from_frame(source, AGGREGATE_DIMENSIONS, dropna=False)
+
+        with self._lock:
+            self._entry = (version, time.monotonic(), cells, next(self._builds), source)
+            self._cells = None
+            self._base_version = version
+            self._touched = {}
+
+        return cells
+
+    def _rpc_failed(self, error):
+        """Deixa a função do banco de lado por um tempo; sem ela, o cubo vem do snapshot."""
+        with self._lock:
+            self._rpc_failures += 1
+            if is_transient_error(error):
+                delay = AGGREGATES_RPC_RETRY_BASE * (2 ** (self._rpc_failures - 1))
+            else:
+                # Função não instalada, parâmetros ou permissão: não muda sozinho
+                delay = AGGREGATES_RPC_RETRY_MAX
+            self._rpc_retry_at = time.monotonic() + min(delay, AGGREGATES_RPC_RETRY_MAX)
+
+    def rollup(self, group_by=(), filters=None):
+        return rollup_aggregates(self.cells(), group_by, filters)
+
+    def begin_write(self):
+        """Token da montagem atual do cubo; pegar antes de enviar a escrita ao banco."""
+        with self._lock:
+            return self._entry[3] if self._entry else None
+
+    def record(self, inserted=(), changes=None, deleted_ids=(), token=None):
+        """Invalida o snapshot após uma escrita e aplica a mudança às células do cubo.
+
+        inserted: linhas gravadas (como devolvidas pelo banco); changes:
+        {id: {coluna: novo valor}}; deleted_ids: ids removidos; token: o de
+        begin_write(). O custo é o das linhas escritas, não o da tabela. Se o
+        cubo foi montado depois do token (pode já conter a escrita), já estava
+        desatualizado ou a versão anterior de uma linha alterada não for
+        conhecida, ele é descartado e remontado na próxima leitura. Retorna a
+        nova versão do snapshot.
+        """
+        deleted_ids = list(deleted_ids or ())
+
+        with self._lock:
+            version = invalidate_pets_cache(deleted_ids=deleted_ids or None)
+            entry = self._entry
+
+            # Montado durante a escrita, ou outra escrita invalidou o snapshot sem passar por aqui
+            if entry is None or token is None or entry[3] != token or entry[0] != version - 1:
+                self._entry = None
+                return version
+
+            try:
+                added, removed = self._changed_rows(inserted, changes or {}, deleted_ids)
+            except LookupError:
+                self._entry = None
+                return version
+
+            self._merge(added, 1)
+            self._merge(removed, -1)
+            self._entry = (version, entry[1], None, *entry[3:])
+
+        return version
+
+    def _previous_rows(self, ids):
+        """Última versão de cada id: escrita desde a montagem ou do snapshot. LookupError se desconhecida."""
+        rows = {pk: self._touched[pk] for pk in ids if pk in self._touched}
+        missing = [pk for pk in ids if pk not in rows]
+
+        if not missing:
+            return rows
+
+        # Snapshot anterior à montagem (ou do disco) pode ter outra versão da linha
+        snapshot = pets_cache.peek_since(self._base_version)
+        if snapshot is None or 'id' not in snapshot.columns:
+            raise LookupError("snapshot de pets indisponível")
+
+        if self._ids is None or self._ids[0] is not snapshot:
+            self._ids = (snapshot, pd.Index(snapshot['id']))
+
+        positions = self._ids[1].get_indexer(missing)
+        if (positions < 0).any():
+            raise LookupError("pet fora do snapshot")
+
+        columns = [col for col in _ROW_COLUMNS if col in snapshot.columns]
+        for pk, row in zip(missing, snapshot.iloc[positions][columns].to_dict('records')):
+            rows[pk] = _row_values(row)
+
+        return rows
+
+    def _changed_rows(self, inserted, changes, deleted_ids):
+        """Linhas a somar e a retirar das células (versões nova e anterior de cada linha escrita)."""
+        # Alterações que não tocam dimensões nem valores medidos não mudam o cubo
+        changes = {
+            pk: {col: value for col, value in values.items() if col in _ROW_COLUMNS}
+            for pk, values in changes.items()
+        }
+        changes = {pk: values for pk, values in changes.items() if values}
+        previous = self._previous_rows([*changes, *deleted_ids])
+        added, removed, touched = [], [], {}
+
+        for row in inserted:
+            values = _row_values(row)
+            added.append(values)
+            if row.get('id') is not None:
+                touched[row['id']] = values
+
+        for pk, values in changes.items():
+            before = previous[pk]
+            if before is None:
+                continue
+            after = {**before, **values}
+            removed.append(before)
+            added.append(after)
+            touched[pk] = after
+
+        for pk in deleted_ids:
+            if previous[pk] is not None:
+                removed.append(previous[pk])
+            touched[pk] = None
+
+        self._touched.update(touched)
+        return added, removed
+
+    def _merge(self, rows, sign):
+        if not rows:
+            return
+
+        if self._cells is None:
+            cells = self._entry[2]
+            self._cells = dict(zip(
+                map(_cell_key, cells[list(AGGREGATE_DIMENSIONS)].to_numpy(dtype=object)),
+                cells[list(AGGREGATE_MEASURES)].to_numpy(dtype=np.float64)
+            ))
+
+        total = AGGREGATE_MEASURES.index('total')
+
+        # Uma linha por vez: custo proporcional às linhas escritas, sem montar DataFrames
+        for row in rows:
+            key, values = _row_cell(row)
+            cell = self._cells.get(key)
+            cell = sign * values if cell is None else cell + sign * values
+
+            if cell[total] > 0:
+                self._cells[key] = cell
+            else:
+                self._cells.pop(key, None)
+
+    def _frame_from_cells(self):
+        values = np.array(list(self._cells.values()), dtype=np.float64).reshape(-1, len(AGGREGATE_MEASURES))
+        frame = pd.DataFrame(list(self._cells), columns=list(AGGREGATE_DIMENSIONS), dtype=object)
+
+        for i, col in enumerate(AGGREGATE_MEASURES):
+            frame[col] = values[:, i] if col in _SUM_MEASURES else np.rint(values[:, i]).astype(np.int64)
+
+        return frame
+
+# Instância única por processo, como pets_cache
+aggregate_cube = PetsAggregateCube()
+
+def begin_pets_write():
+    """Token a passar para apply_pets_writes(); pegar antes de enviar a escrita ao banco."""
+    return aggregate_cube.begin_write()
+
+def apply_pets_writes(inserted=(), changes=None, deleted_ids=(), token=None):
+    """Registra uma escrita em pets_analytics cujas linhas são conhecidas (ver PetsAggregateCube.record).
+
+    Usar no lugar de invalidate_pets_cache() para que métricas e agregados
+    sigam exatos sem remontar o cubo; sem o token de begin_pets_write() o
+    cubo é remontado.
+    """
+    return aggregate_cube.record(inserted, changes, deleted_ids, token)
+
+def _cube_covers_data():
+    """O cubo só descreve a tabela: sem snapshot com pets, a tela mostra dados de exemplo."""
+    snapshot = pets_cache.peek()
+    return snapshot is not None and not snapshot.empty
+
+def get_pets_aggregates(group_by=(), df=None, filters=None):
+    """Agregados de pets por group_by.
+
+    Sem df, ou com os filtros que geraram df (a partir do snapshot) quando
+    todos são respondidos pelo cubo (CUBE_FILTERS), saem do cubo. Caso
+    contrário (ex.: faixa de idade, dados de exemplo), são calculados sobre o
+    recorte df em memória.
+    """
+    if filters is not None and (df is None or _cube_covers_data()):
+        filters = normalize_filters(filters)
+        if all(key in CUBE_FILTERS for key in filters):
+            return aggregate_cube.rollup(group_by, filters)
+
+    if df is not None:
+        return pets_aggregates_from_frame(df, group_by)
+    return aggregate_cube.rollup(group_by)
+
+def get_pets_metrics(df=None, filters=None):
+    """Métricas gerais (total, adotados, taxa de adoção, médias) da tabela ou do recorte df/filters."""
+    return summarize_pets_metrics(get_pets_aggregates((), df, filters))
@@ -0,0 +1,411 @@
+# config/pets_data.py
+import datetime
+import logging
+import os
+import threading
+import time
+
+import pandas as pd
+
+from config.database import PETCARE_BACKEND, get_supabase, get_supabase_credentials
+from config.pets_schema import normalize_pets_frame
+from config.resilience import execute_with_retry
+from config.snapshot_store import load_pets_snapshot, save_pets_snapshot
+
+logger = logging.getLogger(__name__)
+
+PETS_TABLE = 'pets_analytics'
+
+# Mesmo limite padrão de linhas por resposta do PostgREST (max-rows)
+PETS_PAGE_SIZE = 1000
+
+# Tempo máximo (segundos) que um snapshot em memória é servido sem nova leitura
+PETS_CACHE_TTL = float(os.getenv("PETS_CACHE_TTL", "300"))
+
+# Sincronização incremental: margem de segurança da marca d'água (relógios e
+# transações concorrentes), intervalo da reconciliação de ids (remoções feitas
+# fora deste processo) e intervalo da recarga completa de segurança
+PETS_DELTA_OVERLAP = float(os.getenv("PETS_DELTA_OVERLAP", "120"))
+PETS_RECONCILE_INTERVAL = float(os.getenv("PETS_RECONCILE_INTERVAL", "900"))
+PETS_FULL_RELOAD_INTERVAL = float(os.getenv("PETS_FULL_RELOAD_INTERVAL", "21600"))
+
+WATERMARK_COLUMNS = ('updated_at', 'created_at')
+
+# Intervalo mínimo (segundos) entre gravações do snapshot em disco (warm start)
+PETS_SNAPSHOT_SAVE_INTERVAL = float(os.getenv("PETS_SNAPSHOT_SAVE_INTERVAL", "60"))
+
+def iter_pets_chunks(page_size=PETS_PAGE_SIZE, columns='*', client=None, where=None):
+    """Percorre pets_analytics com paginação por chave (id), gerando um DataFrame por página.
+
+    Cada página pede apenas ids maiores que o último já lido, então o custo por
+    requisição não cresce com a posição na tabela (ao contrário de OFFSET) e o
+    limite de linhas do PostgREST nunca trunca o resultado em silêncio.
+    `where` recebe a query e devolve a query com filtros adicionais.
+    """
+    last_id = None
+
+    def build_page():
+        # Cliente obtido a cada tentativa: o pool pode ter recriado a conexão
+        active = client or get_supabase()
+
+        if active is None:
+            raise ConnectionError("Cliente Supabase indisponível")
+
+        query = active.table(PETS_TABLE).select(columns).order('id').limit(page_size)
+
+        if where is not None:
+            query = where(query)
+
+        if last_id is not None:
+            query = query.gt('id', last_id)
+
+        return query
+
+    while True:
+        rows = execute_with_retry(PETS_TABLE, build_page).data
+
+        # A página vazia é o único critério de parada seguro: o servidor pode
+        # devolver menos linhas que page_size quando seu max-rows é menor
+        if not rows:
+            break
+
+        chunk = pd.DataFrame.from_records(rows)
+
+        # Liberar a página JSON antes da próxima requisição
+        del rows
+
+        last_id = chunk['id'].iloc[-1]
+        yield chunk
+
+def load_pets_frame(page_size=PETS_PAGE_SIZE, columns='*', client=None, where=None):
+    """Carrega a tabela pets_analytics completa montando o DataFrame tipado a partir das páginas."""
+    chunks = list(iter_pets_chunks(page_size=page_size, columns=columns, client=client, where=where))
+
+    if not chunks:
+        return pd.DataFrame()
+
+    if len(chunks) == 1:
+        return normalize_pets_frame(chunks[0])
+
+    return normalize_pets_frame(pd.concat(chunks, ignore_index=True))
+
+def pets_watermark(df):
+    """Retorna o maior created_at/updated_at do snapshot (horário do servidor) ou None."""
+    marks = []
+
+    for col in WATERMARK_COLUMNS:
+        if col in df.columns:
+            mark = pd.to_datetime(df[col], errors='coerce', utc=True).max()
+            if pd.notna(mark):
+                marks.append(mark)
+
+    return max(marks) if marks else None
+
+def fetch_pets_changes(since, page_size=PETS_PAGE_SIZE, client=None):
+    """Busca apenas os pets criados ou alterados a partir de `since`."""
+    # Aspas porque o timestamp contém ':' e '.', reservados na sintaxe de or=()
+    stamp = since.strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
+    condition = ','.join(f'{col}.gte."{stamp}"' for col in WATERMARK_COLUMNS)
+
+    return load_pets_frame(
+        page_size=page_size,
+        client=client,
+        where=lambda query: query.or_(condition)
+    )
+
+def fetch_pets_ids(page_size=PETS_PAGE_SIZE, client=None):
+    """Retorna o conjunto de ids existentes, trafegando apenas a coluna id."""
+    ids = set()
+
+    for chunk in iter_pets_chunks(page_size=page_size, columns='id', client=client):
+        ids.update(chunk['id'].tolist())
+
+    return ids
+
+def merge_pets_changes(df, changes, deleted_ids=()):
+    """Aplica linhas novas/alteradas (por id) e remoções ao snapshot, sem alterar o original."""
+    if changes.empty and not deleted_ids:
+        return df
+
+    drop_ids = set(deleted_ids)
+    if not changes.empty:
+        drop_ids.update(changes['id'].tolist())
+
+    kept = df[~df['id'].isin(drop_ids)] if drop_ids else df
+
+    if changes.empty:
+        return kept.reset_index(drop=True)
+
+    # Categorias diferentes entre as partes viram object no concat; retipar
+    return normalize_pets_frame(pd.concat([kept, changes], ignore_index=True))
+
+class PetsSnapshotCache:
+    """Snapshot da tabela de pets compartilhado pelo processo, com TTL e versão.
+
+    Toda escrita chama invalidate(), que incrementa a versão; a próxima leitura
+    percebe a divergência e atualiza. Entre escritas, todas as sessões e reruns
+    do Streamlit recebem o mesmo DataFrame em memória, que não deve ser
+    modificado in-place pelos chamadores.
+
+    A atualização é incremental: só são buscadas as linhas com created_at ou
+    updated_at a partir da marca d'água do snapshot, mescladas por id. Remoções
+    chegam como tombstones (ids informados por invalidate) e, para remoções
+    feitas fora deste processo, por reconciliação periódica dos ids.
+
+    Num processo novo, o último snapshot gravado em disco é servido
+    imediatamente enquanto a atualização a partir do banco roda em segundo plano.
+    """
+
+    def __init__(self, loader, ttl=PETS_CACHE_TTL, delta_loader=None, ids_loader=None,
+                 disk_loader=None, disk_saver=None):
+        self._loader = loader
+        self._delta_loader = delta_loader
+        self._ids_loader = ids_loader
+        self._disk_loader = disk_loader
+        self._disk_saver = disk_saver
+        self.ttl = ttl
+        self.version = 0
+        self._frame = None
+        self._frame_version = -1
+        self._loaded_at = 0.0
+        self._watermark = None
+        self._tombstones = set()
+        self._full_loaded_at = 0.0
+        self._reconciled_at = 0.0
+        self._from_disk = False
+        self._warm_start_tried = False
+        self._refreshing = False
+        self._saved_at = 0.0
+        self._loaded_wall = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        # Garante uma única carga por vez; as demais sessões aguardam o resultado
+        self._load_lock = threading.Lock()
+
+    def _is_fresh(self):
+        return (
+            self._frame is not None
+            and self._frame_version == self.version
+            and time.monotonic() - self._loaded_at < self.ttl
+        )
+
+    def get(self):
+        """Retorna o snapshot atual, recarregando se expirado ou invalidado."""
+        with self._lock:
+            if self._is_fresh():
+                return self._frame
+
+            # Snapshot do disco sem escritas posteriores: servir já e atualizar em segundo plano
+            if self._from_disk and self._frame_version == self.version:
+                self._refresh_in_background()
+                return self._frame
+
+        if self._frame is None and self._warm_start():
+            return self.get()
+
+        try:
+            return self._reload()
+        except Exception as e:
+            with self._lock:
+                self.last_error = str(e)
+                frame = self._frame
+
+            # Banco indisponível: servir o último snapshot bom (marcado como desatualizado)
+            if frame is not None:
+                print(f"⚠️ Servindo snapshot de pets desatualizado: {e}")
+                return frame
+            raise
+
+    def status(self):
+        """Situação do snapshot para a interface: desatualizado, horário da última carga e erro."""
+        with self._lock:
+            return {
+                'stale': self.last_error is not None,
+                'loaded_at': self._loaded_wall,
+                'error': self.last_error
+            }
+
+    def _warm_start(self):
+        """Carrega o snapshot gravado em disco, uma única vez por processo."""
+        if self._disk_loader is None:
+            return False
+
+        with self._load_lock:
+            with self._lock:
+                if self._warm_start_tried or self._frame is not None:
+                    return self._frame is not None
+                self._warm_start_tried = True
+
+            frame = self._disk_loader()
+
+            if frame is None:
+                return False
+
+            now = time.monotonic()
+
+            with self._lock:
+                self._frame = frame
+                self._frame_version = self.version
+                # Nunca "fresco": a primeira leitura já dispara a atualização
+                self._loaded_at = now - self.ttl
+                self._from_disk = True
+                self._watermark = pets_watermark(frame) if 'id' in frame.columns else None
+                self._full_loaded_at = now
+                # Remoções feitas enquanto o processo estava parado: reconciliar já
+                self._reconciled_at = now - PETS_RECONCILE_INTERVAL
+
+            return True
+
+    def _refresh_in_background(self):
+        """Dispara uma única atualização em segundo plano (chamar com self._lock adquirido)."""
+        if self._refreshing:
+            return
+
+        self._refreshing = True
+
+        def run():
+            try:
+                self._reload()
+            except Exception as e:
+                # status() passa a indicar o snapshot (do disco) como desatualizado
+                with self._lock:
+                    self.last_error = str(e)
+                logger.warning("Erro ao atualizar snapshot de pets em segundo plano: %s", e)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="pets-snapshot-refresh", daemon=True).start()
+
+    def _reload(self):
+        """Atualiza o snapshot (uma carga por vez) e o retorna."""
+        with self._load_lock:
+            # Outra thread pode ter recarregado enquanto esperávamos
+            with self._lock:
+                if self._is_fresh():
+                    return self._frame
+                version = self.version
+                previous = self._frame
+                tombstones = self._tombstones
+                self._tombstones = set()
+
+            try:
+                frame = self._refresh(previous, tombstones)
+            except Exception:
+                # Devolver os tombstones para a próxima tentativa
+                with self._lock:
+                    self._tombstones |= tombstones
+                raise
+
+            with self._lock:
+                self._frame = frame
+                self._frame_version = version
+                self._loaded_at = time.monotonic()
+                self._loaded_wall = datetime.datetime.now()
+                self._from_disk = False
+                self.last_error = None
+
+            self._save_in_background(frame)
+
+            return frame
+
+    def _save_in_background(self, frame):
+        """Grava o snapshot em disco fora do caminho de leitura, respeitando o intervalo mínimo."""
+        now = time.monotonic()
+
+        if self._disk_saver is None or now - self._saved_at < PETS_SNAPSHOT_SAVE_INTERVAL:
+            return
+
+        self._saved_at = now
+        threading.Thread(target=self._disk_saver, args=(frame,), name="pets-snapshot-save", daemon=True).start()
+
+    def _refresh(self, previous, tombstones):
+        """Atualiza o snapshot de forma incremental quando possível."""
+        now = time.monotonic()
+
+        incremental = (
+            previous is not None
+            and self._delta_loader is not None
+            and self._watermark is not None
+            and now - self._full_loaded_at < PETS_FULL_RELOAD_INTERVAL
+        )
+
+        if not incremental:
+            frame = self._loader()
+            self._full_loaded_at = now
+            self._reconciled_at = now
+        else:
+            since = self._watermark - pd.Timedelta(seconds=PETS_DELTA_OVERLAP)
+            changes = self._delta_loader(since)
+            frame = merge_pets_changes(previous, changes, tombstones)
+
+            if self._ids_loader is not None and now - self._reconciled_at >= PETS_RECONCILE_INTERVAL:
+                frame = frame[frame['id'].isin(self._ids_loader())].reset_index(drop=True)
+                self._reconciled_at = now
+
+        if 'id' in frame.columns:
+            self._watermark = pets_watermark(frame)
+        else:
+            self._watermark = None
+
+        return frame
+
+    def peek(self):
+        """Retorna o último snapshot carregado (mesmo expirado) ou None."""
+        with self._lock:
+            return self._frame
+
+    def peek_since(self, version):
+        """Retorna o snapshot se ele veio do banco com todas as escritas até `version`, senão None."""
+        with self._lock:
+            if self._from_disk or self._frame_version < version:
+                return None
+            return self._frame
+
+    def is_fresh(self):
+        with self._lock:
+            return self._is_fresh()
+
+    def invalidate(self, deleted_ids=None):
+        """Marca o snapshot como desatualizado após uma escrita; retorna a nova versão."""
+        with self._lock:
+            if deleted_ids:
+                self._tombstones.update(deleted_ids)
+            self.version += 1
+            return self.version
+
+def _snapshot_source():
+    """Identifica a origem do snapshot em disco (projeto Supabase + tabela)."""
+    if PETCARE_BACKEND == "local":
+        from config.local_backend import PETCARE_LOCAL_DB
+        return f"local:{PETCARE_LOCAL_DB}/{PETS_TABLE}"
+    
+    supabase_url, _ = get_supabase_credentials()
+    return f"{supabase_url}/{PETS_TABLE}"
+
+def _load_disk_snapshot():
+    return load_pets_snapshot(source=_snapshot_source())
+
+def _save_disk_snapshot(df):
+    save_pets_snapshot(df, source=_snapshot_source())
+
+# Instância única por processo: módulos importados sobrevivem aos reruns do Streamlit
+pets_cache = PetsSnapshotCache(
+    load_pets_frame,
+    delta_loader=fetch_pets_changes,
+    ids_loader=fetch_pets_ids,
+    disk_loader=_load_disk_snapshot,
+    disk_saver=_save_disk_snapshot
+)
+
+def get_pets_snapshot():
+    """Retorna o DataFrame compartilhado de pets (somente leitura)."""
+    return pets_cache.get()
+
+def get_pets_snapshot_status():
+    """Retorna a situação do snapshot compartilhado (ver PetsSnapshotCache.status)."""
+    return pets_cache.status()
+
+def invalidate_pets_cache(deleted_ids=None):
+    """Invalida o snapshot de pets; chamar após qualquer escrita em pets_analytics."""
+    return pets_cache.invalidate(deleted_ids)
@@ -0,0 +1,254 @@
+# config/pets_filters.py
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config.pets_data import load_pets_frame, pets_cache
+from config.pets_index import get_pets_index
+
+# Estado dos filtros da sidebar: chave -> (coluna, operador)
+# eq:    igualdade (uma lista vira .in_)
+# range: tupla (mínimo, máximo), qualquer lado pode ser None
+# gte:   valor mínimo
+# lte:   valor máximo
+PETS_FILTERS = {
+    'bairro': ('bairro', 'eq'),
+    'tipo_pet': ('tipo_pet', 'eq'),
+    'adotado': ('adotado', 'eq'),
+    'idade': ('idade', 'range'),
+    'score_adocao': ('score_adocao', 'range'),
+    'sociabilidade_min': ('sociabilidade', 'gte'),
+    'energia_min': ('energia', 'gte'),
+    'cluster_comportamental': ('cluster_comportamental', 'eq'),
+    'risco_max': ('risco_abandono', 'lte'),
+}
+
+# Casas decimais do passo de cada slider da sidebar. Os limites são
+# arredondados a elas: os extremos vêm do snapshot em float32
+# (0.1 -> 0.10000000149) e, enviados ao banco (float8), excluiriam as
+# linhas da borda que a filtragem em memória inclui
+PETS_FILTER_DECIMALS = {
+    'idade': 1,
+    'score_adocao': 1,
+    'sociabilidade_min': 0,
+    'energia_min': 0,
+    'risco_max': 2,
+}
+
+# Resultados de filtros guardados (compartilhados entre as sessões)
+PETS_FILTER_MEMO_SIZE = int(os.getenv("PETS_FILTER_MEMO_SIZE", "64"))
+
+# Conferir cada máscara do índice com a varredura das colunas (diagnóstico)
+PETS_FILTER_VERIFY = os.getenv("PETS_FILTER_VERIFY", "0") == "1"
+
+def _plain(value):
+    """Converte escalares numpy em tipos Python (serializáveis na query)."""
+    return value.item() if hasattr(value, 'item') else value
+
+def _snap(key, value):
+    decimals = PETS_FILTER_DECIMALS.get(key)
+    if value is None or decimals is None:
+        return value
+    return round(float(value), decimals) if decimals else int(round(float(value)))
+
+def slider_bounds(key, low, high):
+    """Extremos de um slider alinhados ao passo do filtro (para baixo e para cima), sem ruído de float32."""
+    scale = 10 ** PETS_FILTER_DECIMALS.get(key, 0)
+    # Arredondar antes de floor/ceil: 4.9 em float32 vira 49.0000009 e não deve subir para 5.0
+    return (math.floor(round(low * scale, 4)) / scale, math.ceil(round(high * scale, 4)) / scale)
+
+def normalize_filters(filters):
+    """Remove filtros vazios e padroniza valores, para comparar e compilar estados de filtro."""
+    normalized = {}
+
+    for key, value in (filters or {}).items():
+        if key not in PETS_FILTERS:
+            raise ValueError(f"Filtro desconhecido: {key}")
+
+        if value is None or value == "Todos":
+            continue
+
+        _, op = PETS_FILTERS[key]
+        multiple = isinstance(value, (list, tuple, set))
+
+        # Opções vindas de unique() podem trazer NaN: não é um valor filtrável
+        if op != 'range' and multiple:
+            value = [v for v in value if not pd.isna(v)]
+        elif not multiple and pd.isna(value):
+            continue
+
+        if op == 'range':
+            low, high = (_snap(key, _plain(v)) for v in value)
+            if low is None and high is None:
+                continue
+            normalized[key] = (low, high)
+        elif op in ('gte', 'lte'):
+            normalized[key] = _snap(key, _plain(value))
+        elif isinstance(value, (list, tuple, set)):
+            values = sorted(_plain(v) for v in value)
+            if not values:
+                continue
+            normalized[key] = values[0] if len(values) == 1 else tuple(values)
+        else:
+            normalized[key] = _plain(value)
+
+    return normalized
+
+class FilterResultMemo:
+    """LRU de resultados de filtros: (versão do DataFrame, filtros normalizados) -> posições das linhas.
+
+    Guarda só o array de posições (int32 quando cabe), não cópias do
+    DataFrame; a mesma combinação de filtros pedida por outra sessão ou em
+    outro rerun sai daqui sem recalcular a máscara.
+    """
+
+    def __init__(self, size=PETS_FILTER_MEMO_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(version, filters):
+        return version, tuple(sorted(filters.items()))
+
+    def get(self, key):
+        with self._lock:
+            positions = self._entries.get(key)
+            if positions is not None:
+                self._entries.move_to_end(key)
+            return positions
+
+    def put(self, key, positions):
+        with self._lock:
+            self._entries[key] = positions
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+# Instância única por processo, como pets_cache
+filter_memo = FilterResultMemo()
+
+def apply_filters_to_query(query, filters):
+    """Compila o estado de filtros em .eq/.in_/.gte/.lte sobre uma query de pets_analytics."""
+    for key, value in normalize_filters(filters).items():
+        column, op = PETS_FILTERS[key]
+
+        if op == 'eq':
+            query = query.in_(column, list(value)) if isinstance(value, tuple) else query.eq(column, value)
+        elif op == 'range':
+            low, high = value
+            if low is not None:
+                query = query.gte(column, low)
+            if high is not None:
+                query = query.lte(column, high)
+        elif op == 'gte':
+            query = query.gte(column, value)
+        elif op == 'lte':
+            query = query.lte(column, value)
+
+    return query
+
+def _scan_mask(df, filters):
+    """Máscara dos filtros comparando as colunas inteiras; None se faltar uma coluna filtrada."""
+    mask = np.ones(len(df), dtype=bool)
+
+    for key, value in filters.items():
+        column, op = PETS_FILTERS[key]
+
+        if column not in df.columns:
+            return None
+
+        series = df[column]
+
+        if op == 'eq':
+            matched = series.isin(value) if isinstance(value, tuple) else series == value
+        elif op == 'range':
+            low, high = value
+            matched = pd.Series(True, index=df.index)
+            if low is not None:
+                matched &= series >= low
+            if high is not None:
+                matched &= series <= high
+        elif op == 'gte':
+            matched = series >= value
+        else:
+            matched = series <= value
+
+        mask &= matched.fillna(False).to_numpy(dtype=bool)
+
+    return mask
+
+def filter_pets_frame(df, filters, index=None):
+    """Aplica o mesmo estado de filtros a um DataFrame em memória, com uma única máscara.
+
+    Com um índice (config.pets_index) do próprio df, a máscara sai de ANDs de
+    bitsets e buscas binárias, sem comparar as colunas inteiras, e o
+    resultado fica em filter_memo para a próxima vez. Com
+    PETS_FILTER_VERIFY=1, a máscara do índice é conferida com a varredura.
+    """
+    filters = normalize_filters(filters)
+
+    if df.empty or not filters:
+        return df
+
+    if index is not None and index.df is df:
+        memo_key = FilterResultMemo.key(index.version, filters)
+        positions = filter_memo.get(memo_key)
+
+        if positions is None:
+            mask = index.mask([(*PETS_FILTERS[key], value) for key, value in filters.items()])
+
+            if mask is not None and PETS_FILTER_VERIFY:
+                scanned = _scan_mask(df, filters)
+                if scanned is not None and not np.array_equal(mask, scanned):
+                    print(f"⚠️ Índice de filtros divergiu da varredura em {filters}: "
+                          f"{int(mask.sum())} x {int(scanned.sum())} linhas")
+                    mask = scanned
+
+            if mask is not None:
+                positions = np.flatnonzero(mask).astype(np.int32 if len(df) < 2 ** 31 else np.int64)
+                filter_memo.put(memo_key, positions)
+
+        if positions is not None:
+            return df.take(positions)
+
+    mask = _scan_mask(df, filters)
+
+    if mask is None:
+        # No banco a coluna ausente não casaria com nenhuma linha
+        return df.iloc[0:0]
+
+    return df[mask]
+
+def load_filtered_pets(filters, df=None):
+    """Retorna os pets que atendem aos filtros.
+
+    Com o snapshot completo em cache (e válido), filtra em memória; caso
+    contrário, envia os filtros ao banco e só as linhas do recorte trafegam.
+    Se o banco falhar, filtra o último snapshot conhecido. Um `df` que não
+    seja o snapshot compartilhado (ex.: dados de exemplo) é filtrado direto.
+    """
+    filters = normalize_filters(filters)
+
+    if df is not None and (df is not pets_cache.peek() or not filters):
+        return filter_pets_frame(df, filters, get_pets_index(df))
+
+    if not filters:
+        return pets_cache.get()
+
+    if pets_cache.is_fresh():
+        frame = pets_cache.peek()
+        return filter_pets_frame(frame, filters, get_pets_index(frame))
+
+    try:
+        return load_pets_frame(where=lambda query: apply_filters_to_query(query, filters))
+    except Exception as e:
+        frame = pets_cache.peek()
+        if frame is None:
+            raise
+        print(f"⚠️ Filtro no banco indisponível, filtrando o snapshot em memória: {e}")
+        return filter_pets_frame(frame, filters)
@@ -0,0 +1,685 @@
+# config/pets_import.py
+import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from postgrest.types import ReturnMethod
+
+from config.bulk_writer import AdaptiveBatchSizer, BulkWriter
+from config.database import get_supabase
+from config.pets_aggregates import apply_pets_writes, begin_pets_write
+from config.pets_data import PETS_TABLE, get_pets_snapshot, invalidate_pets_cache, pets_cache
+from config.pets_schema import TRUE_VALUES
+from config.resilience import execute_with_retry
+
+# Colunas de pets_analytics aceitas na importação
+IMPORT_COLUMNS = [
+    'nome', 'bairro', 'tipo_pet', 'raca', 'idade', 'peso', 'sexo',
+    'telefone', 'status_vacinacao', 'estado_saude', 'comportamento',
+    'nivel_atividade', 'regiao', 'created_by', 'microchip', 'castrado',
+    'historico_medico', 'cor_pelagem', 'necessidades_especiais',
+    'temperamento', 'sociabilidade', 'energia', 'custo_mensal',
+    'compatibilidade_criancas', 'compatibilidade_pets', 'score_adocao',
+    'cluster_comportamental', 'risco_abandono'
+]
+
+# Conversões aplicadas coluna a coluna
+INT_COLUMNS = ['idade', 'created_by', 'sociabilidade', 'energia', 'nivel_atividade', 'cluster_comportamental']
+FLOAT_COLUMNS = ['peso', 'custo_mensal', 'score_adocao', 'risco_abandono']
+BOOL_COLUMNS = ['adotado', 'castrado', 'microchip', 'compatibilidade_criancas', 'compatibilidade_pets']
+
+# Textos tratados como valor ausente
+NULL_VALUES = {'', 'nan'}
+
+# Chave natural padrão para casar registros importados com pets existentes
+DEFAULT_NATURAL_KEY = ['nome', 'raca', 'bairro']
+
+# Colunas que definem o conteúdo de um registro na detecção de duplicados
+# (quem importou não muda o pet)
+CONTENT_COLUMNS = [col for col in IMPORT_COLUMNS if col != 'created_by']
+
+def _blank_mask(series):
+    """Marca valores ausentes: NaN/None e textos vazios ou 'nan'."""
+    blank = series.isna()
+
+    if series.dtype == object or pd.api.types.is_string_dtype(series):
+        blank |= series.astype(str).isin(NULL_VALUES)
+
+    return blank
+
+def _as_payload(series, blank):
+    """Converte a coluna para object, com None nos ausentes (serializável em JSON)."""
+    return series.astype(object).where(~blank, None)
+
+def _convert_numeric(series, blank, integer):
+    values = pd.to_numeric(series.where(~blank), errors='coerce')
+    invalid = values.isna() & ~blank
+
+    if integer:
+        # Mesmo comportamento de int(float(valor)): trunca a parte decimal
+        values = np.trunc(values).astype('Int64')
+
+    return _as_payload(values, blank | invalid), invalid
+
+def _convert_bool(series, blank):
+    if pd.api.types.is_bool_dtype(series):
+        values = series.astype(bool)
+    elif pd.api.types.is_numeric_dtype(series):
+        values = series.fillna(0) != 0
+    else:
+        text = series.astype(str).str.strip().str.lower()
+        numeric = pd.to_numeric(series, errors='coerce')
+        values = text.isin(TRUE_VALUES) | (numeric.notna() & (numeric != 0))
+
+    return _as_payload(values, blank)
+
+def _line_numbers(df):
+    """Número da linha de cada registro: índice + 1 (os leitores em blocos mantêm o índice contínuo)."""
+    if pd.api.types.is_integer_dtype(df.index):
+        return np.asarray(df.index, dtype=np.int64) + 1
+    return np.arange(1, len(df) + 1)
+
+def prepare_import_records(df, columns=IMPORT_COLUMNS):
+    """Converte o DataFrame importado no payload de inserção, coluna a coluna.
+
+    Retorna (records, lines, errors): lines[i] é o número da linha de
+    records[i], para relatar falhas da gravação. Linhas com valores numéricos
+    inválidos não entram no payload e geram uma mensagem "Linha N: ..." cada.
+    """
+    present = [col for col in columns if col in df.columns]
+
+    if df.empty or not present:
+        return [], [], []
+
+    converted = {}
+    problems = {}
+
+    for col in present:
+        series = df[col]
+        blank = _blank_mask(series)
+
+        if col in INT_COLUMNS or col in FLOAT_COLUMNS:
+            converted[col], invalid = _convert_numeric(series, blank, integer=col in INT_COLUMNS)
+            if invalid.any():
+                problems[col] = invalid.to_numpy()
+        elif col in BOOL_COLUMNS:
+            converted[col] = _convert_bool(series, blank)
+        else:
+            converted[col] = _as_payload(series, blank)
+
+    payload = pd.DataFrame(converted)
+    lines = _line_numbers(df)
+    errors = []
+
+    if problems:
+        failed = np.zeros(len(df), dtype=bool)
+        for mask in problems.values():
+            failed |= mask
+
+        for position in np.flatnonzero(failed):
+            details = ', '.join(
+                f"valor inválido para '{col}': {df[col].iloc[position]!r}"
+                for col, mask in problems.items()
+                if mask[position]
+            )
+            errors.append(f"Linha {lines[position]}: {details}")
+
+        payload = payload[~failed]
+        lines = lines[~failed]
+
+    return payload.to_dict('records'), lines.tolist(), errors
+
+def _arrow_kind(column):
+    if column in INT_COLUMNS:
+        return 'int'
+    if column in FLOAT_COLUMNS:
+        return 'float'
+    if column in BOOL_COLUMNS:
+        return 'bool'
+    return 'text'
+
+def _value_type(data_type):
+    return data_type.value_type if pa.types.is_dictionary(data_type) else data_type
+
+def _arrow_type_accepted(kind, data_type):
+    """Tipos de origem que convertem direto para o tipo da coluna, sem olhar valores."""
+    data_type = _value_type(data_type)
+    numeric = pa.types.is_integer(data_type) or pa.types.is_floating(data_type) or pa.types.is_decimal(data_type)
+
+    if kind in ('int', 'float'):
+        return numeric
+    if kind == 'bool':
+        return pa.types.is_boolean(data_type) or numeric or pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+    return (numeric or pa.types.is_boolean(data_type) or pa.types.is_string(data_type)
+            or pa.types.is_large_string(data_type) or pa.types.is_temporal(data_type))
+
+def arrow_schema_issues(schema, mapping):
+    """Valida os tipos das colunas mapeadas pelo schema do arquivo; retorna mensagens de erro."""
+    issues = []
+
+    for sys_col, file_col in mapping.items():
+        if file_col not in schema.names:
+            issues.append(f"❌ {file_col} não existe no arquivo")
+            continue
+
+        data_type = schema.field(file_col).type
+        if not _arrow_type_accepted(_arrow_kind(sys_col), data_type):
+            issues.append(f"❌ {file_col} ({data_type}) não é compatível com {sys_col}")
+
+    return issues
+
+def _null_where(array, mask):
+    return pc.if_else(mask, pa.scalar(None, array.type), array)
+
+def _convert_arrow(array, column):
+    """Converte uma coluna Arrow para o tipo do payload; retorna (array, máscara de inválidos ou None)."""
+    if pa.types.is_dictionary(array.type):
+        array = array.dictionary_decode()
+
+    kind = _arrow_kind(column)
+
+    if kind in ('int', 'float'):
+        if pa.types.is_decimal(array.type):
+            array = pc.cast(array, pa.float64())
+
+        if pa.types.is_floating(array.type):
+            # NaN e infinito não existem em JSON
+            array = _null_where(array, pc.invert(pc.is_finite(array)))
+
+            if kind == 'int':
+                # Mesmo comportamento de int(float(valor)): trunca a parte decimal
+                invalid = pc.fill_null(pc.greater_equal(pc.abs(array), 2.0 ** 63), False)
+                array = pc.cast(pc.trunc(_null_where(array, invalid)), pa.int64())
+                return array, invalid
+
+        return pc.cast(array, pa.int64() if kind == 'int' else pa.float64()), None
+
+    if kind == 'bool':
+        if pa.types.is_boolean(array.type):
+            return array, None
+        if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+            text = pc.utf8_lower(pc.utf8_trim_whitespace(array))
+            # Nulos e textos vazios seguem nulos, como em prepare_import_records
+            blank = pc.or_(pc.is_null(text), pc.is_in(text, value_set=pa.array(sorted(NULL_VALUES), text.type)))
+            return _null_where(pc.is_in(text, value_set=pa.array(sorted(TRUE_VALUES), text.type)), blank), None
+        return pc.not_equal(array, pa.scalar(0, array.type)), None
+
+    array = pc.cast(array, pa.string())
+    return _null_where(array, pc.is_in(array, value_set=pa.array(sorted(NULL_VALUES)))), None
+
+class ArrowRecordsPreparer:
+    """Converte RecordBatches (Parquet/Arrow) no payload de inserção sem passar pelo pandas.
+
+    mapping leva coluna do sistema -> coluna do arquivo; os tipos já foram
+    validados pelo schema (arrow_schema_issues), então a conversão é feita
+    coluna a coluna com pyarrow.compute. constants são valores fixos
+    acrescentados a todas as linhas (ex.: created_by) e linhas com alguma
+    coluna de `required` vazia são descartadas. Chamável como o `prepare`
+    de run_pets_import: conta as linhas entre os blocos para os erros.
+    """
+
+    def __init__(self, mapping, constants=None, required=()):
+        self.mapping = dict(mapping)
+        self.constants = {k: v for k, v in (constants or {}).items() if k not in self.mapping}
+        self.required = [col for col in required if col in self.mapping]
+        self.next_line = 1
+
+    def __call__(self, batch):
+        lines = np.arange(self.next_line, self.next_line + batch.num_rows)
+        self.next_line += batch.num_rows
+
+        if batch.num_rows == 0:
+            return [], [], []
+
+        columns = {}
+        problems = {}
+
+        for sys_col, file_col in self.mapping.items():
+            columns[sys_col], invalid = _convert_arrow(batch.column(file_col), sys_col)
+            if invalid is not None and pc.any(invalid).as_py():
+                problems[sys_col] = invalid.to_numpy(zero_copy_only=False)
+
+        for col, value in self.constants.items():
+            columns[col] = pa.repeat(value, batch.num_rows)
+
+        keep = np.ones(batch.num_rows, dtype=bool)
+        for col in self.required:
+            keep &= columns[col].is_valid().to_numpy(zero_copy_only=False)
+
+        errors = []
+        if problems:
+            failed = np.zeros(batch.num_rows, dtype=bool)
+            for mask in problems.values():
+                failed |= mask
+
+            for position in np.flatnonzero(failed & keep):
+                details = ', '.join(
+                    f"valor inválido para '{col}': {batch.column(self.mapping[col])[int(position)].as_py()!r}"
+                    for col, mask in problems.items()
+                    if mask[position]
+                )
+                errors.append(f"Linha {lines[position]}: {details}")
+
+            keep &= ~failed
+
+        table = pa.table(columns)
+        if not keep.all():
+            table = table.filter(pa.array(keep))
+            lines = lines[keep]
+
+        return table.to_pylist(), lines.tolist(), errors
+
+def _writer(batch_size):
+    """BulkWriter com lote fixo no tamanho escolhido pelo usuário."""
+    return BulkWriter(PETS_TABLE, sizer=AdaptiveBatchSizer(initial=batch_size, minimum=batch_size, maximum=batch_size))
+
+def _key_frame(frame, key_columns):
+    """Normaliza as colunas da chave (texto, sem espaços nas pontas, sem caixa) para comparação."""
+    keys = pd.DataFrame(index=frame.index)
+
+    for col in key_columns:
+        values = frame[col] if col in frame.columns else pd.Series(None, index=frame.index, dtype=object)
+        text = values.astype(object).where(values.notna(), None).astype(str).str.strip().str.casefold()
+        keys[col] = text.where(values.notna())
+
+    return keys
+
+class NaturalKeyIndex:
+    """Índice chave natural -> id dos pets, montado uma vez por importação.
+
+    Os pets do snapshot entram no índice na primeira consulta; depois, add()
+    acrescenta as linhas gravadas por cada bloco, então os blocos seguintes
+    casam com elas sem recarregar o snapshot. Chaves com alguma coluna vazia
+    nunca casam. Se a chave se repete, vale o de maior id.
+    """
+
+    def __init__(self, key_columns=DEFAULT_NATURAL_KEY, snapshot=None):
+        self.key_columns = list(key_columns)
+        self._snapshot = snapshot
+        self._ids = None
+
+    def _index(self):
+        if self._ids is None:
+            frame = self._snapshot if self._snapshot is not None else get_pets_snapshot()
+            self._snapshot = None
+            self._ids = {}
+
+            if not frame.empty and 'id' in frame.columns:
+                keys = _key_frame(frame, self.key_columns)
+                valid = keys.notna().all(axis=1).to_numpy()
+                ids = frame['id'].to_numpy(dtype=np.float64)[valid]
+                rows = list(keys[valid].itertuples(index=False, name=None))
+                # Em ordem crescente de id: o maior fica por último no dict
+                for position in np.argsort(ids, kind='stable'):
+                    self._ids[rows[position]] = ids[position]
+
+        return self._ids
+
+    def keys(self, records):
+        """Chave normalizada de cada registro, ou None se alguma coluna da chave estiver vazia."""
+        if not records:
+            return []
+
+        frame = _key_frame(pd.DataFrame.from_records(records), self.key_columns)
+        blank = frame.isna().any(axis=1).to_numpy()
+        return [None if empty else key for key, empty in zip(frame.itertuples(index=False, name=None), blank)]
+
+    def lookup(self, keys):
+        """Id do pet de cada chave (NaN se não houver)."""
+        index = self._index()
+        return np.array([np.nan if key is None else index.get(key, np.nan) for key in keys], dtype=np.float64)
+
+    def match(self, records):
+        return self.lookup(self.keys(records))
+
+    def add(self, rows):
+        """Registra linhas gravadas (com id) para que os próximos blocos as encontrem."""
+        rows = [row for row in rows if row.get('id') is not None]
+        index = self._index()
+
+        for key, row in zip(self.keys(rows), rows):
+            if key is not None:
+                index[key] = float(row['id'])
+
+def match_existing_ids(records, key_columns, existing):
+    """Retorna, para cada registro, o id do pet existente com a mesma chave natural (ou NaN).
+
+    Registros com alguma coluna da chave vazia nunca casam. Se a chave se repete
+    entre os pets existentes, vale o de maior id.
+    """
+    return NaturalKeyIndex(key_columns, existing).match(records)
+
+def _superseded(keys):
+    """Posições cuja chave reaparece mais adiante no bloco (a última ocorrência vence)."""
+    last = {key: position for position, key in enumerate(keys) if key is not None}
+    return np.array([key is not None and last[key] != position for position, key in enumerate(keys)], dtype=bool)
+
+def content_hashes(frame, columns):
+    """Hash de 64 bits do conteúdo normalizado de cada linha (texto sem caixa/espaços, números em float32).
+
+    Flags vazias contam como False, como no snapshot. Colunas ausentes em `frame` contam como vazias, então o mesmo pet gera o
+    mesmo hash vindo do arquivo importado ou do snapshot.
+    """
+    text_columns = [col for col in columns if col not in INT_COLUMNS + FLOAT_COLUMNS + BOOL_COLUMNS]
+    content = _key_frame(frame, text_columns)
+
+    for col in columns:
+        if col in text_columns:
+            continue
+
+        values = frame[col] if col in frame.columns else pd.Series(None, index=frame.index, dtype=object)
+        present = values.notna()
+
+        if col in BOOL_COLUMNS:
+            # O snapshot normaliza flags ausentes para False: vazio no arquivo também conta como False
+            content[col] = values.where(present, False).astype(bool).astype(np.float64)
+        else:
+            # O snapshot guarda medidas em float32: comparar na mesma precisão
+            numbers = pd.to_numeric(values, errors='coerce').astype(np.float32).astype(np.float64)
+            content[col] = numbers.where(present)
+
+    return pd.util.hash_pandas_object(content[list(columns)], index=False).to_numpy()
+
+class DuplicateFilter:
+    """Detecta registros importados cujo conteúdo já existe na tabela ou já apareceu no arquivo.
+
+    Os hashes do snapshot ficam num array ordenado (com o id de cada um), montado
+    uma vez por conjunto de colunas; cada bloco é conferido com uma busca
+    vetorizada (searchsorted) contra ele e contra os hashes já vistos.
+    check_existing=False só procura repetições dentro do próprio arquivo
+    (na substituição, os dados atuais vão embora).
+    """
+
+    def __init__(self, check_existing=True, snapshot=None):
+        self.check_existing = check_existing
+        self._snapshot = snapshot
+        self._indexes = {}
+        self._seen = np.empty(0, dtype=np.uint64)
+
+    def _index(self, columns):
+        if columns not in self._indexes:
+            if self._snapshot is None:
+                self._snapshot = get_pets_snapshot()
+
+            frame = self._snapshot
+            if frame.empty or 'id' not in frame.columns:
+                self._indexes[columns] = (np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.float64))
+            else:
+                hashes = content_hashes(frame, columns)
+                # Conteúdo repetido na tabela: vale o de maior id
+                order = np.lexsort((frame['id'].to_numpy(dtype=np.float64), hashes))
+                hashes = hashes[order]
+                ids = frame['id'].to_numpy(dtype=np.float64)[order]
+                last = np.append(hashes[1:] != hashes[:-1], True)
+                self._indexes[columns] = (hashes[last], ids[last])
+
+        return self._indexes[columns]
+
+    @staticmethod
+    def _lookup(sorted_hashes, hashes):
+        if len(sorted_hashes) == 0:
+            return np.full(len(hashes), -1)
+        positions = np.searchsorted(sorted_hashes, hashes).clip(max=len(sorted_hashes) - 1)
+        return np.where(sorted_hashes[positions] == hashes, positions, -1)
+
+    def check(self, records):
+        """Retorna (ids existentes com o mesmo conteúdo ou NaN, máscara de repetidos no arquivo)."""
+        existing = np.full(len(records), np.nan)
+        if not records:
+            return existing, np.zeros(0, dtype=bool)
+
+        frame = pd.DataFrame.from_records(records)
+        columns = tuple(col for col in CONTENT_COLUMNS if col in frame.columns)
+        hashes = content_hashes(frame, columns)
+
+        repeated = pd.Series(hashes).duplicated().to_numpy() | (self._lookup(self._seen, hashes) >= 0)
+        self._seen = np.union1d(self._seen, hashes)
+
+        if self.check_existing:
+            known_hashes, known_ids = self._index(columns)
+            positions = self._lookup(known_hashes, hashes)
+            found = positions >= 0
+            existing[found] = known_ids[positions[found]]
+
+        return existing, repeated
+
+def _offset_progress(progress, offset, total):
+    if progress is None:
+        return None
+    return lambda done, _: progress(offset + done, total)
+
+def _updated_now():
+    # Sem trigger no banco: a sincronização incremental do snapshot só vê linhas com updated_at novo
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+def _rows_by_id(rows):
+    return {row['id']: row for row in rows if row.get('id') is not None}
+
+def upsert_pets(records, key_columns=DEFAULT_NATURAL_KEY, batch_size=500, progress=None, writer=None, index=None):
+    """Atualiza pets existentes pela chave natural e insere os demais, em lotes de batch_size.
+
+    Os ids são resolvidos pelo NaturalKeyIndex (montado do snapshot de pets
+    em memória se index não for passado) e os existentes vão num upsert em
+    massa por id (a chave primária), sem exigir índice único na chave
+    natural. Registros com a mesma chave no bloco não viram pets repetidos:
+    vale o último, e os anteriores são descartados. Retorna (atualizados,
+    inseridos, falhas, descartados) com falhas como [(índice do registro,
+    erro)] e descartados como a lista de índices.
+    """
+    index = index or NaturalKeyIndex(key_columns)
+    keys = index.keys(records)
+    ids = index.lookup(keys)
+    superseded = _superseded(keys)
+    matched = np.flatnonzero(~np.isnan(ids) & ~superseded)
+    unmatched = np.flatnonzero(np.isnan(ids) & ~superseded)
+    total = len(records)
+
+    updated_at = _updated_now()
+    updates = [dict(records[i], id=int(ids[i]), updated_at=updated_at) for i in matched]
+    inserts = [records[i] for i in unmatched]
+
+    writer = writer or _writer(batch_size)
+    token = begin_pets_write()
+    updated = writer.upsert(updates, on_conflict='id', progress=_offset_progress(progress, 0, total))
+    inserted = writer.insert(inserts, progress=_offset_progress(progress, len(updates), total))
+
+    if updated.written or inserted.written:
+        apply_pets_writes(inserted=inserted.rows, changes=_rows_by_id(updated.rows), token=token)
+        index.add(inserted.rows)
+
+    failed = [(int(matched[i]), message) for i, message in updated.failed]
+    failed += [(int(unmatched[i]), message) for i, message in inserted.failed]
+
+    return updated.written, inserted.written, sorted(failed), np.flatnonzero(superseded).tolist()
+
+def _max_pet_id():
+    rows = execute_with_retry(
+        PETS_TABLE,
+        lambda: get_supabase().table(PETS_TABLE).select('id').order('id', desc=True).limit(1)
+    ).data
+    return rows[0]['id'] if rows else None
+
+def _delete_pets(where):
+    return execute_with_retry(
+        PETS_TABLE,
+        lambda: where(get_supabase().table(PETS_TABLE).delete(returning=ReturnMethod.minimal))
+    )
+
+class StagedPetsReplace:
+    """Troca por etapas de todos os pets: novos registros entram ao lado dos atuais.
+
+    add() pode ser chamado uma vez por bloco lido. commit() remove os antigos
+    (id até o maior id anterior à importação) num único delete; rollback()
+    remove só os inseridos, deixando os dados antigos intactos.
+    """
+
+    def __init__(self, batch_size=500, writer=None):
+        self.batch_size = batch_size
+        self.writer = writer or _writer(batch_size)
+        self.old_max_id = _max_pet_id()
+        self.new_ids = []
+        self.failed = False
+
+    def add(self, records, progress=None):
+        result = self.writer.insert(records, progress=progress)
+        self.new_ids.extend(row['id'] for row in result.rows if row.get('id') is not None)
+        self.failed = self.failed or bool(result.failed)
+        return result
+
+    def commit(self):
+        deleted_ids = None
+
+        if self.old_max_id is not None:
+            _delete_pets(lambda query: query.lte('id', self.old_max_id))
+            snapshot = pets_cache.peek()
+            if snapshot is not None and 'id' in snapshot.columns:
+                deleted_ids = snapshot.loc[snapshot['id'] <= self.old_max_id, 'id'].tolist()
+
+        invalidate_pets_cache(deleted_ids=deleted_ids)
+
+    def rollback(self):
+        for start in range(0, len(self.new_ids), self.batch_size):
+            chunk = self.new_ids[start:start + self.batch_size]
+            _delete_pets(lambda query: query.in_('id', chunk))
+
+        invalidate_pets_cache(deleted_ids=self.new_ids)
+        self.new_ids = []
+
+def replace_pets(records, batch_size=500, progress=None):
+    """Substitui todos os pets pelos registros (ver StagedPetsReplace). Retorna (BulkWriteResult, substituiu)."""
+    staged = StagedPetsReplace(batch_size)
+    result = staged.add(records, progress=progress)
+
+    if staged.failed:
+        staged.rollback()
+        return result, False
+
+    staged.commit()
+    return result, True
+
+class ImportReport:
+    """Resultado de uma importação: linhas lidas, gravadas e erros "Linha N: ..."."""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []
+        self.replaced = None
+        self.duplicate_lines = []
+
+    @property
+    def duplicates(self):
+        return len(self.duplicate_lines)
+
+    @property
+    def success_count(self):
+        return self.inserted + self.updated
+
+    @property
+    def error_count(self):
+        return len(self.errors)
+
+def _take(items, mask):
+    return [item for item, keep in zip(items, mask) if keep]
+
+def run_pets_import(chunks, prepare=prepare_import_records, mode='insert', batch_size=None,
+                    natural_key=DEFAULT_NATURAL_KEY, duplicates='skip', progress=None):
+    """Importa blocos (DataFrame, consumido, total) à medida que são lidos.
+
+    Cada bloco é convertido por prepare(bloco) -> (records, lines, errors) e
+    gravado antes do próximo ser lido, então a memória não
+    cresce com o arquivo. mode: 'insert', 'upsert' (pela chave natural) ou
+    'replace' (troca por etapas, desfeita se algum lote falhar). batch_size
+    None deixa o tamanho do lote adaptativo; um número o fixa como teto.
+    duplicates: 'skip' descarta registros com conteúdo igual a um pet existente,
+    'upsert' regrava o pet existente com eles e 'keep' desliga a verificação;
+    repetições dentro do próprio arquivo são sempre descartadas (exceto com
+    'keep'). No modo 'upsert', uma chave natural repetida no bloco grava só a
+    última linha. As linhas descartadas ficam em report.duplicate_lines.
+    progress(consumido, total) é chamado após cada bloco.
+    """
+    report = ImportReport()
+    dedup = DuplicateFilter(check_existing=mode != 'replace') if duplicates != 'keep' else None
+    sizer = AdaptiveBatchSizer() if batch_size is None else AdaptiveBatchSizer(initial=batch_size, maximum=batch_size)
+    writer = BulkWriter(PETS_TABLE, sizer=sizer)
+    staged = StagedPetsReplace(batch_size or 500, writer=writer) if mode == 'replace' else None
+    keys = NaturalKeyIndex(natural_key) if mode == 'upsert' else None
+
+    try:
+        for chunk, consumed, total in chunks:
+            records, lines, errors = prepare(chunk)
+            report.rows_read += len(chunk)
+            report.errors.extend(errors)
+            updates, update_lines = [], []
+
+            if dedup is not None and records:
+                existing, repeated = dedup.check(records)
+                found = ~np.isnan(existing) & ~repeated
+                dropped = repeated | found if duplicates == 'skip' or mode == 'insert' else repeated
+
+                if duplicates == 'upsert' and mode == 'insert':
+                    # Mesmo conteúdo de um pet existente: regravar pelo id em vez de duplicar
+                    updated_at = _updated_now()
+                    updates = [dict(records[i], id=int(existing[i]), updated_at=updated_at) for i in np.flatnonzero(found)]
+                    update_lines = [lines[i] for i in np.flatnonzero(found)]
+                    report.duplicate_lines.extend(lines[i] for i in np.flatnonzero(repeated))
+                else:
+                    report.duplicate_lines.extend(lines[i] for i in np.flatnonzero(dropped))
+
+                records, lines = _take(records, ~dropped), _take(lines, ~dropped)
+
+            written, rewritten = [], []
+            token = begin_pets_write()
+
+            if updates:
+                result = writer.upsert(updates, on_conflict='id')
+                report.updated += result.written
+                report.errors.extend(f"Linha {update_lines[index]}: {message}" for index, message in result.failed)
+                rewritten = result.rows
+
+            if mode == 'upsert':
+                updated, inserted, failed, superseded = upsert_pets(records, natural_key, writer=writer, index=keys)
+                report.updated += updated
+                report.inserted += inserted
+                report.duplicate_lines.extend(lines[i] for i in superseded)
+            elif mode == 'replace':
+                result = staged.add(records)
+                failed = result.failed
+                report.inserted += result.written
+            else:
+                result = writer.insert(records)
+                failed = result.failed
+                report.inserted += result.written
+                written = result.rows
+
+            # Cada bloco gravado entra já nas métricas, sem remontar os agregados
+            if written or rewritten:
+                apply_pets_writes(inserted=written, changes=_rows_by_id(rewritten), token=token)
+
+            report.errors.extend(f"Linha {lines[index]}: {message}" for index, message in failed)
+
+            if progress is not None:
+                progress(consumed, total)
+
+            # Na substituição não adianta seguir: a troca será desfeita
+            if staged is not None and staged.failed:
+                break
+
+    except Exception:
+        if staged is not None:
+            staged.rollback()
+        raise
+
+    if staged is not None:
+        if staged.failed:
+            staged.rollback()
+            report.replaced = False
+            report.inserted = 0
+        else:
+            staged.commit()
+            report.replaced = True
+
+    return report
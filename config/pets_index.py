@@ -0,0 +1,149 @@
+# config/pets_index.py
+import itertools
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Colunas indexadas por valor (um bitset por valor) e por ordem (array ordenado)
+CATEGORY_COLUMNS = ('bairro', 'tipo_pet', 'adotado', 'cluster_comportamental', 'regiao')
+RANGE_COLUMNS = ('idade', 'score_adocao', 'risco_abandono', 'sociabilidade', 'energia')
+
+# Índices mantidos em memória (um por DataFrame: snapshot, dados de exemplo)
+PETS_INDEX_ENTRIES = 2
+
+# Versões dos DataFrames indexados: cada índice novo (snapshot recarregado) recebe a sua
+_versions = itertools.count(1)
+
+class PetsFrameIndex:
+    """Índice em memória de um DataFrame de pets para a filtragem da sidebar.
+
+    Cada valor de uma coluna categórica vira um bitset (máscara empacotada
+    com np.packbits) e colunas numéricas viram arrays ordenados, onde um
+    intervalo é uma busca binária. Um estado de filtros vira um AND de
+    bitsets. Os arrays ordenados mantêm o dtype de ponto flutuante da coluna
+    e os limites são convertidos para ele, como na varredura da coluna. Tudo
+    é montado sob demanda, coluna a coluna, e vale enquanto o DataFrame não
+    muda (o snapshot é substituído, nunca alterado); `version`
+    identifica esse DataFrame em caches de resultados.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.size = len(df)
+        self.version = next(_versions)
+        self._bitsets = {}
+        self._options = {}
+        self._sorted = {}
+        self._lock = threading.Lock()
+
+    def _pack(self, positions):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[positions] = True
+        return np.packbits(mask)
+
+    def _column_bitsets(self, column):
+        with self._lock:
+            if column not in self._bitsets:
+                codes, uniques = pd.factorize(self.df[column])
+                order = np.argsort(codes, kind='stable')
+                bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+                # Código -1 (ausente) fica antes de todos: não entra em nenhum bitset
+                self._bitsets[column] = {
+                    value: self._pack(order[bounds[code]:bounds[code + 1]])
+                    for code, value in enumerate(uniques.tolist())
+                }
+                try:
+                    self._options[column] = sorted(self._bitsets[column])
+                except TypeError:
+                    self._options[column] = list(self._bitsets[column])
+
+            return self._bitsets[column]
+
+    def _sorted_values(self, column):
+        with self._lock:
+            if column not in self._sorted:
+                # float32 no snapshot: os limites são comparados nessa precisão (ver _range_bits)
+                series = pd.to_numeric(self.df[column], errors='coerce')
+                dtype = getattr(series.dtype, 'numpy_dtype', series.dtype)
+                dtype = dtype if np.issubdtype(dtype, np.floating) else np.float64
+                values = series.to_numpy(dtype=dtype, na_value=np.nan)
+                valid = np.flatnonzero(~np.isnan(values))
+                order = valid[np.argsort(values[valid], kind='stable')]
+                self._sorted[column] = (values[order], order)
+
+            return self._sorted[column]
+
+    def options(self, column):
+        """Valores distintos (não nulos) da coluna, ordenados, para as listas de opções."""
+        if column not in self.df.columns:
+            return []
+        self._column_bitsets(column)
+        return self._options[column]
+
+    def value_range(self, column):
+        """(mínimo, máximo) dos valores não nulos da coluna, ou None se não houver."""
+        if column not in self.df.columns:
+            return None
+        values, _ = self._sorted_values(column)
+        if len(values) == 0:
+            return None
+        return float(values[0]), float(values[-1])
+
+    def _value_bits(self, column, value):
+        bitsets = self._column_bitsets(column)
+        values = value if isinstance(value, tuple) else (value,)
+        bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for item in values:
+            if item in bitsets:
+                bits |= bitsets[item]
+        return bits
+
+    def _range_bits(self, column, low, high):
+        values, order = self._sorted_values(column)
+        start = 0 if low is None else np.searchsorted(values, values.dtype.type(low), side='left')
+        end = len(values) if high is None else np.searchsorted(values, values.dtype.type(high), side='right')
+        return self._pack(order[start:end])
+
+    def mask(self, conditions):
+        """Máscara booleana para [(coluna, operador, valor)] (ver PETS_FILTERS); None se não indexável."""
+        bits = None
+
+        for column, op, value in conditions:
+            if column not in self.df.columns:
+                return None
+
+            if op == 'eq' and column in CATEGORY_COLUMNS:
+                matched = self._value_bits(column, value)
+            elif op in ('range', 'gte', 'lte') and column in RANGE_COLUMNS:
+                low, high = value if op == 'range' else (value, None) if op == 'gte' else (None, value)
+                matched = self._range_bits(column, low, high)
+            else:
+                return None
+
+            bits = matched if bits is None else bits & matched
+
+        if bits is None:
+            return np.ones(self.size, dtype=bool)
+
+        return np.unpackbits(bits, count=self.size).astype(bool)
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def get_pets_index(df):
+    """Índice do DataFrame `df`, reaproveitado enquanto o mesmo objeto for passado."""
+    with _indexes_lock:
+        index = _indexes.get(id(df))
+
+        if index is None or index.df is not df:
+            index = PetsFrameIndex(df)
+            _indexes[id(df)] = index
+            while len(_indexes) > PETS_INDEX_ENTRIES:
+                _indexes.popitem(last=False)
+        else:
+            _indexes.move_to_end(id(df))
+
+        return index
@@ -0,0 +1,118 @@
+# config/pets_schema.py
+import numpy as np
+import pandas as pd
+
+# Schema declarativo de pets_analytics: coluna -> tipo lógico no DataFrame.
+# category: texto de baixa cardinalidade (um código por linha em vez de uma string)
+# int8:     escalas pequenas (1-5); vira float32 se houver valores ausentes
+# float32:  medidas e scores contínuos
+# bool:     flags; ausentes e valores não reconhecidos viram False
+# datetime: timestamps gerados pelo banco
+PETS_SCHEMA = {
+    'tipo_pet': 'category',
+    'bairro': 'category',
+    'regiao': 'category',
+    'comportamento': 'category',
+    'estado_saude': 'category',
+    'status_vacinacao': 'category',
+    'raca': 'category',
+    'sexo': 'category',
+    'genero': 'category',
+    'status': 'category',
+    'sociabilidade': 'int8',
+    'energia': 'int8',
+    'nivel_atividade': 'int8',
+    'cluster_comportamental': 'int8',
+    'idade': 'float32',
+    'peso': 'float32',
+    'score_adocao': 'float32',
+    'risco_abandono': 'float32',
+    'custo_mensal': 'float32',
+    'adotado': 'bool',
+    'castrado': 'bool',
+    'microchip': 'bool',
+    'compatibilidade_criancas': 'bool',
+    'compatibilidade_pets': 'bool',
+    'created_at': 'datetime',
+    'updated_at': 'datetime',
+}
+
+TRUE_VALUES = {'true', '1', 'sim', 'yes', 's', 'y', 't'}
+
+def _to_bool(series):
+    if pd.api.types.is_bool_dtype(series) and not series.isna().any():
+        return series.astype(bool)
+
+    normalized = series.astype(str).str.strip().str.lower()
+    return normalized.isin(TRUE_VALUES) & series.notna()
+
+def _to_small_int(series):
+    values = pd.to_numeric(series, errors='coerce')
+
+    if values.isna().any() or not values.between(-128, 127).all() or not (values % 1 == 0).all():
+        return values.astype(np.float32)
+
+    return values.astype(np.int8)
+
+def normalize_column(series, kind):
+    """Converte uma coluna para o tipo lógico do schema."""
+    if kind == 'category':
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series
+        return series.astype('category')
+
+    if kind == 'int8':
+        if series.dtype in (np.int8, np.float32):
+            return series
+        return _to_small_int(series)
+
+    if kind == 'float32':
+        if series.dtype == np.float32:
+            return series
+        return pd.to_numeric(series, errors='coerce').astype(np.float32)
+
+    if kind == 'bool':
+        if series.dtype == bool:
+            return series
+        return _to_bool(series)
+
+    if kind == 'datetime':
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series
+        # PostgREST varia o número de casas dos segundos fracionários: inferir o formato
+        # pelo primeiro valor transformaria os demais em NaT
+        return pd.to_datetime(series, errors='coerce', format='ISO8601', utc=True)
+
+    return series
+
+def normalize_pets_frame(df):
+    """Aplica PETS_SCHEMA às colunas presentes, sem copiar as que já estão no tipo certo.
+
+    Idempotente: pode ser chamada de novo após um merge sem custo relevante.
+    """
+    if df.empty:
+        return df
+
+    converted = {}
+
+    for col, kind in PETS_SCHEMA.items():
+        if col in df.columns:
+            series = df[col]
+            normalized = normalize_column(series, kind)
+            if normalized is not series:
+                converted[col] = normalized
+
+    if not converted:
+        return df
+
+    return df.assign(**converted)
+
+def drop_unused_categories(df):
+    """Remove categorias sem linhas de um recorte, para value_counts/gráficos não listarem zeros."""
+    converted = {
+        col: df[col].cat.remove_unused_categories()
+        for col in df.columns
+        if isinstance(df[col].dtype, pd.CategoricalDtype)
+    }
+
+    return df.assign(**converted) if converted else df
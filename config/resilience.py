@@ -0,0 +1,135 @@
+# config/resilience.py
+import os
+import random
+import threading
+import time
+
+from config.database import get_supabase, discard_supabase_client, is_connection_error
+
+# Tentativas extras para operações idempotentes e limites do backoff (segundos)
+SUPABASE_MAX_RETRIES = int(os.getenv("SUPABASE_MAX_RETRIES", "2"))
+SUPABASE_BACKOFF_BASE = float(os.getenv("SUPABASE_BACKOFF_BASE", "0.2"))
+SUPABASE_BACKOFF_MAX = float(os.getenv("SUPABASE_BACKOFF_MAX", "2.0"))
+
+# Falhas consecutivas que abrem o circuito de uma tabela e tempo até a sondagem
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+# Códigos HTTP/PostgREST que indicam indisponibilidade passageira
+TRANSIENT_CODES = {'408', '429', '500', '502', '503', '504', 'PGRST000', 'PGRST001', 'PGRST002'}
+
+class CircuitOpenError(ConnectionError):
+    """Circuito aberto: a tabela está falhando e a chamada nem foi tentada."""
+
+    def __init__(self, table, retry_in):
+        super().__init__(f"Supabase indisponível para '{table}' (nova tentativa em {retry_in:.0f}s)")
+        self.table = table
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """Circuit breaker por tabela: fechado -> aberto após falhas seguidas -> meio-aberto (uma sondagem)."""
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        """Retorna 0 se a chamada pode seguir, ou os segundos até a próxima sondagem."""
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+
+            elapsed = time.monotonic() - self.opened_at
+
+            if elapsed >= self.reset_timeout and not self._probing:
+                # Meio-aberto: deixar passar uma única chamada de sondagem
+                self._probing = True
+                return 0
+
+            return max(self.reset_timeout - elapsed, 0.001)
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(table):
+    """Retorna o circuit breaker da tabela (um por processo)."""
+    with _breakers_lock:
+        if table not in _breakers:
+            _breakers[table] = CircuitBreaker()
+        return _breakers[table]
+
+def is_transient_error(error):
+    """Indica se vale tentar de novo: falha de transporte, timeout ou 5xx/429."""
+    if is_connection_error(error):
+        return True
+
+    code = getattr(error, 'code', None)
+    return code is not None and str(code) in TRANSIENT_CODES
+
+def backoff_delay(attempt):
+    """Backoff exponencial com jitter completo, limitado a SUPABASE_BACKOFF_MAX."""
+    return random.uniform(0, min(SUPABASE_BACKOFF_MAX, SUPABASE_BACKOFF_BASE * (2 ** attempt)))
+
+def execute_with_retry(table, build_query, retries=SUPABASE_MAX_RETRIES):
+    """Executa a query montada por build_query() com retentativas e circuit breaker da tabela.
+
+    build_query é chamado a cada tentativa para que uma conexão recriada pelo
+    pool seja usada. Use retries=0 em operações não idempotentes (insert):
+    elas ainda respeitam o circuito, mas não são repetidas.
+    """
+    breaker = get_circuit_breaker(table)
+    retry_in = breaker.allow()
+
+    if retry_in:
+        raise CircuitOpenError(table, retry_in)
+
+    attempt = 0
+
+    while True:
+        try:
+            result = build_query().execute()
+            breaker.record_success()
+            return result
+
+        except Exception as e:
+            if not is_transient_error(e):
+                # Erro da própria consulta (validação, permissão): o serviço está de pé
+                breaker.record_success()
+                raise
+
+            if is_connection_error(e):
+                discard_supabase_client(get_supabase())
+
+            if attempt >= retries:
+                breaker.record_failure()
+                raise
+
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
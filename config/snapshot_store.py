@@ -0,0 +1,93 @@
+# config/snapshot_store.py
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+# Incrementar sempre que o formato das colunas do snapshot mudar
+PETS_SNAPSHOT_SCHEMA_VERSION = 2
+
+PETS_SNAPSHOT_PATH = os.getenv("PETS_SNAPSHOT_PATH", "data/pets_snapshot.parquet")
+
+def dataset_fingerprint(df, source=""):
+    """Calcula uma impressão digital barata do dataset: origem, colunas, linhas, ids e marca d'água.
+
+    Usa apenas agregações vetorizadas para não pesar no warm start; a
+    integridade dos bytes fica a cargo dos checksums do próprio Parquet e os
+    tipos das colunas ficam cobertos por PETS_SNAPSHOT_SCHEMA_VERSION.
+    """
+    digest = hashlib.sha256()
+    digest.update(source.encode())
+    digest.update(json.dumps([str(col) for col in df.columns]).encode())
+    digest.update(str(len(df)).encode())
+
+    if "id" in df.columns and len(df) > 0:
+        ids = pd.to_numeric(df["id"], errors="coerce")
+        digest.update(f"{ids.sum()}:{ids.min()}:{ids.max()}".encode())
+
+    for col in ("updated_at", "created_at"):
+        if col in df.columns and len(df) > 0:
+            digest.update(str(df[col].astype(str).max()).encode())
+
+    return digest.hexdigest()
+
+def _metadata_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+def save_pets_snapshot(df, source="", path=PETS_SNAPSHOT_PATH):
+    """Grava o snapshot de pets em Parquet comprimido, com versão de schema e fingerprint.
+
+    A escrita é atômica (arquivo temporário + os.replace) para que um processo
+    lendo ao mesmo tempo nunca veja um arquivo pela metade.
+    """
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        tmp_path = f"{path}.tmp"
+        df.to_parquet(tmp_path, index=False, compression="zstd")
+
+        metadata = {
+            "schema_version": PETS_SNAPSHOT_SCHEMA_VERSION,
+            "source": source,
+            "fingerprint": dataset_fingerprint(df, source),
+            "rows": len(df),
+            "saved_at": time.time()
+        }
+
+        tmp_meta = f"{_metadata_path(path)}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+
+        os.replace(tmp_path, path)
+        os.replace(tmp_meta, _metadata_path(path))
+        return True
+
+    except Exception as e:
+        print(f"⚠️ Não foi possível salvar o snapshot de pets: {e}")
+        return False
+
+def load_pets_snapshot(source="", path=PETS_SNAPSHOT_PATH):
+    """Carrega o snapshot de pets do disco, ou None se ausente, de outra origem/versão ou corrompido."""
+    try:
+        if not os.path.exists(path) or not os.path.exists(_metadata_path(path)):
+            return None
+
+        with open(_metadata_path(path), encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        if metadata.get("schema_version") != PETS_SNAPSHOT_SCHEMA_VERSION or metadata.get("source") != source:
+            return None
+
+        df = pd.read_parquet(path)
+
+        if dataset_fingerprint(df, source) != metadata.get("fingerprint"):
+            print("⚠️ Snapshot de pets em disco não confere com o fingerprint; ignorando")
+            return None
+
+        return df
+
+    except Exception as e:
+        print(f"⚠️ Não foi possível ler o snapshot de pets: {e}")
+        return None
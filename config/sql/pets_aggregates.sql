@@ -0,0 +1,49 @@
+-- config/sql/pets_aggregates.sql
+-- Agregações de pets_analytics calculadas no banco (push-down do dashboard).
+-- Aplicar no SQL Editor do Supabase. Equivalente local: config/local_backend.py.
+--
+-- Retorna somas e contagens (não médias) por combinação das dimensões pedidas,
+-- para que o app possa combinar células sem voltar ao banco:
+--   select pets_aggregates();                       -- totais gerais
+--   select pets_aggregates(array['bairro']);        -- uma linha por bairro
+
+create or replace function public.pets_aggregates(group_by text[] default '{}')
+returns jsonb
+language plpgsql
+stable
+as $$
+declare
+    allowed text[] := array['bairro', 'regiao', 'tipo_pet', 'adotado'];
+    dims text;
+    result jsonb;
+begin
+    if not (coalesce(group_by, '{}') <@ allowed) then
+        raise exception 'Dimensão de agregação inválida: %', group_by;
+    end if;
+
+    select string_agg(format('%I', d), ', ') into dims from unnest(group_by) as d;
+
+    execute format(
+        'select coalesce(jsonb_agg(to_jsonb(t)), ''[]''::jsonb) from (
+            select %s
+                count(*) as total,
+                count(*) filter (where adotado) as adotados,
+                sum(idade) as idade_sum,
+                count(idade) as idade_count,
+                sum(score_adocao) as score_sum,
+                count(score_adocao) as score_count,
+                count(*) filter (where score_adocao > 4) as score_alto,
+                sum(risco_abandono) as risco_sum,
+                count(risco_abandono) as risco_count
+            from public.pets_analytics
+            %s
+        ) t',
+        case when dims is null then '' else dims || ',' end,
+        case when dims is null then '' else 'group by ' || dims end
+    ) into result;
+
+    return result;
+end;
+$$;
+
+grant execute on function public.pets_aggregates(text[]) to anon, authenticated;
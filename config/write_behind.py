@@ -0,0 +1,290 @@
+# config/write_behind.py
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from postgrest.types import ReturnMethod
+
+from config.database import get_supabase
+from config.resilience import CircuitOpenError, execute_with_retry, is_transient_error
+
+logger = logging.getLogger(__name__)
+
+# Registros por insert e intervalo máximo (s) entre gravações
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "2.0"))
+
+# Arquivo (JSON por linha, só acrescentado) com o que não pôde ser gravado
+WRITE_BEHIND_SPILL_PATH = os.getenv("WRITE_BEHIND_SPILL_PATH", "data/write_behind_spill.jsonl")
+
+# Tempo máximo (s) para esvaziar a fila ao encerrar o processo
+WRITE_BEHIND_SHUTDOWN_TIMEOUT = float(os.getenv("WRITE_BEHIND_SHUTDOWN_TIMEOUT", "10"))
+
+_STOP = object()
+
+class _Pending:
+    """Escritas acumuladas até a próxima gravação: inserts por tabela e updates por linha."""
+
+    def __init__(self):
+        self.inserts = {}
+        self.updates = {}
+        self.count = 0
+
+    def add(self, kind, table, payload):
+        if kind == 'insert':
+            self.inserts.setdefault(table, []).append(payload)
+        else:
+            values, match = payload
+            key = (table, tuple(sorted(match.items())))
+            previous = self.updates.get(key)
+            self.updates[key] = ({**previous[0], **values} if previous else dict(values), match)
+        self.count += 1
+
+class WriteBehindWriter:
+    """Grava registros de log em segundo plano, em inserts agrupados por tabela.
+
+    insert() e update() só enfileiram; uma thread grava quando o lote atinge
+    batch_size ou a cada flush_interval. Updates da mesma linha entre duas
+    gravações viram um só. Com o banco fora do ar (erro transitório ou
+    circuito aberto), o lote vai para um arquivo local, regravado antes da
+    próxima gravação. Ao encerrar o processo, a fila é esvaziada (ou
+    despejada no arquivo).
+    """
+
+    def __init__(self, batch_size=WRITE_BEHIND_BATCH_SIZE, flush_interval=WRITE_BEHIND_FLUSH_INTERVAL,
+                 spill_path=WRITE_BEHIND_SPILL_PATH, client=None):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self._client = client
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+
+    def insert(self, table, record):
+        """Enfileira um registro para insert em `table`; retorna imediatamente.
+
+        O timestamp é o do momento do enfileiramento: o default do banco
+        marcaria a hora da gravação (ou da regravação do arquivo, horas depois).
+        """
+        if 'timestamp' not in record:
+            record = {**record, 'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat()}
+        self._ensure_started()
+        self._queue.put(('insert', table, record))
+
+    def update(self, table, values, match):
+        """Enfileira um update de `values` nas linhas de `table` que casam com match ({coluna: valor})."""
+        self._ensure_started()
+        self._queue.put(('update', table, (values, match)))
+
+    def flush(self, timeout=None):
+        """Grava o que está na fila agora e espera a gravação terminar."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(('flush', None, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=WRITE_BEHIND_SHUTDOWN_TIMEOUT):
+        """Esvazia a fila e encerra a thread; o que sobrar vai para o arquivo."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+        if thread is None:
+            return
+
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+        # A thread não terminou a tempo: não perder o que ainda está na fila
+        leftover = _Pending()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                continue
+            if item[0] == 'flush':
+                item[2].set()
+            else:
+                leftover.add(*item)
+
+        for table, records in leftover.inserts.items():
+            self._spill(table, records)
+        for (table, _), (values, match) in leftover.updates.items():
+            self._spill_update(table, values, match)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        pending = _Pending()
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._safe_flush(pending)
+                return
+
+            done = None
+            if item is not None:
+                kind, table, payload = item
+                if kind == 'flush':
+                    done = payload
+                else:
+                    pending.add(kind, table, payload)
+
+            if done is not None or pending.count >= self.batch_size or time.monotonic() >= deadline:
+                self._safe_flush(pending)
+                pending = _Pending()
+                deadline = time.monotonic() + self.flush_interval
+
+            if done is not None:
+                done.set()
+
+    def _safe_flush(self, pending):
+        # Uma exceção aqui (ex.: OSError no arquivo) não pode encerrar a thread: a fila
+        # continuaria crescendo sem ninguém gravar
+        try:
+            self._flush(pending)
+        except Exception:
+            logger.exception("Erro ao gravar %d registros em segundo plano", pending.count)
+
+    def _flush(self, pending):
+        if not pending.count:
+            return
+
+        # O que ficou no arquivo é mais antigo: regravar antes, para um update
+        # antigo não sobrescrever um mais novo
+        self._replay_spill()
+
+        for table, records in pending.inserts.items():
+            for start in range(0, len(records), self.batch_size):
+                self._write(table, records[start:start + self.batch_size])
+
+        for (table, _), (values, match) in pending.updates.items():
+            self._write_update(table, values, match)
+
+    def _build_insert(self, table, records):
+        def build_query():
+            active = self._client or get_supabase()
+
+            if active is None:
+                raise ConnectionError("Cliente Supabase indisponível")
+
+            return active.table(table).insert(records, returning=ReturnMethod.minimal)
+
+        return build_query
+
+    def _write(self, table, records):
+        """Grava um lote; se o banco estiver fora, guarda no arquivo."""
+        try:
+            execute_with_retry(table, self._build_insert(table, records), retries=0)
+            return
+        except Exception as e:
+            if isinstance(e, CircuitOpenError) or is_transient_error(e):
+                print(f"⚠️ {table} indisponível, {len(records)} registros guardados em {self.spill_path}: {e}")
+                self._spill(table, records)
+                return
+
+            if len(records) == 1:
+                print(f"Erro ao registrar em {table}: {e}")
+                return
+
+        # Lote recusado: gravar um a um para descartar só os registros inválidos
+        for record in records:
+            self._write(table, [record])
+
+    def _write_update(self, table, values, match):
+        def build_query():
+            active = self._client or get_supabase()
+
+            if active is None:
+                raise ConnectionError("Cliente Supabase indisponível")
+
+            query = active.table(table).update(values, returning=ReturnMethod.minimal)
+            for column, value in match.items():
+                query = query.eq(column, value)
+            return query
+
+        try:
+            # Update com valores fixos é idempotente: pode repetir
+            execute_with_retry(table, build_query)
+        except Exception as e:
+            if isinstance(e, CircuitOpenError) or is_transient_error(e):
+                print(f"⚠️ {table} indisponível, update guardado em {self.spill_path}: {e}")
+                self._spill_update(table, values, match)
+            else:
+                print(f"Erro ao atualizar {table}: {e}")
+
+    def _append_spill(self, entries):
+        with self._spill_lock:
+            directory = os.path.dirname(self.spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, default=str) + '\n')
+
+    def _spill(self, table, records):
+        self._append_spill({'table': table, 'record': record} for record in records)
+
+    def _spill_update(self, table, values, match):
+        self._append_spill([{'table': table, 'values': values, 'match': match}])
+
+    def _replay_spill(self):
+        """Regrava o conteúdo do arquivo; o que falhar de novo volta para ele."""
+        replay_path = self.spill_path + '.replay'
+
+        with self._spill_lock:
+            # Um .replay que sobrou (processo encerrado no meio) é regravado antes
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path) or os.path.getsize(self.spill_path) == 0:
+                    return
+                os.replace(self.spill_path, replay_path)
+
+        spilled = _Pending()
+        with open(replay_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if 'record' in entry:
+                    spilled.add('insert', entry['table'], entry['record'])
+                else:
+                    spilled.add('update', entry['table'], (entry['values'], entry['match']))
+
+        print(f"🔄 Regravando {spilled.count} registros guardados localmente")
+
+        for table, records in spilled.inserts.items():
+            for start in range(0, len(records), self.batch_size):
+                self._write(table, records[start:start + self.batch_size])
+
+        for (table, _), (values, match) in spilled.updates.items():
+            self._write_update(table, values, match)
+
+        os.remove(replay_path)
+
+# Instância única por processo (as sessões do Streamlit compartilham a fila)
+write_behind = WriteBehindWriter()
@@ -0,0 +1,24 @@
+# tests/conftest.py
+import os
+import tempfile
+
+# Antes de importar config.*: backend local em memória e snapshot em disco fora de data/
+os.environ.setdefault("PETCARE_BACKEND", "local")
+os.environ.setdefault("PETS_SNAPSHOT_PATH", os.path.join(tempfile.mkdtemp(prefix="petcare-tests-"), "pets_snapshot.parquet"))
+
+import pytest
+
+@pytest.fixture
+def pets_table():
+    """Tabela pets_analytics vazia no backend local, com o snapshot invalidado."""
+    from config.database import get_supabase
+    from config.pets_data import PETS_TABLE, invalidate_pets_cache
+
+    def clear(client):
+        deleted = client.table(PETS_TABLE).delete().gte('id', 0).execute().data
+        invalidate_pets_cache(deleted_ids=[row['id'] for row in deleted])
+
+    client = get_supabase()
+    clear(client)
+    yield client
+    clear(client)
@@ -0,0 +1,19 @@
+# tests/unit/test_bulk_updates.py
+from config.bulk_updates import bulk_update, same_values_changes
+from config.pets_data import PETS_TABLE
+
+class TestBulkUpdate:
+    """Updates em massa agrupados por valores."""
+
+    def test_counts_rows_updated_by_the_database(self, pets_table):
+        rows = pets_table.table(PETS_TABLE).insert([{'nome': 'Rex'}, {'nome': 'Bob'}]).execute().data
+        ids = [row['id'] for row in rows]
+
+        updated = bulk_update(PETS_TABLE, same_values_changes([*ids, 999999], {'status': 'Adotado'}))
+
+        assert updated == 2
+        statuses = pets_table.table(PETS_TABLE).select('status').in_('id', ids).execute().data
+        assert [row['status'] for row in statuses] == ['Adotado', 'Adotado']
+
+    def test_missing_id_updates_nothing(self, pets_table):
+        assert bulk_update(PETS_TABLE, same_values_changes([999999], {'status': 'Adotado'})) == 0
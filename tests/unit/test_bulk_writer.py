@@ -0,0 +1,91 @@
+# tests/unit/test_bulk_writer.py
+from postgrest.exceptions import APIError
+
+from config.bulk_writer import AdaptiveBatchSizer, BulkWriter
+from config.local_backend import LocalClient, LocalQuery
+
+TABLE = 'bulk_writer_test'
+
+class RejectingQuery(LocalQuery):
+    """Recusa o lote inteiro se alguma linha for inválida, como o PostgREST."""
+
+    def __init__(self, client, table):
+        super().__init__(client.store, table)
+        self._client = client
+
+    def execute(self):
+        self._client.requests += 1
+        payload = self._payload if isinstance(self._payload, list) else [self._payload]
+        error = self._client.reject(payload)
+        if error is not None:
+            raise APIError(error)
+        return super().execute()
+
+class RejectingClient(LocalClient):
+    def __init__(self, reject):
+        super().__init__(':memory:')
+        self.reject = reject
+        self.requests = 0
+
+    def table(self, name):
+        return RejectingQuery(self, name)
+
+def _writer(client, batch_size=8):
+    sizer = AdaptiveBatchSizer(initial=batch_size, minimum=batch_size, maximum=batch_size)
+    return BulkWriter(TABLE, workers=1, sizer=sizer, client=client)
+
+def _records(n):
+    return [{'nome': f'pet {i}', 'idade': i} for i in range(n)]
+
+def _bad_rows(*bad):
+    def reject(payload):
+        for row in payload:
+            if row['idade'] in bad:
+                return {'code': '22P02', 'message': f"invalid input syntax: {row['nome']}"}
+        return None
+    return reject
+
+class TestBisection:
+    """Bisseção de lotes recusados pelo banco."""
+
+    def test_isolates_bad_rows(self):
+        """Só as linhas inválidas falham; as demais do lote são gravadas."""
+        client = RejectingClient(_bad_rows(2, 7))
+        result = _writer(client).insert(_records(8))
+
+        assert result.written == 6
+        assert [index for index, _ in result.failed] == [2, 7]
+        assert sorted(row['idade'] for row in result.rows) == [0, 1, 3, 4, 5, 6]
+        assert result.requests == client.requests
+
+    def test_valid_batch_is_one_request(self):
+        client = RejectingClient(lambda payload: None)
+        result = _writer(client).insert(_records(8))
+
+        assert result.written == 8
+        assert result.requests == 1
+
+    def test_schema_error_fails_whole_batch_without_bisecting(self):
+        """Coluna inexistente (PGRST204) vale para o lote: uma requisição só."""
+        client = RejectingClient(lambda payload: {'code': 'PGRST204', 'message': "Could not find the 'x' column"})
+        result = _writer(client).insert(_records(8))
+
+        assert result.written == 0
+        assert result.failed_count == 8
+        assert client.requests == 1
+
+    def test_constant_message_with_bad_rows_in_both_halves(self):
+        """NOT NULL tem a mesma mensagem para toda linha: as boas ainda são gravadas."""
+        def reject(payload):
+            if any(row['nome'] is None for row in payload):
+                return {'code': '23502', 'message': 'null value in column "nome" violates not-null constraint'}
+            return None
+
+        records = _records(500)
+        records[2]['nome'] = None
+        records[300]['nome'] = None
+        result = _writer(RejectingClient(reject), batch_size=500).insert(records)
+
+        assert result.written == 498
+        assert [index for index, _ in result.failed] == [2, 300]
+        assert sorted(row['idade'] for row in result.rows) == [i for i in range(500) if i not in (2, 300)]
@@ -0,0 +1,71 @@
+# tests/unit/test_import_readers.py
+import io
+
+import pandas as pd
+from openpyxl import Workbook
+
+from config.import_readers import (
+    first_chunk, iter_csv_chunks, iter_excel_chunks, iter_json_chunks, iter_xml_chunks
+)
+
+def _xlsx(rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+def _concat(chunks):
+    return pd.concat([chunk for chunk, _, _ in chunks])
+
+class TestExcelChunks:
+    """Leitura de .xlsx em blocos com o openpyxl em modo somente leitura."""
+
+    def test_chunks_keep_continuous_index(self):
+        file = _xlsx([['nome', 'idade']] + [[f'pet {i}', i] for i in range(5)])
+        chunks = list(iter_excel_chunks(file, chunk_rows=2))
+
+        assert [len(chunk) for chunk, _, _ in chunks] == [2, 2, 1]
+        df = _concat(chunks)
+        assert list(df.index) == [0, 1, 2, 3, 4]
+        assert df['nome'].tolist() == [f'pet {i}' for i in range(5)]
+        assert chunks[-1][1] == chunks[-1][2]
+
+    def test_shared_strings_and_blank_rows(self):
+        """Strings repetidas (tabela compartilhada) e escapes _x005F_ saem como no arquivo."""
+        file = _xlsx([['nome', 'bairro'], ['Rex', 'Centro'], [None, None], ['Bob', 'Centro'], ['a_x005F_b', None]])
+        df = _concat(iter_excel_chunks(file))
+
+        assert df['nome'].tolist() == ['Rex', 'Bob', 'a_x005F_b']
+        assert df['bairro'].iloc[:2].tolist() == ['Centro', 'Centro']
+        assert pd.isna(df['bairro'].iloc[2])
+
+    def test_header_cells_without_name(self):
+        file = _xlsx([['nome', None], ['Rex', 3]])
+        assert list(first_chunk(iter_excel_chunks(file)).columns) == ['nome', 'Unnamed: 1']
+
+class TestTextChunks:
+    """CSV, JSON e XML em blocos com índice contínuo."""
+
+    def test_csv(self):
+        file = io.BytesIO(b"nome,idade\nRex,3\nBob,4\nLua,5\n")
+        chunks = list(iter_csv_chunks(file, chunk_rows=2))
+
+        assert list(_concat(chunks).index) == [0, 1, 2]
+        assert chunks[-1][1] == chunks[-1][2]
+
+    def test_json(self):
+        file = io.BytesIO(b'[{"nome": "Rex", "idade": 3}, {"nome": "Bob", "idade": 4}, {"nome": "Lua"}]')
+        df = _concat(iter_json_chunks(file, chunk_rows=2))
+
+        assert df['nome'].tolist() == ['Rex', 'Bob', 'Lua']
+        assert list(df.index) == [0, 1, 2]
+
+    def test_xml(self):
+        file = io.BytesIO(b'<pets><pet id="1"><nome>Rex</nome></pet><pet id="2"><nome> Bob </nome></pet></pets>')
+        df = _concat(iter_xml_chunks(file, chunk_rows=1))
+
+        assert df.to_dict('records') == [{'id': '1', 'nome': 'Rex'}, {'id': '2', 'nome': 'Bob'}]
@@ -0,0 +1,134 @@
+# tests/unit/test_pets_aggregates.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import config.pets_aggregates as pets_aggregates
+from config.pets_aggregates import (
+    AGGREGATE_DIMENSIONS, PetsAggregateCube, pets_aggregates_from_frame,
+    rollup_aggregates, summarize_pets_metrics
+)
+from config.pets_data import PETS_TABLE, get_pets_snapshot
+
+PETS = pd.DataFrame({
+    'id': [1, 2, 3, 4, 5],
+    'bairro': ['Centro', 'Centro', 'Sul', 'Sul', None],
+    'regiao': ['A', 'A', 'B', 'B', 'B'],
+    'tipo_pet': ['Cão', 'Gato', 'Cão', 'Cão', 'Gato'],
+    'adotado': [True, False, False, True, False],
+    'idade': [1.0, 2.0, None, 4.0, 5.0],
+    'score_adocao': [4.5, 3.0, 5.0, None, 4.2],
+    'risco_abandono': [0.1, 0.2, 0.3, 0.4, 0.5],
+})
+
+def _records(df):
+    return df.replace({np.nan: None}).to_dict('records')
+
+class TestRollupAggregates:
+    """Soma de células do cubo para group_by e filtros menores."""
+
+    @pytest.fixture
+    def cells(self):
+        return pets_aggregates_from_frame(PETS, AGGREGATE_DIMENSIONS, dropna=False)
+
+    def test_rollup_matches_direct_groupby(self, cells):
+        rolled = rollup_aggregates(cells, ('regiao', 'tipo_pet')).sort_values(['regiao', 'tipo_pet'])
+        direct = pets_aggregates_from_frame(PETS, ('regiao', 'tipo_pet')).sort_values(['regiao', 'tipo_pet'])
+
+        pd.testing.assert_frame_equal(
+            rolled.reset_index(drop=True), direct.reset_index(drop=True), check_dtype=False
+        )
+
+    def test_total_counts_cells_with_null_dimension(self, cells):
+        """Sem group_by, a célula de bairro nulo conta; agrupando por bairro, fica de fora."""
+        assert rollup_aggregates(cells)['total'].iloc[0] == 5
+        assert rollup_aggregates(cells, ('bairro',))['total'].sum() == 4
+
+    def test_filters(self, cells):
+        filtered = rollup_aggregates(cells, ('regiao',), {'tipo_pet': ('Cão',), 'adotado': True})
+
+        assert filtered['regiao'].tolist() == ['A', 'B']
+        assert filtered['total'].tolist() == [1, 1]
+        assert filtered['idade_sum'].tolist() == [1.0, 4.0]
+        assert filtered['score_count'].tolist() == [1, 0]
+
+    def test_metrics_from_rollup(self, cells):
+        metrics = summarize_pets_metrics(rollup_aggregates(cells))
+
+        assert metrics['total'] == 5
+        assert metrics['adotados'] == 2
+        assert metrics['taxa_adocao'] == pytest.approx(0.4)
+        assert metrics['idade_media'] == pytest.approx(3.0)
+        assert metrics['perc_score_alto'] == pytest.approx(75.0)
+
+    def test_empty_cells(self):
+        empty = pets_aggregates_from_frame(PETS.iloc[0:0], AGGREGATE_DIMENSIONS, dropna=False)
+
+        assert rollup_aggregates(empty)['total'].iloc[0] == 0
+        assert rollup_aggregates(empty, ('regiao',)).empty
+
+class UnavailableRpc(Exception):
+    code = 'PGRST202'
+
+class TestAggregateCube:
+    """Montagem, tokens de escrita e fallback em memória do cubo."""
+
+    @pytest.fixture
+    def pets(self, pets_table):
+        pets_table.table(PETS_TABLE).insert(_records(PETS.drop(columns='id'))).execute()
+        pets_aggregates.invalidate_pets_cache()
+        return pets_table
+
+    def test_cube_from_database_matches_snapshot(self, pets):
+        cube = PetsAggregateCube()
+        from_db = summarize_pets_metrics(cube.rollup())
+        from_frame = summarize_pets_metrics(pets_aggregates_from_frame(get_pets_snapshot()))
+
+        assert from_db == pytest.approx(from_frame)
+
+    def test_write_with_token_updates_cells(self, pets):
+        cube = PetsAggregateCube()
+        cube.cells()
+        token = cube.begin_write()
+
+        rows = pets.table(PETS_TABLE).insert({'bairro': 'Sul', 'regiao': 'B', 'tipo_pet': 'Cão', 'adotado': True, 'idade': 2.0}).execute().data
+        cube.record(inserted=rows, token=token)
+
+        sul = rollup_aggregates(cube.cells(), ('bairro',), {'bairro': 'Sul'})
+        assert sul['total'].iloc[0] == 3
+        assert sul['adotados'].iloc[0] == 2
+
+    def test_write_with_stale_token_drops_cube(self, pets):
+        cube = PetsAggregateCube()
+        cube.cells()
+        token = cube.begin_write()
+        pets_aggregates.invalidate_pets_cache()
+
+        cube.record(inserted=[{'id': 99, 'bairro': 'Sul', 'regiao': 'B'}], token=token)
+
+        # Remontado do banco, sem a linha 99 (que não foi gravada)
+        assert cube.begin_write() is None
+        assert cube.rollup()['total'].iloc[0] == 5
+
+    def test_missing_rpc_falls_back_once_and_backs_off(self, pets, monkeypatch):
+        calls = []
+
+        def failing_fetch(group_by):
+            calls.append(group_by)
+            raise UnavailableRpc("Could not find the function public.pets_aggregates")
+
+        monkeypatch.setattr(pets_aggregates, 'fetch_pets_aggregates', failing_fetch)
+        cube = PetsAggregateCube()
+
+        for _ in range(3):
+            assert cube.rollup()['total'].iloc[0] == 5
+
+        token = cube.begin_write()
+        rows = pets.table(PETS_TABLE).insert({'bairro': 'Sul', 'regiao': 'B', 'tipo_pet': 'Cão'}).execute().data
+        cube.record(inserted=rows, token=token)
+        assert cube.rollup()['total'].iloc[0] == 6
+
+        # Snapshot remontado sem passar pelo cubo: recalculado em memória, sem tentar a função de novo
+        pets_aggregates.invalidate_pets_cache()
+        assert cube.rollup()['total'].iloc[0] == 6
+        assert len(calls) == 1
@@ -0,0 +1,116 @@
+# tests/unit/test_pets_import.py
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import config.pets_import as pets_import
+from config.pets_data import PETS_TABLE, get_pets_snapshot
+from config.pets_import import (
+    ArrowRecordsPreparer, NaturalKeyIndex, match_existing_ids, prepare_import_records, run_pets_import, upsert_pets
+)
+
+KEY = ['nome', 'raca', 'bairro']
+
+def _pets(client):
+    rows = client.table(PETS_TABLE).select('id', 'nome', 'idade').order('id').execute().data
+    return [(row['id'], row['nome'], row['idade']) for row in rows]
+
+class TestMatchExistingIds:
+    """Casamento pela chave natural contra pets existentes."""
+
+    def test_normalizes_text_and_keeps_highest_id(self):
+        existing = pd.DataFrame({
+            'id': [1, 2, 3],
+            'nome': ['Rex', 'Rex', 'Bob'],
+            'raca': ['SRD', 'SRD', 'Poodle'],
+            'bairro': ['Centro', 'Centro', 'Sul'],
+        })
+        records = [
+            {'nome': ' rex ', 'raca': 'srd', 'bairro': 'CENTRO'},
+            {'nome': 'Bob', 'raca': 'Poodle', 'bairro': 'Norte'},
+            {'nome': 'Bob', 'raca': None, 'bairro': 'Sul'},
+        ]
+
+        ids = match_existing_ids(records, KEY, existing)
+
+        assert ids[0] == 2
+        assert np.isnan(ids[1:]).all()
+
+    def test_added_rows_are_found(self):
+        index = NaturalKeyIndex(KEY, pd.DataFrame(columns=['id', *KEY]))
+        record = {'nome': 'Lua', 'raca': 'SRD', 'bairro': 'Sul'}
+
+        assert np.isnan(index.match([record])[0])
+        index.add([dict(record, id=7)])
+        assert index.match([record])[0] == 7
+
+class TestUpsertPets:
+    """Upsert pela chave natural no backend local."""
+
+    def test_updates_existing_and_inserts_new(self, pets_table):
+        pets_table.table(PETS_TABLE).insert([{'nome': 'Rex', 'raca': 'SRD', 'bairro': 'Centro', 'idade': 3}]).execute()
+        (rex_id, _, _), = _pets(pets_table)
+
+        updated, inserted, failed, superseded = upsert_pets([
+            {'nome': 'rex', 'raca': 'srd', 'bairro': 'centro', 'idade': 4},
+            {'nome': 'Bob', 'raca': 'Poodle', 'bairro': 'Sul', 'idade': 1},
+        ], KEY)
+
+        assert (updated, inserted, failed, superseded) == (1, 1, [], [])
+        pets = _pets(pets_table)
+        assert pets[0] == (rex_id, 'rex', 4)
+        assert [(name, age) for _, name, age in pets[1:]] == [('Bob', 1)]
+
+    def test_repeated_new_key_in_chunk_is_inserted_once(self, pets_table):
+        """A última linha com a chave vence; as anteriores são informadas como descartadas."""
+        updated, inserted, failed, superseded = upsert_pets([
+            {'nome': 'Bob', 'raca': 'Poodle', 'bairro': 'Sul', 'idade': 1},
+            {'nome': 'Lua', 'raca': 'SRD', 'bairro': 'Sul', 'idade': 2},
+            {'nome': 'bob', 'raca': 'poodle', 'bairro': 'sul', 'idade': 5},
+        ], KEY)
+
+        assert (updated, inserted, failed, superseded) == (0, 2, [], [0])
+        assert sorted((name, age) for _, name, age in _pets(pets_table)) == [('Lua', 2), ('bob', 5)]
+
+    def test_import_reads_snapshot_once_and_matches_earlier_chunks(self, pets_table, monkeypatch):
+        calls = []
+
+        def counting_snapshot():
+            calls.append(1)
+            return get_pets_snapshot()
+
+        monkeypatch.setattr(pets_import, 'get_pets_snapshot', counting_snapshot)
+        chunks = [
+            pd.DataFrame({'nome': ['Bob'], 'raca': ['Poodle'], 'bairro': ['Sul'], 'idade': [1]}, index=[0]),
+            pd.DataFrame({'nome': ['Lua'], 'raca': ['SRD'], 'bairro': ['Sul'], 'idade': [2]}, index=[1]),
+            pd.DataFrame({'nome': ['Bob'], 'raca': ['Poodle'], 'bairro': ['Sul'], 'idade': [3]}, index=[2]),
+        ]
+
+        report = run_pets_import(((chunk, i + 1, 3) for i, chunk in enumerate(chunks)), mode='upsert', duplicates='keep')
+
+        assert (report.inserted, report.updated, report.errors) == (2, 1, [])
+        assert len(calls) == 1
+        assert sorted((name, age) for _, name, age in _pets(pets_table)) == [('Bob', 3), ('Lua', 2)]
+
+class TestArrowRecordsPreparer:
+    """O caminho Arrow gera o mesmo payload que o caminho pandas para o mesmo arquivo."""
+
+    def test_matches_pandas_path(self, tmp_path):
+        df = pd.DataFrame({
+            'nome': ['Rex', '', None, 'Lua'],
+            'idade': [3, None, 5, 1],
+            'peso': [10.5, 4.0, None, 2.25],
+            'castrado': ['sim', '', None, 'não'],
+            'microchip': [True, None, False, True],
+        })
+        path = tmp_path / 'pets.parquet'
+        df.to_parquet(path, index=False)
+
+        batch = pq.read_table(path).to_batches()[0]
+        arrow_records, arrow_lines, arrow_errors = ArrowRecordsPreparer({col: col for col in df.columns})(batch)
+        pandas_records, pandas_lines, pandas_errors = prepare_import_records(pd.read_parquet(path))
+
+        assert arrow_records == pandas_records
+        assert arrow_lines == pandas_lines
+        assert arrow_errors == pandas_errors == []
+        assert [record['castrado'] for record in arrow_records] == [True, None, None, False]